@@ -0,0 +1,150 @@
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urlencode
+
+
+class ResponseCache:
+    """
+    YouTube Data API のレスポンスを ETag 付きで保存するディスクキャッシュ（SQLite）
+
+    - 有効期限内のエントリはリクエストを送らずにそのまま返す（fresh）
+    - 期限切れのエントリは If-None-Match を付けて再検証し、304 なら本文を再利用する
+    キーは URL とパラメータ（API キーを除く）
+    開いたときに max_age_sec より長く参照されていないエントリを削除し、
+    合計サイズが max_bytes を超えたら最終参照が古いものから削除する
+    """
+
+    def __init__(
+        self,
+        path: Path | str,
+        max_bytes: int | None = None,
+        max_age_sec: float | None = None,
+    ):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.max_age_sec = max_age_sec
+        self.stats = {"fresh": 0, "revalidated": 0, "misses": 0, "stored": 0, "evicted": 0}
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                etag TEXT,
+                body TEXT NOT NULL,
+                fetched_at REAL NOT NULL,
+                size INTEGER NOT NULL DEFAULT 0,
+                last_access REAL NOT NULL DEFAULT 0
+            )
+            """
+        )
+        columns = [r[1] for r in self._conn.execute("PRAGMA table_info(responses)")]
+        if "size" not in columns:  # サイズ・最終参照の列が無い古いキャッシュ
+            self._conn.execute(
+                "ALTER TABLE responses ADD COLUMN size INTEGER NOT NULL DEFAULT 0"
+            )
+            self._conn.execute(
+                "ALTER TABLE responses ADD COLUMN last_access REAL NOT NULL DEFAULT 0"
+            )
+            self._conn.execute(
+                "UPDATE responses SET size = length(CAST(body AS BLOB)),"
+                " last_access = fetched_at"
+            )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses(last_access)"
+        )
+        if max_age_sec is not None:
+            cur = self._conn.execute(
+                "DELETE FROM responses WHERE last_access < ?", (time.time() - max_age_sec,)
+            )
+            self.stats["evicted"] += cur.rowcount
+        self._evict()
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(base_url: str, params: dict) -> str:
+        """API キーを除いたパラメータをソートして URL に付けたものをキーにする"""
+        items = sorted((k, str(v)) for k, v in params.items() if k != "key")
+        return f"{base_url}?{urlencode(items)}"
+
+    def get(self, key: str) -> dict | None:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT etag, body, fetched_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE responses SET last_access = ? WHERE key = ?", (now, key)
+            )
+            self._conn.commit()
+        etag, body, fetched_at = row
+        return {"etag": etag, "body": body, "age": now - fetched_at}
+
+    def put(self, key: str, etag: str | None, body: str) -> None:
+        """エントリを保存（同じキーは上書き）し、必要ならサイズ上限まで削除する"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses"
+                " (key, etag, body, fetched_at, size, last_access)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (key, etag, body, now, len(body.encode("utf-8")), now),
+            )
+            self.stats["stored"] += 1
+            self._evict()
+            self._conn.commit()
+
+    def record(self, result: str) -> None:
+        """get の結果（fresh / revalidated / misses）を集計に加える（スレッド間で共有するのでロックの中で）"""
+        with self._lock:
+            self.stats[result] += 1
+
+    def touch(self, key: str) -> None:
+        """304 で変更が無いと確認できたエントリの取得時刻を更新する"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE responses SET fetched_at = ?, last_access = ? WHERE key = ?",
+                (now, now, key),
+            )
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        """合計サイズが max_bytes を超えていれば、最終参照が古い順に削除する"""
+        if self.max_bytes is None:
+            return
+        (total,) = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()
+        if total <= self.max_bytes:
+            return
+        rows = self._conn.execute(
+            "SELECT key, size FROM responses ORDER BY last_access"
+        ).fetchall()
+        doomed = []
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            doomed.append((key,))
+            total -= size
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", doomed)
+        self.stats["evicted"] += len(doomed)
+
+    def report(self) -> str:
+        with self._lock:
+            stats = dict(self.stats)
+        return (
+            f"fresh hits: {stats['fresh']}, revalidated (304): {stats['revalidated']}, "
+            f"misses: {stats['misses']}, stored: {stats['stored']}, "
+            f"evicted: {stats['evicted']}"
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,272 @@
+import gzip
+import hashlib
+import json
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from benchmarks.synthetic_transcripts import CUE_SEC, benchmark_video_ids
+
+# 1 ページ・1 リクエストあたりの最大件数（本物の API と同じ）
+MAX_RESULTS = 50
+# 動画の公開日時の起点（新しい動画ほど後の日時にする）
+_EPOCH = datetime(2020, 1, 1, tzinfo=timezone.utc)
+
+
+class FakeYouTubeAPI:
+    """
+    YouTube Data API の videos / playlistItems をまねるローカル HTTP サーバー
+
+    チャンネル c の動画は video_ids[c::channels]、アップロード再生リストは新しい順に返し、
+    nextPageToken でページングする。videos は part に応じて snippet / contentDetails /
+    statistics を返す。動画時間は合成字幕（cues 行）の長さに合わせる
+    latency を指定すると 1 リクエストごとにその秒数だけ待つ
+    views_added を増やすと全動画の再生数がその分だけ増える（統計の再取得の確認用）
+    fail_requests() で指定したリクエストにエラーを返す。受け取ったリクエストは queries に残る
+    fields パラメータがあれば本物と同じく、選んだフィールドだけに絞って返す
+
+    base_url を youtube_client の YOUTUBE_API_BASE_URL に設定して使う
+    """
+
+    def __init__(
+        self,
+        num_videos: int = 0,
+        channels: int = 1,
+        cues: int = 60,
+        latency: float = 0.0,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ):
+        self.latency = latency
+        self.requests = 0
+        self.views_added = 0
+        self.queries = []  # 受け取ったリクエストの (パス, パラメータ)
+        self._failures = []  # [ステータス, パス・クエリに含まれる文字列, 残り回数]
+        self._lock = threading.Lock()
+        self.set_videos(num_videos, channels, cues)
+        self._server = ThreadingHTTPServer((host, port), _make_handler(self))
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/youtube/v3"
+
+    def set_videos(self, num_videos: int, channels: int = 1, cues: int = 60) -> None:
+        """配信する動画を入れ替える（動画数・チャンネル数・字幕のキュー数）"""
+        with self._lock:
+            self.video_ids = benchmark_video_ids(num_videos)
+            self.channels = [f"UCbench{c:017d}" for c in range(channels)]
+            self.duration_sec = int(cues * CUE_SEC)
+            self._index = {v: i for i, v in enumerate(self.video_ids)}
+
+    def fail_requests(self, status: int, match: str = "", count: int = 1) -> None:
+        """パスかクエリに match を含む次の count 回のリクエストに status のエラーを返す"""
+        with self._lock:
+            self._failures.append([status, match, count])
+
+    def _failure(self, path: str) -> int | None:
+        with self._lock:
+            for failure in self._failures:
+                status, match, remaining = failure
+                if remaining > 0 and match in path:
+                    failure[2] -= 1
+                    return status
+        return None
+
+    def channel_videos(self, channel: int) -> list[str]:
+        """チャンネルの動画（新しい順）"""
+        return self.video_ids[channel :: len(self.channels)][::-1]
+
+    def seed_video_ids(self) -> list[str]:
+        """チャンネルごとに 1 本ずつの動画ID（get_playlist_ids の入力用）"""
+        return [self.channel_videos(c)[0] for c in range(len(self.channels))]
+
+    def start(self) -> "FakeYouTubeAPI":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._thread is not None:  # shutdown() は serve_forever が動いていないと戻らない
+            self._server.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # --- レスポンスの組み立て ---
+
+    def _video_item(self, video_id: str, parts: set[str]) -> dict | None:
+        i = self._index.get(video_id)
+        if i is None:
+            return None
+        channel = i % len(self.channels)
+        item = {"kind": "youtube#video", "id": video_id}
+        if "snippet" in parts:
+            item["snippet"] = {
+                "publishedAt": (_EPOCH + timedelta(hours=i)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                "channelId": self.channels[channel],
+                "title": f"ベンチマーク動画 {i}",
+                "channelTitle": f"Benchmark channel {channel}",
+            }
+        if "contentDetails" in parts:
+            m, s = divmod(self.duration_sec, 60)
+            item["contentDetails"] = {"duration": f"PT{m}M{s}S"}
+        if "statistics" in parts:
+            item["statistics"] = {
+                "viewCount": str(1000 + i * 37 % 100_000 + self.views_added),
+                "likeCount": str(10 + i * 7 % 1000),
+                "commentCount": str(i % 100),
+            }
+        return item
+
+    def videos(self, params: dict) -> dict:
+        ids = [v for v in params.get("id", "").split(",") if v][:MAX_RESULTS]
+        parts = set(params.get("part", "").split(","))
+        items = [item for v in ids if (item := self._video_item(v, parts)) is not None]
+        return {"kind": "youtube#videoListResponse", "items": items}
+
+    def playlist_items(self, params: dict) -> dict | None:
+        playlist_id = params.get("playlistId", "")
+        channel_id = "UC" + playlist_id[2:]
+        if not playlist_id.startswith("UU") or channel_id not in self.channels:
+            return None
+        videos = self.channel_videos(self.channels.index(channel_id))
+        max_results = min(int(params.get("maxResults", 5)), MAX_RESULTS)
+        start = int(params.get("pageToken") or 0)
+        page = videos[start : start + max_results]
+        data = {
+            "kind": "youtube#playlistItemListResponse",
+            "items": [
+                {
+                    "snippet": {
+                        "title": f"ベンチマーク動画 {self._index[v]}",
+                        "resourceId": {"kind": "youtube#video", "videoId": v},
+                    }
+                }
+                for v in page
+            ],
+        }
+        if start + max_results < len(videos):
+            data["nextPageToken"] = str(start + max_results)
+        return data
+
+
+def parse_fields(fields: str) -> dict:
+    """
+    fields パラメータ（例: "etag,items(id,snippet/title)"）を
+    {名前: 下位の選択（全体なら None）} の木にする
+    """
+    tree, _ = _parse_field_list(fields, 0)
+    return tree
+
+
+def _parse_field_list(fields: str, pos: int) -> tuple[dict, int]:
+    tree = {}
+    while pos < len(fields) and fields[pos] != ")":
+        if fields[pos] == ",":
+            pos += 1
+            continue
+        end = pos
+        while end < len(fields) and fields[end] not in ",()":
+            end += 1
+        *parents, name = fields[pos:end].split("/")
+        pos = end
+        sub = None
+        if pos < len(fields) and fields[pos] == "(":
+            sub, pos = _parse_field_list(fields, pos + 1)
+            pos += 1  # ")"
+        node = tree
+        for parent in parents:
+            node = node.setdefault(parent, {})
+        node[name] = sub
+    return tree, pos
+
+
+def select_fields(data, tree: dict | None):
+    """tree に含まれるフィールドだけを残す（本物と同じく、空になった値は返さない）"""
+    if tree is None:
+        return data
+    if isinstance(data, list):
+        selected = (select_fields(item, tree) for item in data)
+        return [item for item in selected if item not in ({}, [])]
+    if not isinstance(data, dict):
+        return data
+    result = {}
+    for name, sub in tree.items():
+        if name in data:
+            value = select_fields(data[name], sub)
+            if value not in ({}, []):
+                result[name] = value
+    return result
+
+
+def _make_handler(api: FakeYouTubeAPI):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive（本物と同じく接続を使い回せる）
+
+        def do_GET(self):
+            with api._lock:
+                api.requests += 1
+            if api.latency:
+                time.sleep(api.latency)
+
+            url = urlparse(self.path)
+            params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+            with api._lock:
+                api.queries.append((url.path, params))
+            status = api._failure(self.path)
+            if status is not None:
+                self._send(status, {"error": {"code": status, "message": "Injected error"}})
+                return
+            if url.path.endswith("/videos"):
+                data = api.videos(params)
+            elif url.path.endswith("/playlistItems"):
+                data = api.playlist_items(params)
+            else:
+                data = None
+            if data is None:
+                self._send(404, {"error": {"code": 404, "message": "Not found"}})
+                return
+
+            body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+            etag = '"' + hashlib.md5(body).hexdigest() + '"'
+            data["etag"] = etag
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            if params.get("fields"):
+                data = select_fields(data, parse_fields(params["fields"]))
+            self._send(200, data, etag)
+
+        def _send(self, status: int, data: dict, etag: str | None = None):
+            body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+            gzipped = "gzip" in self.headers.get("Accept-Encoding", "")
+            if gzipped:
+                body = gzip.compress(body, compresslevel=1)
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=UTF-8")
+            if gzipped:
+                self.send_header("Content-Encoding", "gzip")
+            if etag:
+                self.send_header("ETag", etag)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # リクエストごとのログは出さない
+
+    return Handler
@@ -0,0 +1,309 @@
+import argparse
+import contextlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.fake_youtube_api import FakeYouTubeAPI
+from benchmarks.synthetic_transcripts import RequestClock, fake_ydl_factory
+
+# 計測する動画数（--sizes で変更）
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+STAGES = ["youtube_client", "fetch_transcripts", "keywords", "analyze_subtitles"]
+# keywords の 1 本あたりの時間を測る字幕の本数（全体の計測とは別に 1 本ずつ数える）
+LATENCY_SAMPLE = 1000
+
+
+def current_rss() -> int:
+    """プロセスの常駐メモリ（バイト）。/proc が無ければそれまでの最大値で代用する"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        try:
+            import resource
+        except ImportError:
+            return 0
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class PeakRSS:
+    """
+    with の間の常駐メモリの最大値を、別スレッドで定期的に読んで記録する
+    （キーワード分析のワーカープロセスの分は含まない）
+    """
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.start = self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, current_rss())
+
+    def __enter__(self):
+        self.start = self.peak = current_rss()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss())
+
+
+def stage_row(
+    stage: str,
+    videos: int,
+    seconds: float,
+    latencies: list[float],
+    memory: PeakRSS,
+    **extra,
+) -> dict:
+    """1 段階分の計測結果（スループット・1 件あたりの待ち時間・メモリ）"""
+    row = {
+        "stage": stage,
+        "videos": videos,
+        "seconds": round(seconds, 3),
+        "videos_per_sec": round(videos / seconds, 1) if seconds > 0 else None,
+    }
+    lat = np.asarray(latencies) * 1000
+    for q in (50, 95, 99):
+        row[f"latency_p{q}_ms"] = round(float(np.percentile(lat, q)), 3) if len(lat) else None
+    row["peak_rss_mb"] = round(memory.peak / 1024 / 1024, 1)
+    row["rss_growth_mb"] = round((memory.peak - memory.start) / 1024 / 1024, 1)
+    row.update(extra)
+    return row
+
+
+def configure_environment(work_dir: Path, base_url: str, workers: int) -> None:
+    """
+    パイプラインのモジュールを読み込む前に、設定を偽の API と作業ディレクトリに向ける
+    （API キャッシュ・割り当ての保存・字幕の索引は使わない）
+    """
+    os.environ.setdefault("YOUTUBE_API_KEY", "benchmark")
+    os.environ.update(
+        {
+            "YOUTUBE_API_BASE_URL": base_url,
+            "API_CACHE": "",
+            "QUOTA_STATE": "",
+            "YOUTUBE_DAILY_QUOTA": str(10**9),
+            "OUTPUT_DIR": str(work_dir / "output"),
+            "STATE_DIR": str(work_dir / "state"),
+            "TRANSCRIPT_INDEX": "",
+            "ANALYSIS_WORKERS": str(workers),
+        }
+    )
+    # ローカルのサーバーにはプロキシを通さない
+    for name in ("NO_PROXY", "no_proxy"):
+        hosts = [h for h in os.environ.get(name, "").split(",") if h]
+        os.environ[name] = ",".join(hosts + ["127.0.0.1", "localhost"])
+
+
+def run_size(
+    num_videos: int, api: FakeYouTubeAPI, work_dir: Path, args: argparse.Namespace
+) -> list[dict]:
+    """num_videos 本で 4 段階を順に実行し、段階ごとの計測結果を返す"""
+    import fetch_transcripts
+    import main
+    import youtube_client
+    from keyword_dictionary import get_keyword_matcher
+    from keywords import count_matrix_parallel
+    from transcript_corpus import CorpusWriter, TranscriptCorpus
+
+    if youtube_client.YOUTUBE_API_BASE_URL != api.base_url:
+        raise RuntimeError("youtube_client was imported before the benchmark configured it.")
+
+    api.set_videos(num_videos, args.channels, args.cues)
+    quiet = (
+        contextlib.nullcontext()
+        if args.verbose
+        else contextlib.redirect_stdout(open(os.devnull, "w"))
+    )
+    rows = []
+
+    # 1. youtube_client: 再生リストの取得 → 全動画の列挙 → 動画詳細（1 件 = 1 リクエスト）
+    latencies = []
+
+    def record(response, *args, **kwargs):
+        latencies.append(response.elapsed.total_seconds())
+
+    session = youtube_client.get_session()
+    session.hooks["response"].append(record)
+    requests_before = api.requests
+    try:
+        with quiet, PeakRSS() as memory:
+            start = time.perf_counter()
+            playlists = youtube_client.get_playlist_ids(
+                api.seed_video_ids(), youtube_client.API_KEY
+            )
+            videos = youtube_client.get_all_video_ids(
+                playlists["playlist_id"].tolist(), youtube_client.API_KEY
+            )
+            details = youtube_client.get_video_details(
+                videos["video_id"].tolist(), youtube_client.API_KEY
+            )
+            seconds = time.perf_counter() - start
+    finally:
+        session.hooks["response"].remove(record)
+    rows.append(
+        stage_row(
+            "youtube_client",
+            len(details),
+            seconds,
+            latencies,
+            memory,
+            requests=api.requests - requests_before,
+        )
+    )
+
+    # 2. fetch_transcripts: 偽の yt-dlp から合成字幕を取得・解析してコーパスに書く
+    #    （1 件 = 1 本。extract_info の開始から結果が返るまで）
+    video_ids = details["video_id"].tolist()
+    clock = RequestClock()
+    finished = {}
+    corpus_path = work_dir / f"corpus-{num_videos}"
+    factory = fake_ydl_factory(
+        cues=args.cues, latency=args.subtitle_latency_ms / 1000, on_request=clock
+    )
+    with quiet, PeakRSS() as memory, CorpusWriter(corpus_path) as writer:
+        start = time.perf_counter()
+        subtitles = fetch_transcripts.extract_subtitles_from_videos(
+            video_ids,
+            max_workers=args.subtitle_workers,
+            rate=args.subtitle_rate,
+            on_result=lambda row: finished.setdefault(row["video_id"], time.perf_counter()),
+            corpus=writer,
+            ydl_factory=factory,
+        )
+        seconds = time.perf_counter() - start
+    corpus_mb = (corpus_path / "corpus.bin").stat().st_size / 1024 / 1024
+    rows.append(
+        stage_row(
+            "fetch_transcripts",
+            len(subtitles),
+            seconds,
+            [finished[v] - clock.started[v] for v in finished if v in clock.started],
+            memory,
+            corpus_mb=round(corpus_mb, 1),
+            not_found=int((subtitles["subtitle_status"] == "not_found").sum()),
+        )
+    )
+
+    # 3. keywords: コーパスのメモリマップをキーワード別に数える（ANALYSIS_WORKERS と同じ並列数）
+    matcher = get_keyword_matcher()
+    corpus = TranscriptCorpus(corpus_path)
+    with PeakRSS() as memory:
+        start = time.perf_counter()
+        count_matrix_parallel(
+            matcher=matcher,
+            workers=args.workers,
+            corpus=corpus,
+            video_ids=video_ids,
+            per_keyword=True,
+        )
+        seconds = time.perf_counter() - start
+    latencies = []
+    for video_id in video_ids[:LATENCY_SAMPLE]:
+        view = corpus.view(video_id)
+        if view is None:
+            continue
+        t = time.perf_counter()
+        matcher.count_keywords(view)
+        latencies.append(time.perf_counter() - t)
+        del view
+    rows.append(
+        stage_row(
+            "keywords",
+            len(video_ids),
+            seconds,
+            latencies,
+            memory,
+            mb_per_sec=round(corpus_mb / seconds, 1) if seconds > 0 else None,
+        )
+    )
+
+    # 4. main.analyze_subtitles: 動画詳細と字幕の結果を結合し、列の追加まで（main と同じ）
+    result = pd.merge(details, subtitles, on="video_id", how="outer")
+    with quiet, PeakRSS() as memory:
+        start = time.perf_counter()
+        main.analyze_subtitles(result, corpus)
+        seconds = time.perf_counter() - start
+    rows.append(stage_row("analyze_subtitles", len(result), seconds, [], memory))
+
+    corpus.close()
+    shutil.rmtree(corpus_path, ignore_errors=True)
+    return rows
+
+
+def run_benchmarks(sizes: list[int], args: argparse.Namespace, work_dir: Path) -> list[dict]:
+    """偽の API を 1 つ起動し、sizes の動画数ごとに計測する"""
+    with FakeYouTubeAPI(latency=args.api_latency_ms / 1000) as api:
+        configure_environment(work_dir, api.base_url, args.workers)
+        rows = []
+        for num_videos in sizes:
+            print(f"Benchmarking {num_videos} videos...")
+            rows += run_size(num_videos, api, work_dir, args)
+    return rows
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Offline benchmark of the pipeline against a local YouTube API stand-in"
+    )
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="numbers of videos"
+    )
+    parser.add_argument("--channels", type=int, default=4, help="channels to spread them over")
+    parser.add_argument("--cues", type=int, default=60, help="cues per synthetic subtitle")
+    parser.add_argument(
+        "--workers", type=int, default=0, help="keyword analysis processes (0 = CPU cores)"
+    )
+    parser.add_argument("--subtitle-workers", type=int, default=8)
+    parser.add_argument(
+        "--subtitle-rate", type=float, default=1e6, help="subtitle requests per second cap"
+    )
+    parser.add_argument("--api-latency-ms", type=float, default=0.0)
+    parser.add_argument("--subtitle-latency-ms", type=float, default=0.0)
+    parser.add_argument("--json", type=Path, help="also write the results to this file")
+    parser.add_argument(
+        "--work-dir", type=Path, help="keep the corpus and outputs here instead of a temp dir"
+    )
+    parser.add_argument(
+        "--verbose", action="store_true", help="show the pipeline's own progress output"
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> list[dict]:
+    args = parse_args(argv)
+    if args.work_dir is not None:
+        args.work_dir.mkdir(parents=True, exist_ok=True)
+        rows = run_benchmarks(args.sizes, args, args.work_dir)
+    else:
+        with tempfile.TemporaryDirectory(prefix="ytca-bench-") as tmp:
+            rows = run_benchmarks(args.sizes, args, Path(tmp))
+
+    print()
+    print(pd.DataFrame(rows).to_string(index=False))
+    if args.json is not None:
+        config = {k: str(v) if isinstance(v, Path) else v for k, v in vars(args).items()}
+        args.json.write_text(
+            json.dumps({"config": config, "results": rows}, indent=2) + "\n",
+            encoding="utf-8",
+        )
+        print(f"\nResults written to {args.json}")
+    return rows
+
+
+if __name__ == "__main__":
+    main()
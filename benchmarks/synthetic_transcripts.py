@@ -0,0 +1,227 @@
+import argparse
+import io
+import random
+import threading
+import time
+import zlib
+from collections.abc import Callable
+from pathlib import Path
+
+from keywords import KEYWORD_CATEGORIES
+
+# 合成字幕の 1 キューの長さ（秒）。偽の API の動画時間もこれに合わせる
+CUE_SEC = 3.0
+
+# キーワードの合間に入れる語（字幕らしい長さの文を作るため）
+_FILLERS = [
+    "今日は", "みなさん", "そして", "その後", "ある日", "とても", "まさか",
+    "家族と", "夜になって", "街の", "いつものように", "突然", "実は", "しかし",
+    "なんと", "翌朝", "近所の", "仕事の帰りに", "思わず", "気がつくと",
+]
+_ENDINGS = ["でした", "ました", "です", "だったのです", "ことに", "のでした"]
+# 組み込み辞書の全キーワード（make_lines の既定値）
+_KEYWORDS = sorted({k for kws in KEYWORD_CATEGORIES.values() for k in kws})
+
+
+def benchmark_video_ids(count: int, start: int = 0) -> list[str]:
+    """ベンチマーク用の動画ID（本物と同じ 11 文字）"""
+    return [f"bv{i:09d}" for i in range(start, start + count)]
+
+
+def video_rng(video_id: str) -> random.Random:
+    """動画ごとに決まった乱数（同じ動画からは毎回同じ字幕を作る）"""
+    return random.Random(zlib.crc32(video_id.encode("utf-8")))
+
+
+def make_lines(
+    video_id: str,
+    cues: int,
+    keyword_rate: float = 0.2,
+    keywords: list[str] | None = None,
+) -> list[str]:
+    """字幕の本文行を cues 行作る（語の keyword_rate の割合をキーワードにする）"""
+    rng = video_rng(video_id)
+    keywords = keywords or _KEYWORDS
+    lines = []
+    for _ in range(cues):
+        words = [
+            rng.choice(keywords) if rng.random() < keyword_rate else rng.choice(_FILLERS)
+            for _ in range(rng.randint(3, 7))
+        ]
+        lines.append("".join(words) + rng.choice(_ENDINGS))
+    return lines
+
+
+def _timestamp(sec: float, sep: str) -> str:
+    ms = int(round(sec * 1000))
+    h, ms = divmod(ms, 3_600_000)
+    m, ms = divmod(ms, 60_000)
+    s, ms = divmod(ms, 1000)
+    return f"{h:02d}:{m:02d}:{s:02d}{sep}{ms:03d}"
+
+
+def to_srt(lines: list[str]) -> str:
+    """本文行を SRT にする"""
+    blocks = []
+    for i, line in enumerate(lines):
+        start, end = i * CUE_SEC, (i + 1) * CUE_SEC
+        blocks.append(
+            f"{i + 1}\n{_timestamp(start, ',')} --> {_timestamp(end, ',')}\n{line}\n"
+        )
+    return "\n".join(blocks)
+
+
+def to_vtt(lines: list[str], rolling: bool = False) -> str:
+    """
+    本文行を VTT にする
+    rolling=True なら自動生成字幕のロールアップ表示をまねて、
+    各キューに直前の行を重ねて出し、行内タイムスタンプのタグも付ける
+    """
+    blocks = ["WEBVTT\nKind: captions\nLanguage: ja\n"]
+    prev = ""
+    for i, line in enumerate(lines):
+        start, end = i * CUE_SEC, (i + 1) * CUE_SEC
+        cue = f"{_timestamp(start, '.')} --> {_timestamp(end, '.')}"
+        if rolling:
+            mid = _timestamp(start + CUE_SEC / 2, ".")
+            half = len(line) // 2
+            text = f"{prev}\n{line[:half]}<{mid}><c>{line[half:]}</c>" if prev else line
+            blocks.append(f"{cue} align:start position:0%\n{text}\n")
+        else:
+            blocks.append(f"{cue}\n{line}\n")
+        prev = line
+    return "\n".join(blocks)
+
+
+def subtitle_kind(video_id: str, not_found_ratio: float, auto_ratio: float) -> str:
+    """動画の字幕の種類（"manual" / "auto" / "none"）を video_id から決める"""
+    x = (zlib.crc32(video_id.encode("utf-8")) % 10_000) / 10_000
+    if x < not_found_ratio:
+        return "none"
+    if x < not_found_ratio + auto_ratio:
+        return "auto"
+    return "manual"
+
+
+def synthetic_subtitle(video_id: str, cues: int, kind: str) -> str:
+    """手動字幕は SRT、自動生成字幕はロールアップ付きの VTT で返す"""
+    lines = make_lines(video_id, cues)
+    return to_vtt(lines, rolling=True) if kind == "auto" else to_srt(lines)
+
+
+class FakeYoutubeDL:
+    """
+    yt-dlp の YoutubeDL の代わりに合成字幕を返す（fetch_transcripts の ydl_factory 用）
+
+    extract_info() は字幕の URL だけを返し、urlopen() でその本文を返すので、
+    本物と同じく 1 本につき 2 回の「リクエスト」になる。latency を指定すると
+    それぞれでその秒数だけ待つ（ネットワークの待ち時間の代わり）
+    errors に {video_id: メッセージ} を渡すと、その動画の extract_info() は
+    毎回そのメッセージの例外を送出する（失敗の注入用）
+    """
+
+    def __init__(
+        self,
+        options: dict | None = None,
+        cues: int = 60,
+        latency: float = 0.0,
+        not_found_ratio: float = 0.05,
+        auto_ratio: float = 0.5,
+        on_request: Callable[[str], None] | None = None,
+        errors: dict[str, str] | None = None,
+    ):
+        self.langs = (options or {}).get("subtitleslangs") or ["ja"]
+        self.cues = cues
+        self.latency = latency
+        self.not_found_ratio = not_found_ratio
+        self.auto_ratio = auto_ratio
+        self.on_request = on_request
+        self.errors = errors or {}
+
+    def extract_info(self, url: str, download: bool = False) -> dict:
+        video_id = url.rsplit("v=", 1)[-1]
+        if self.on_request:
+            self.on_request(video_id)
+        if self.latency:
+            time.sleep(self.latency)
+        if video_id in self.errors:
+            raise RuntimeError(self.errors[video_id])
+        kind = subtitle_kind(video_id, self.not_found_ratio, self.auto_ratio)
+        lang = self.langs[0]
+        info = {"id": video_id, "subtitles": {}, "requested_subtitles": {}}
+        if kind != "none":
+            ext = "vtt" if kind == "auto" else "srt"
+            sub = {"ext": ext, "url": f"fake://{video_id}/{kind}.{ext}"}
+            info["requested_subtitles"][lang] = sub
+            if kind == "manual":
+                info["subtitles"][lang] = [sub]
+        return info
+
+    def urlopen(self, url: str) -> io.BytesIO:
+        if self.latency:
+            time.sleep(self.latency)
+        video_id, name = url.removeprefix("fake://").split("/")
+        text = synthetic_subtitle(video_id, self.cues, name.split(".")[0])
+        return io.BytesIO(text.encode("utf-8"))
+
+    def close(self) -> None:
+        pass
+
+
+def fake_ydl_factory(**kwargs) -> Callable[[dict], FakeYoutubeDL]:
+    """extract_subtitles_from_videos(ydl_factory=...) に渡す関数を返す"""
+    return lambda options: FakeYoutubeDL(options, **kwargs)
+
+
+class RequestClock:
+    """FakeYoutubeDL の on_request で動画ごとの開始時刻を記録する（スレッドセーフ）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = {}
+
+    def __call__(self, video_id: str) -> None:
+        with self._lock:
+            self.started.setdefault(video_id, time.perf_counter())
+
+
+def write_corpus(
+    output_dir: Path | str,
+    video_ids: list[str],
+    cues: int = 60,
+    not_found_ratio: float = 0.05,
+    auto_ratio: float = 0.5,
+    lang: str = "ja",
+) -> int:
+    """合成字幕を {video_id}.{lang}.srt / .vtt として書き出し、書いたバイト数を返す"""
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    total = 0
+    for video_id in video_ids:
+        kind = subtitle_kind(video_id, not_found_ratio, auto_ratio)
+        if kind == "none":
+            continue
+        ext = "vtt" if kind == "auto" else "srt"
+        data = synthetic_subtitle(video_id, cues, kind).encode("utf-8")
+        (output_dir / f"{video_id}.{lang}.{ext}").write_bytes(data)
+        total += len(data)
+    return total
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Write synthetic Japanese SRT/VTT files")
+    parser.add_argument("output_dir")
+    parser.add_argument("--videos", type=int, default=1000, help="number of videos")
+    parser.add_argument("--cues", type=int, default=60, help="cues per subtitle")
+    parser.add_argument(
+        "--auto-ratio", type=float, default=0.5, help="share of auto-generated (VTT) ones"
+    )
+    args = parser.parse_args()
+
+    video_ids = benchmark_video_ids(args.videos)
+    total = write_corpus(args.output_dir, video_ids, args.cues, auto_ratio=args.auto_ratio)
+    print(f"Wrote {total / 1024 / 1024:.1f} MB of subtitles to {args.output_dir}")
+
+
+if __name__ == "__main__":
+    main()
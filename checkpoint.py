@@ -0,0 +1,84 @@
+import json
+import os
+import shutil
+from pathlib import Path
+
+
+class RunCheckpoint:
+    """
+    長時間の実行を途中から再開するためのチェックポイント（ディレクトリ単位）
+
+    - save_stage / load_stage: ステージ全体の結果（プレイリストID、動画一覧など）を
+      JSON で保存・読込（一時ファイルに書いてから置き換える）
+    - append_rows / load_rows: 動画ごと・バッチごとの結果を JSON Lines で追記
+      （書くたびに fsync するので、強制終了しても書けた行は残る）
+    """
+
+    def __init__(self, path: Path | str):
+        self.path = Path(path)
+
+    def exists(self) -> bool:
+        return self.path.exists() and any(self.path.iterdir())
+
+    def clear(self) -> None:
+        """チェックポイントを削除（正常終了時・新規実行時）"""
+        if self.path.exists():
+            shutil.rmtree(self.path)
+
+    def _file(self, name: str, suffix: str) -> Path:
+        return self.path / f"{name}{suffix}"
+
+    def has_stage(self, name: str) -> bool:
+        return self._file(name, ".json").exists()
+
+    def save_stage(self, name: str, data) -> None:
+        self.path.mkdir(parents=True, exist_ok=True)
+        target = self._file(name, ".json")
+        tmp = target.with_suffix(".json.tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, default=str)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, target)
+
+    def load_stage(self, name: str, default=None):
+        target = self._file(name, ".json")
+        if not target.exists():
+            return default
+        with target.open("r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def append_rows(self, name: str, rows: list[dict]) -> None:
+        if not rows:
+            return
+        self.path.mkdir(parents=True, exist_ok=True)
+        target = self._file(name, ".jsonl")
+        # 前回が行の途中で終了していたら改行して区切る
+        broken = False
+        if target.exists() and target.stat().st_size:
+            with target.open("rb") as f:
+                f.seek(-1, os.SEEK_END)
+                broken = f.read(1) != b"\n"
+        with target.open("a", encoding="utf-8") as f:
+            if broken:
+                f.write("\n")
+            for row in rows:
+                f.write(json.dumps(row, ensure_ascii=False, default=str) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def load_rows(self, name: str) -> list[dict]:
+        target = self._file(name, ".jsonl")
+        if not target.exists():
+            return []
+        rows = []
+        with target.open("r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    rows.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue  # 書き込み途中で終了した行は捨てる
+        return rows
+
+    def done_ids(self, name: str, key: str = "video_id") -> set[str]:
+        return {row[key] for row in self.load_rows(name)}
@@ -0,0 +1,530 @@
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+from typing import TYPE_CHECKING
+
+from metrics import PROFILE_MODES
+from throttle import CircuitOpenError
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+### python cli.py <command> で段階ごとに実行する ###
+# crawl → details → subs → analyze の順に、前の段階の出力（OUTPUT_DIR の CSV・字幕キャッシュ）を
+# 入力にする。cron から新着のクロールだけ・手元のデータの再分析だけ、といった使い方ができる
+# queue enqueue → queue work（複数のプロセス・ホスト）→ queue merge で同じ処理を分担できる
+# 各コマンドは必要なモジュールだけを関数の中で読み込む（requests・yt-dlp・pyarrow は
+# 使うコマンドでだけ読み込まれる）。設定（.env・環境変数）も読み込むのはコマンドの実行時
+
+
+def start_reports(args: argparse.Namespace) -> None:
+    """終了時に段階ごとの計測値・実行レポートを書き出す（--profile ならプロファイルも）"""
+    import atexit
+
+    import main
+    import metrics
+
+    if args.profile:
+        metrics.get_metrics().enable_profiling(args.profile, main.PROFILE_DIR)
+    atexit.register(main.write_run_reports)
+
+
+def read_video_list(path) -> pd.DataFrame | None:
+    """前の段階が書いた動画一覧・動画詳細の CSV を読む（無ければ案内を表示して None）"""
+    import pandas as pd
+
+    if not path.exists():
+        print(f"ERROR: {path} not found. Run the previous step first.")
+        return None
+    return pd.read_csv(path, dtype={"video_id": str, "title": str}, encoding="utf-8-sig")
+
+
+def analyze_and_save(result: pd.DataFrame, corpus) -> pd.DataFrame:
+    """
+    統合済みの表を分析し、結果（OUTPUT_FORMAT）と出現回数行列をすべて置き換えて保存する
+    （字幕本文は TranscriptCorpus の corpus から読む）
+    """
+    import main
+    import metrics
+
+    with metrics.stage("analysis") as stage:
+        result_analyzed, hits = main.analyze_subtitles(result, corpus)
+        stage.add_rows(len(result_analyzed))
+    with metrics.stage("save") as stage:
+        stage.add_rows(len(result_analyzed))
+        if main.OUTPUT_FORMAT == "parquet":
+            main.save_to_parquet(result_analyzed, main.OUTPUT_DIR, True, corpus)
+        else:
+            main.save_to_csv(result_analyzed, main.OUTPUT_FILE, corpus)
+        main.save_keyword_hits(hits, merge=False)
+    return result_analyzed
+
+
+def cmd_crawl(args: argparse.Namespace) -> int:
+    """
+    VIDEO_IDS のチャンネルの動画一覧を取得し、VIDEO_LIST_FILE に書き出す
+    既に全プレイリストのクロール状態があれば新着だけを取得する（--full で全件）
+    一覧はクロール状態の既知の動画全体（TITLE_FILTER に合うもの）
+    """
+    import pandas as pd
+
+    import main
+    import metrics
+    import youtube_client
+    from crawl_state import CrawlState
+    from quota import QuotaExceededError
+
+    try:
+        api_key = youtube_client.require_api_key()
+    except ValueError as e:
+        print(f"ERROR: {e}")
+        return 1
+    if not main.VIDEO_IDS:
+        print("ERROR: VIDEO_IDS not set. Please check your .env file.")
+        return 1
+    main.check_output_settings()
+    start_reports(args)
+
+    try:
+        with metrics.stage("playlists"):
+            playlist_data = youtube_client.get_playlist_ids(main.VIDEO_IDS, api_key)
+    except QuotaExceededError:
+        # クロール状態も一覧もまだ変えていないので、割り当てのリセット後にそのまま実行し直せる
+        main.print_cache_reports()
+        print("Quota exhausted: the playlists were not looked up. Run the crawl again later.")
+        return main.EXIT_QUOTA_DEFERRED
+    playlist_ids = playlist_data["playlist_id"].tolist()
+    crawl_state = CrawlState(main.CRAWL_STATE_FILE)
+    incremental = not args.full and all(crawl_state.has_playlist(p) for p in playlist_ids)
+    with metrics.stage("crawl") as stage:
+        new_videos, deferred = main.crawl_with_quota(playlist_ids, crawl_state, incremental)
+        stage.add_rows(len(new_videos))
+
+    videos = crawl_state.all_videos(playlist_ids)
+    if main.TITLE_FILTER:
+        videos = [v for v in videos if main.TITLE_FILTER in v["title"]]
+    df = pd.DataFrame(videos, columns=["video_id", "title"]).drop_duplicates("video_id")
+    df.to_csv(main.VIDEO_LIST_FILE, index=False, encoding="utf-8-sig")
+    crawl_state.save(main.CRAWL_STATE_FILE)  # 一覧を保存してから既知の動画として記録
+
+    new_label = "new " if incremental else ""
+    print(f"{len(new_videos)} {new_label}videos found, {len(df)} listed: {main.VIDEO_LIST_FILE}")
+    main.print_cache_reports()
+    if deferred:
+        # 後回しにしたプレイリストはクロール状態を更新していないので、次回取得される
+        print(f"Quota exhausted: {len(deferred)} playlists deferred to the next run.")
+        return main.EXIT_QUOTA_DEFERRED
+    return 0
+
+
+def cmd_details(args: argparse.Namespace) -> int:
+    """
+    VIDEO_LIST_FILE の動画のうち、VIDEO_DETAILS_FILE に無いものの詳細を取得して追加する
+    （--refresh なら全動画を取り直す）。一覧から消えた動画は詳細からも除く
+    取得済みのチャンクはチェックポイントに残るので、中断・割り当て切れの後は続きから取得する
+    """
+    import main
+    import metrics
+    import youtube_client
+    from checkpoint import RunCheckpoint
+    from quota import PRIORITY_BACKFILL, PRIORITY_NEW_UPLOADS
+
+    try:
+        youtube_client.require_api_key()
+    except ValueError as e:
+        print(f"ERROR: {e}")
+        return 1
+    videos = read_video_list(main.VIDEO_LIST_FILE)
+    if videos is None:
+        return 1
+    main.check_output_settings()
+    start_reports(args)
+
+    known = set()
+    if main.VIDEO_DETAILS_FILE.exists() and not args.refresh:
+        known = set(read_video_list(main.VIDEO_DETAILS_FILE)["video_id"])
+    video_ids = [v for v in videos["video_id"] if v not in known]
+    print(f"Getting details of {len(video_ids)} videos ({len(known)} already saved)...")
+
+    checkpoint = RunCheckpoint(main.DETAILS_CHECKPOINT_DIR)
+    with metrics.stage("details") as stage:
+        details, deferred_ids = main.get_details_with_checkpoint(
+            video_ids,
+            checkpoint,
+            PRIORITY_NEW_UPLOADS if known else PRIORITY_BACKFILL,
+        )
+        stage.add_rows(len(details))
+    details = main.merge_with_previous(details, main.VIDEO_DETAILS_FILE)
+    details = details[details["video_id"].isin(videos["video_id"])]
+    details.to_csv(main.VIDEO_DETAILS_FILE, index=False, encoding="utf-8-sig")
+    checkpoint.clear()
+
+    print(f"✓Save video details: {main.VIDEO_DETAILS_FILE} ({len(details)} videos)")
+    main.print_cache_reports()
+    if deferred_ids:
+        print(
+            f"Quota exhausted: details of {len(deferred_ids)} videos deferred "
+            "to the next run."
+        )
+        return main.EXIT_QUOTA_DEFERRED
+    return 0
+
+
+def cmd_subs(args: argparse.Namespace) -> int:
+    """
+    VIDEO_LIST_FILE の動画の字幕を字幕キャッシュ（TRANSCRIPT_CACHE）に取得する（API キー不要）
+    キャッシュにある動画はダウンロードしない。CHECKPOINT_CHUNK 本ずつ処理し、本文は溜めない
+    """
+    import main
+    import metrics
+    from fetch_transcripts import extract_subtitles_from_videos, open_transcript_cache
+
+    videos = read_video_list(main.VIDEO_LIST_FILE)
+    if videos is None:
+        return 1
+    start_reports(args)
+
+    video_ids = videos["video_id"].tolist()
+    transcript_cache = open_transcript_cache()
+    statuses = {}
+    with metrics.stage("subtitles") as stage:
+        for i in range(0, len(video_ids), main.CHECKPOINT_CHUNK):
+            df = extract_subtitles_from_videos(
+                video_ids[i : i + main.CHECKPOINT_CHUNK], cache=transcript_cache
+            )
+            for status, n in df["subtitle_status"].value_counts().items():
+                statuses[status] = statuses.get(status, 0) + int(n)
+            stage.add_rows(len(df))
+    main.update_transcript_index(transcript_cache)
+
+    print(f"\nSubtitles of {len(video_ids)} videos: {statuses}")
+    print("[Transcript cache]")
+    print(f"  {transcript_cache.report()}")
+    transcript_cache.close()
+    return 0
+
+
+def cmd_analyze(args: argparse.Namespace) -> int:
+    """
+    VIDEO_DETAILS_FILE の動画を字幕キャッシュの本文でキーワード分析し、結果を保存する
+    API・ネットワークは使わない（キャッシュに無い字幕は subtitle_error="not cached" の行になる）
+    結果（OUTPUT_FILE または Parquet）と出現回数行列は毎回すべて置き換える
+    --rescore なら保存済みの出現回数行列から判定だけを計算し直す
+    """
+    import tempfile
+
+    import pandas as pd
+
+    import main
+    import metrics
+    from fetch_transcripts import extract_subtitles_from_videos, open_transcript_cache
+    from transcript_corpus import CorpusWriter, TranscriptCorpus
+
+    if args.rescore:
+        if not main.KEYWORD_HITS_FILE.exists():
+            print(f"ERROR: {main.KEYWORD_HITS_FILE} not found. Run the analysis first.")
+            return 1
+        try:
+            total = main.rescore()
+        except ValueError as e:
+            print(f"ERROR: {e}")
+            return 1
+        print(
+            f"Rescored {total} videos (threshold: {main.THRESHOLD}): "
+            f"{main.KEYWORD_SCORES_FILE}"
+        )
+        return 0
+
+    details = read_video_list(main.VIDEO_DETAILS_FILE)
+    if details is None:
+        return 1
+    main.check_output_settings()
+    start_reports(args)
+
+    # 字幕本文はメモリに溜めず、一時ディレクトリのコーパスに書いてから分析する（main.py と同じ）
+    transcript_cache = open_transcript_cache()
+    with tempfile.TemporaryDirectory(prefix="ytca-analyze-") as tmp_dir:
+        with metrics.stage("subtitles") as stage, CorpusWriter(tmp_dir) as corpus_writer:
+            subtitles = extract_subtitles_from_videos(
+                details["video_id"].tolist(),
+                cache=transcript_cache,
+                corpus=corpus_writer,
+                download=False,
+            )
+            stage.add_rows(len(subtitles))
+        corpus = TranscriptCorpus(tmp_dir)
+        result = pd.merge(details, subtitles, on="video_id", how="outer")
+        result_analyzed = analyze_and_save(result, corpus)
+        corpus.close()
+    transcript_cache.close()
+
+    missing = int((subtitles["subtitle_error"] == "not cached").sum())
+    if missing:
+        print(f"  {missing} videos have no cached subtitles. Run `python cli.py subs` first.")
+    print(f"Analysis finished: {len(result_analyzed)} videos")
+    return 0
+
+
+def cmd_queue_enqueue(args: argparse.Namespace) -> int:
+    """VIDEO_IDS のチャンネルのプレイリストを作業キューに登録する（--reset で前回のキューを消す）"""
+    import main
+    import metrics
+    import youtube_client
+
+    try:
+        api_key = youtube_client.require_api_key()
+    except ValueError as e:
+        print(f"ERROR: {e}")
+        return 1
+    if not main.VIDEO_IDS:
+        print("ERROR: VIDEO_IDS not set. Please check your .env file.")
+        return 1
+
+    start_reports(args)
+
+    queue = main.open_work_queue()
+    if args.reset:
+        queue.clear()
+    try:
+        with metrics.stage("playlists"):
+            playlist_data = youtube_client.get_playlist_ids(main.VIDEO_IDS, api_key)
+    except QuotaExceededError:
+        # クロール状態も一覧もまだ変えていないので、割り当てのリセット後にそのまま実行し直せる
+        main.print_cache_reports()
+        print("Quota exhausted: the playlists were not looked up. Run the crawl again later.")
+        return main.EXIT_QUOTA_DEFERRED
+    playlist_ids = playlist_data["playlist_id"].tolist()
+    added = main.enqueue_playlists(queue, playlist_ids)
+    print(f"{added} of {len(playlist_ids)} playlists queued in {main.WORK_QUEUE_DIR}.")
+    if added < len(playlist_ids):
+        print("  The others are already queued. Use --reset to start a new crawl.")
+    print(f"  Queue: {queue.report()}")
+    queue.close()
+    main.print_cache_reports()
+    return 0
+
+
+def cmd_queue_work(args: argparse.Namespace) -> int:
+    """作業キューのタスク（プレイリストのクロール・動画のシャード）を取って実行する"""
+    import socket
+
+    import main
+    import youtube_client
+
+    try:
+        youtube_client.require_api_key()
+    except ValueError as e:
+        print(f"ERROR: {e}")
+        return 1
+    start_reports(args)
+
+    worker = args.worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    queue = main.open_work_queue()
+    try:
+        return main.run_queue_worker(queue, worker, args.max_tasks)
+    finally:
+        queue.close()
+
+
+def cmd_queue_status(args: argparse.Namespace) -> int:
+    """作業キューの種類・状態ごとのタスク数と、失敗したタスクを表示する"""
+    import main
+
+    queue = main.open_work_queue()
+    print(f"Queue ({main.WORK_QUEUE_DIR}): {queue.report()}")
+    for kind, key, error in queue.errors():
+        print(f"  failed {kind} {key}: {error}")
+    queue.close()
+    return 0
+
+
+def cmd_queue_merge(args: argparse.Namespace) -> int:
+    """
+    作業キューの結果を集めて分析し、main.py と同じ結果の表を保存する
+    実行待ち・実行中・失敗したタスクがあるときは --partial を付けないと実行しない
+    """
+    import tempfile
+
+    import main
+    import metrics
+    from transcript_corpus import CorpusWriter, TranscriptCorpus
+
+    queue = main.open_work_queue()
+    counts = queue.counts()
+    incomplete = sum(
+        n for statuses in counts.values() for status, n in statuses.items() if status != "done"
+    )
+    if incomplete and not args.partial:
+        print(f"ERROR: The queue is not finished ({queue.report()}).")
+        print("  Run more workers, or merge what is done with --partial.")
+        queue.close()
+        return 1
+    main.check_output_settings()
+    start_reports(args)
+
+    with tempfile.TemporaryDirectory(prefix="ytca-merge-") as tmp_dir:
+        with metrics.stage("merge") as stage, CorpusWriter(tmp_dir) as corpus_writer:
+            result = main.load_queue_results(queue, corpus_writer)
+            stage.add_rows(len(result))
+        queue.close()
+        corpus = TranscriptCorpus(tmp_dir)
+        result_analyzed = analyze_and_save(result, corpus)
+        corpus.close()
+    print(f"Merged {len(result_analyzed)} videos: {main.output_location()}")
+    return 0
+
+
+# export の出力形式（拡張子で選ぶ）
+EXPORT_FORMATS = (".csv", ".parquet", ".jsonl")
+
+
+def cmd_export(args: argparse.Namespace) -> int:
+    """
+    保存済みの分析結果（OUTPUT_FORMAT の CSV または Parquet データセット）を
+    1 つのファイル（.csv / .parquet / .jsonl）に書き出す
+    --no-subtitles なら字幕本文の列を含めない（ダッシュボード用など）
+    """
+    from pathlib import Path
+
+    import pandas as pd
+
+    import main
+
+    path = Path(args.path)
+    if path.suffix not in EXPORT_FORMATS:
+        print(f"ERROR: Output file must end with one of {', '.join(EXPORT_FORMATS)}: {path}")
+        return 1
+
+    if main.OUTPUT_FORMAT == "parquet":
+        import parquet_output
+
+        df = parquet_output.read_metrics(main.OUTPUT_DIR)
+        if not args.no_subtitles and not df.empty:
+            transcripts = parquet_output.read_transcripts(main.OUTPUT_DIR)
+            df = df.merge(transcripts[["video_id", "subtitles"]], on="video_id", how="left")
+    elif main.OUTPUT_FILE.exists():
+        df = pd.read_csv(main.OUTPUT_FILE, dtype={"video_id": str}, encoding="utf-8-sig")
+        if args.no_subtitles:
+            df = df.drop(columns=["subtitles"], errors="ignore")
+    else:
+        df = pd.DataFrame()
+    if df.empty:
+        print("ERROR: No analysis results found. Run `python cli.py analyze` first.")
+        return 1
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if path.suffix == ".csv":
+        df.to_csv(path, index=False, encoding="utf-8-sig")
+    elif path.suffix == ".parquet":
+        df.to_parquet(path, index=False)
+    else:
+        df.to_json(path, orient="records", lines=True, force_ascii=False, date_format="iso")
+    print(f"✓Exported {len(df)} videos: {path}")
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="YouTube channel analysis pipeline, one step at a time"
+    )
+    parser.add_argument(
+        "--env-file", help="read settings from this file instead of .env"
+    )
+    parser.add_argument("--output-dir", help="override OUTPUT_DIR")
+    parser.add_argument("--state-dir", help="override STATE_DIR")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    def add(name: str, func, help: str, group=None) -> argparse.ArgumentParser:
+        sub = (group or subparsers).add_parser(name, help=help, description=help)
+        sub.set_defaults(func=func)
+        if func not in (cmd_export, cmd_queue_status):
+            sub.add_argument(
+                "--profile",
+                nargs="?",
+                const="cprofile",
+                choices=PROFILE_MODES,
+                help="profile each stage with cProfile (default) or by sampling every "
+                "thread's stack",
+            )
+        return sub
+
+    crawl = add("crawl", cmd_crawl, "list the channels' videos (new uploads only once crawled)")
+    crawl.add_argument(
+        "--full", action="store_true", help="crawl every video again (drops deleted videos)"
+    )
+    details = add("details", cmd_details, "get details of listed videos not fetched yet")
+    details.add_argument(
+        "--refresh", action="store_true", help="fetch the details of every listed video again"
+    )
+    add("subs", cmd_subs, "download subtitles of listed videos into the transcript cache")
+    analyze = add(
+        "analyze", cmd_analyze, "analyze cached subtitles of the fetched videos (no API key)"
+    )
+    analyze.add_argument(
+        "--rescore",
+        action="store_true",
+        help="only recompute scores from the saved hit matrix with the current THRESHOLD "
+        "and categories",
+    )
+    export = add("export", cmd_export, "write the saved analysis results to one file")
+    export.add_argument("path", help="output file (.csv, .parquet or .jsonl)")
+    export.add_argument(
+        "--no-subtitles", action="store_true", help="leave out the subtitle text"
+    )
+
+    # 作業キュー: enqueue → 複数のホスト・プロセスで work → merge
+    queue = subparsers.add_parser(
+        "queue", help="crawl with several workers sharing a work queue directory"
+    )
+    queue_commands = queue.add_subparsers(dest="queue_command", required=True)
+    enqueue = add(
+        "enqueue", cmd_queue_enqueue, "queue the channels' playlists", queue_commands
+    )
+    enqueue.add_argument(
+        "--reset", action="store_true", help="drop the previous queue and its results"
+    )
+    work = add(
+        "work", cmd_queue_work, "claim and run queued tasks until none are left",
+        queue_commands,
+    )
+    work.add_argument("--worker-id", help="name of this worker (default: host-pid)")
+    work.add_argument("--max-tasks", type=int, help="stop after this many tasks")
+    add("status", cmd_queue_status, "show task counts and failures", queue_commands)
+    merge = add(
+        "merge", cmd_queue_merge, "analyze the workers' results into one table",
+        queue_commands,
+    )
+    merge.add_argument(
+        "--partial", action="store_true", help="merge even if some tasks are not done"
+    )
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+
+    # 設定はモジュールを読み込む前に決める（各モジュールは読み込み時に環境変数を読む）
+    from dotenv import load_dotenv
+
+    if args.env_file:
+        load_dotenv(args.env_file)
+    load_dotenv()
+    if args.output_dir:
+        os.environ["OUTPUT_DIR"] = args.output_dir
+    if args.state_dir:
+        os.environ["STATE_DIR"] = args.state_dir
+    try:
+        return args.func(args)
+    except CircuitOpenError as e:
+        # 制限が続いて諦めた（次の実行は前回までの出力・キャッシュの続きから始まる）
+        import main
+
+        print(f"Still throttled after repeated cooldowns ({e}). Try again later.")
+        main.print_cache_reports()
+        return main.EXIT_THROTTLED
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,76 @@
+import json
+import os
+import time
+from pathlib import Path
+
+
+class CrawlState:
+    """
+    プレイリストごとのクロール状態（既知の動画一覧）を JSON ファイルに保存する
+
+    uploads プレイリスト（UU~~）は新しい順に並ぶため、先頭から読んで
+    既知の動画に到達した時点でページ送りを打ち切れる
+
+    形式:
+        {playlist_id: {"newest_video_id": str, "updated_at": float,
+                       "videos": [{"video_id": str, "title": str}, ...]}}  # 新しい順
+    """
+
+    def __init__(self, path: Path | str):
+        self.path = Path(path)
+        self._playlists = {}
+        if self.path.exists():
+            with self.path.open("r", encoding="utf-8") as f:
+                self._playlists = json.load(f)
+
+    def has_playlist(self, playlist_id: str) -> bool:
+        return playlist_id in self._playlists
+
+    def newest_video_id(self, playlist_id: str) -> str | None:
+        return self._playlists.get(playlist_id, {}).get("newest_video_id")
+
+    def known_videos(self, playlist_id: str) -> list[dict]:
+        """既知の動画（新しい順）"""
+        return self._playlists.get(playlist_id, {}).get("videos", [])
+
+    def known_video_ids(self, playlist_id: str) -> set[str]:
+        return {v["video_id"] for v in self.known_videos(playlist_id)}
+
+    def all_videos(self, playlist_ids: list[str] | None = None) -> list[dict]:
+        """指定したプレイリスト（None なら全プレイリスト）の既知の動画"""
+        if playlist_ids is None:
+            playlist_ids = list(self._playlists)
+        return [v for p in playlist_ids for v in self.known_videos(p)]
+
+    def update(
+        self, playlist_id: str, new_videos: list[dict], replace: bool = False
+    ) -> None:
+        """
+        新しく見つかった動画（新しい順）を先頭に追加する
+        replace=True（全件クロール時）は既知の一覧を置き換え、削除された動画を除く
+        """
+        videos = list(new_videos)
+        if not replace:
+            new_ids = {v["video_id"] for v in videos}
+            videos += [
+                v
+                for v in self.known_videos(playlist_id)
+                if v["video_id"] not in new_ids
+            ]
+        self._playlists[playlist_id] = {
+            "newest_video_id": videos[0]["video_id"] if videos else None,
+            "updated_at": time.time(),
+            "videos": videos,
+        }
+
+    def save(self, path: Path | str | None = None) -> None:
+        """
+        一時ファイルに書いてから置き換える（途中で落ちても壊れないように）
+        path を指定すると別の場所に保存する（再開用チェックポイントなど）
+        """
+        path = Path(path) if path is not None else self.path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump(self._playlists, f, ensure_ascii=False)
+        os.replace(tmp, path)
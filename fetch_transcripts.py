@@ -1,13 +1,28 @@
+from __future__ import annotations
+
 import os
 import re
-import shutil
-import random, time
+import html
+import threading
+import time
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import TYPE_CHECKING
 
 from pathlib import Path
 from dotenv import load_dotenv
 
 import pandas as pd
-from yt_dlp import YoutubeDL
+
+import metrics
+from throttle import AdaptiveLimiter, CircuitOpenError
+from transcript_cache import TranscriptCache
+from transcript_corpus import CorpusWriter
+
+if TYPE_CHECKING:
+    # yt-dlp は読み込みに時間がかかるので、実際にダウンロードするときだけ読み込む
+    from yt_dlp import YoutubeDL
 
 
 load_dotenv()
@@ -15,8 +30,138 @@ load_dotenv()
 # --- 設定 ---
 # 抽出したい字幕の言語コード（複数指定可能）
 SUBTITLE_LANGS = os.getenv("SUBTITLE_LANGS", "ja").split(",")  # 例: ["ja", "en"]
-# 字幕ファイルを一時保存するディレクトリ
-TMP_SUB_DIR = Path("tmp_subs")
+# 字幕ダウンロードの並列数（開始時の値。制限されずに速く返る間は SUBTITLE_MAX_WORKERS まで増やす）
+SUBTITLE_WORKERS = int(os.getenv("SUBTITLE_WORKERS", "4"))
+SUBTITLE_MAX_WORKERS = int(os.getenv("SUBTITLE_MAX_WORKERS", "8"))
+# 全ワーカー合計での yt-dlp リクエスト数（回/秒）。開始時の値で、SUBTITLE_MAX_RATE まで増やす
+SUBTITLE_RATE = float(os.getenv("SUBTITLE_RATE", "1.5"))
+SUBTITLE_MAX_RATE = float(os.getenv("SUBTITLE_MAX_RATE", "3"))
+# 一時的な失敗（429・ボット確認・タイムアウトなど）の動画を取り直す回数
+SUBTITLE_RETRIES = int(os.getenv("SUBTITLE_RETRIES", "3"))
+# 1 リクエストがこの秒数より長くかかったら並列数を減らす
+SUBTITLE_TARGET_LATENCY = 15.0
+
+# 字幕キャッシュ（永続ストア）の保存先・有効期限・サイズ上限
+TRANSCRIPT_CACHE = Path(os.getenv("TRANSCRIPT_CACHE", "cache/transcripts.sqlite3"))
+TRANSCRIPT_CACHE_TTL_DAYS = float(os.getenv("TRANSCRIPT_CACHE_TTL_DAYS", "30"))
+TRANSCRIPT_CACHE_MAX_MB = float(os.getenv("TRANSCRIPT_CACHE_MAX_MB", "1024"))
+
+# 結果 DataFrame の列
+SUBTITLE_COLUMNS = [
+    "video_id",
+    "subtitles",
+    "subtitle_lang",
+    "subtitle_kind",
+    "subtitle_status",
+    "subtitle_error",
+]
+# 取得できなかった行の subtitle_status（キャッシュ・チェックポイントに残さず、次回取り直す）
+# error: 取得に失敗した / deferred: 一時的な失敗（制限など）が取り直しても続いた・回路が開いて送らなかった
+RETRY_STATUSES = ("error", "deferred")
+
+
+# SRT/VTT の不要な行を判定する正規表現（モジュール読み込み時に 1 度だけコンパイル）
+_INDEX_RE = re.compile(r"\d+")  # 行全体が1つ以上の数字のみで構成されている場合
+_TIMESTAMP_RE = re.compile(
+    r"(?:\d{2,}:)?\d{2}:\d{2}[,.]\d{3} --> "
+)  # 行の先頭がタイムスタンプ形式で始まっている場合
+# 次の空行までブロックごと読み飛ばす VTT のヘッダ・メタデータ（ブロックの先頭行にだけ照合する）
+_VTT_BLOCK_RE = re.compile(r"(?:WEBVTT|NOTE|STYLE|REGION)(?:[ \t]|$)")
+# 行内タグ（<c>, </c>, <00:00:01.234>, <i> など）
+_INLINE_TAG_RE = re.compile(r"<[^>]*>")
+# 自動生成字幕のロールアップ表示で、同じ行が再登場しうる直近の行数
+_ROLLING_WINDOW = 3
+
+# 制限された（速度を落とすべき）ことを示す yt-dlp のエラー
+_THROTTLED_RE = re.compile(
+    r"HTTP Error (?:429|403)|Too Many Requests|confirm you.?re not a bot", re.IGNORECASE
+)
+# 取り直せば成功しうるエラー（制限されたものを含む）
+_TRANSIENT_RE = re.compile(
+    r"HTTP Error 5\d\d|timed? ?out|Connection (?:reset|refused|aborted)"
+    r"|Temporary failure|Remote end closed",
+    re.IGNORECASE,
+)
+
+# 字幕テキストの抽出方法を変えたら上げる（古い方法で作ったキャッシュは再取得する）
+SUBTITLE_PARSER_VERSION = 2
+
+
+def _dedupe_rolling_lines(lines: Iterable[str]) -> Iterator[str]:
+    """
+    自動生成 VTT のロールアップ字幕で繰り返される行を 1 回にまとめる
+
+    - 直近 _ROLLING_WINDOW 行と同じ行は読み飛ばす
+    - 直前の行が伸びただけの行（前方一致）は、増えた部分だけを返す
+    - 直前の行の先頭部分だけの行は読み飛ばす
+    """
+    recent = deque(maxlen=_ROLLING_WINDOW)
+    prev = ""
+    for line in lines:
+        if line in recent or prev.startswith(line):
+            continue
+        if prev and line.startswith(prev):
+            yield line[len(prev) :]
+        else:
+            yield line
+        recent.append(line)
+        prev = line
+
+
+def iter_subtitle_lines(
+    data: str | bytes | Iterable[str], dedupe: bool = False
+) -> Iterator[str]:
+    """
+    SRT/VTT の本文行だけを順に返す（番号・タイムスタンプ・ヘッダ・行内タグを除く）
+
+    data は字幕全体の str / bytes（UTF-8）、または行を返すイテラブル（ファイルなど）
+    dedupe=True なら自動生成字幕のロールアップによる重複行をまとめる
+    """
+    lines = _iter_cue_text(data)
+    return _dedupe_rolling_lines(lines) if dedupe else lines
+
+
+def _iter_cue_text(data: str | bytes | Iterable[str]) -> Iterator[str]:
+    """字幕の各行から本文だけを取り出す（重複はそのまま）"""
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        data = bytes(data).decode("utf-8-sig", errors="ignore")
+    lines = data.splitlines() if isinstance(data, str) else data
+
+    in_block = False
+    block_start = True
+    for line in lines:
+        line = line.strip()
+
+        if not line:  # 空行でブロックが終わる
+            in_block = False
+            block_start = True
+            continue
+        if in_block:
+            continue
+        if block_start:
+            block_start = False
+            if _VTT_BLOCK_RE.match(line):
+                in_block = True  # "Kind: captions" などヘッダの続きも飛ばす
+                continue
+        if _INDEX_RE.fullmatch(line) or _TIMESTAMP_RE.match(line):
+            continue
+
+        if "<" in line:
+            line = _INLINE_TAG_RE.sub("", line).strip()
+        if "&" in line:
+            line = html.unescape(line)
+        if line:
+            yield line
+
+
+def parse_subtitle_text(
+    data: str | bytes | Iterable[str], dedupe: bool = False
+) -> str:
+    """
+    SRT/VTT から、タイムスタンプや番号・行内タグを削除した純粋なテキストを返す
+    dedupe=True なら自動生成字幕のロールアップによる重複行をまとめる
+    """
+    return "".join(iter_subtitle_lines(data, dedupe=dedupe))
 
 
 def subtitle_file_to_text(path: Path) -> str:
@@ -25,117 +170,334 @@ def subtitle_file_to_text(path: Path) -> str:
     """
     if not path.exists():
         return ""
-    lines_out = []
     with path.open("r", encoding="utf-8", errors="ignore") as f:
-        for line in f:
-            line = line.strip()
+        return parse_subtitle_text(f)
 
-            # SRT/VTTの不要な行をスキップ (番号, タイムスタンプ, ヘッダ)
-            if (
-                not line  # 空行
-                or re.fullmatch(
-                    r"\d+", line
-                )  # 行全体が1つ以上の数字のみで構成されている場合
-                or re.match(
-                    r"^\d{2}:\d{2}:\d{2}[,.]\d{3} --> ", line
-                )  # 行の先頭がタイムスタンプ形式で始まっている場合
-                or line.startswith("WEBVTT")
-                or line.startswith("NOTE")
-            ):
-                continue  # はスキップ
 
-            lines_out.append(line)
+def _ydl_options() -> dict:
+    """
+    yt-dlp オプション: ダウンロードはスキップし、字幕のみを取得
+    字幕の指定は extract_info(download=False) で requested_subtitles を得るために使う
+    """
+    return {
+        "skip_download": True,  # 動画本体はダウンロードしない
+        "writesubtitles": True,  # 字幕を対象にする
+        "writeautomaticsub": True,  # 自動生成字幕も対象にする
+        "subtitleslangs": SUBTITLE_LANGS,  # 指定言語の字幕を取得
+        "subtitlesformat": "srt/vtt",  # 字幕フォーマット
+        "quiet": True,  # ログを抑制
+        "no_warnings": True,  # 警告を抑制
+        "ignoreerrors": False,  # エラーは失敗行として記録するため例外で受け取る
+    }
+
+
+def _new_youtube_dl(options: dict) -> YoutubeDL:
+    from yt_dlp import YoutubeDL
 
-    return "".join(lines_out)
+    return YoutubeDL(options)
 
 
-def find_downloaded_subfile(video_id: str) -> Path | None:
+class _WorkerYDL:
     """
-    一時ディレクトリから、指定言語の字幕ファイルを探す
+    ワーカースレッドごとに YoutubeDL インスタンスを 1 つだけ作り、使い回す
+    factory はオプションを受け取ってインスタンスを返す（省略時は YoutubeDL）
     """
+
+    def __init__(self, factory: Callable[[dict], YoutubeDL] | None = None):
+        self._factory = factory or _new_youtube_dl
+        self._local = threading.local()
+        self._instances = []
+        self._lock = threading.Lock()
+
+    def get(self) -> YoutubeDL:
+        ydl = getattr(self._local, "ydl", None)
+        if ydl is None:
+            ydl = self._factory(_ydl_options())
+            self._local.ydl = ydl
+            with self._lock:
+                self._instances.append(ydl)
+        return ydl
+
+    def close(self) -> None:
+        with self._lock:
+            for ydl in self._instances:
+                ydl.close()
+            self._instances.clear()
+
+
+def _result_row(
+    video_id: str,
+    subtitles: str = "",
+    lang: str = "",
+    kind: str = "",
+    status: str = "ok",
+    error: str = "",
+) -> dict:
+    return {
+        "video_id": video_id,
+        "subtitles": subtitles,
+        "subtitle_lang": lang,
+        "subtitle_kind": kind,
+        "subtitle_status": status,
+        "subtitle_error": error,
+    }
+
+
+def _select_subtitle(info: dict) -> tuple[str, dict] | None:
+    """yt-dlp が選んだ字幕（requested_subtitles）から SUBTITLE_LANGS の順で 1 つ選ぶ"""
+    requested = info.get("requested_subtitles") or {}
     for lang in SUBTITLE_LANGS:
-        for ext in ("srt", "vtt"):
-            p = TMP_SUB_DIR / f"{video_id}.{lang}.{ext}"
-            if p.exists():
-                return p
+        if lang in requested:
+            return lang, requested[lang]
     return None
 
 
-def extract_subtitles_from_videos(video_ids: list[str]) -> pd.DataFrame:
+_subtitle_limiter: AdaptiveLimiter | None = None
+_subtitle_limiter_lock = threading.Lock()
+
+
+def get_subtitle_limiter() -> AdaptiveLimiter:
     """
-    字幕をダウンロードし、抽出
+    yt-dlp のリクエストの並列数・頻度を調整する共有の AdaptiveLimiter
+    （--stream のバッチをまたいで、調整した値を引き継ぐ）
     """
-    data = []
-
-    for cnt, video_id in enumerate(video_ids):
-        video_url = f"https://www.youtube.com/watch?v={video_id}"
-
-        # キャッシュディレクトリ作成
-        TMP_SUB_DIR.mkdir(exist_ok=True, parents=True)
-
-        # yt-dlp オプション: ダウンロードはスキップし、字幕のみを取得
-        ydl_opts = {
-            "skip_download": True,  # 動画本体はダウンロードしない
-            "writesubtitles": True,  # 字幕をダウンロードする
-            "writeautomaticsub": True,  # 自動生成字幕もダウンロードする
-            "subtitleslangs": SUBTITLE_LANGS,  # 指定言語の字幕を取得
-            "subtitlesformat": "srt/vtt",  # 字幕フォーマット
-            "outtmpl": str(
-                TMP_SUB_DIR / "%(id)s.%(ext)s"
-            ),  # 保存パスとファイル名のテンプレート
-            "quiet": True,  # ログを抑制
-            "no_warnings": True,  # 警告を抑制
-            "ignoreerrors": True,  # エラーを無視して続行
-        }
+    global _subtitle_limiter
+    with _subtitle_limiter_lock:
+        if _subtitle_limiter is None:
+            _subtitle_limiter = AdaptiveLimiter(
+                "subtitles",
+                SUBTITLE_WORKERS,
+                max_concurrency=SUBTITLE_MAX_WORKERS,
+                rate=SUBTITLE_RATE,
+                max_rate=max(SUBTITLE_RATE, SUBTITLE_MAX_RATE),
+                target_latency=SUBTITLE_TARGET_LATENCY,
+            )
+    return _subtitle_limiter
+
 
+def _limited(limiter: AdaptiveLimiter, call: str, func: Callable, *args):
+    """limiter の枠の中で yt-dlp のリクエストを 1 つ送る（429・ボット確認なら制限として記録）"""
+    with limiter.slot() as slot:
+        metrics.inc("ytdlp_requests", call=call)
         try:
-            with YoutubeDL(ydl_opts) as ydl:
-                ydl.download([video_url])
+            return func(*args)
+        except Exception as e:
+            if _THROTTLED_RE.search(str(e)):
+                slot.throttled()
+            raise
 
-            sub_path = find_downloaded_subfile(video_id)
 
-            subtitles = subtitle_file_to_text(sub_path) if sub_path else ""
-            data.append({"video_id": video_id, "subtitles": subtitles})
+def _read_url(ydl: YoutubeDL, url: str) -> bytes:
+    with ydl.urlopen(url) as resp:
+        return resp.read()
 
-            if not sub_path:
-                print(f"No subtitles were found for {video_id}.")
 
-        except Exception as e:
-            print(f"Failed to extract subtitles for {video_id}: {e}")
+def _fetch_one(video_id: str, ydls: _WorkerYDL, limiter: AdaptiveLimiter) -> dict:
+    """
+    1 本分の字幕を取得し、結果行（失敗時も含む）を返す
+    字幕はファイルに書き出さず、メモリ上で取得・解析する
+    所要時間・結果・取得したバイト数は metrics に記録する
+    """
+    start = time.perf_counter()
+    row = _download_and_parse(video_id, ydls, limiter)
+    metrics.observe("subtitle_fetch_seconds", time.perf_counter() - start)
+    metrics.inc("subtitle_fetches", status=row["subtitle_status"])
+    return row
 
-        if cnt % 25 == 0 and cnt > 0:
-            print(f"Processed {cnt} videos so far...")
-        time.sleep(random.uniform(0.5, 1.0))
 
-    df = pd.DataFrame(data)
-    return df
+def _download_and_parse(
+    video_id: str, ydls: _WorkerYDL, limiter: AdaptiveLimiter
+) -> dict:
+    """
+    一時的な失敗（制限・タイムアウトなど）と、回路が開いて送らなかったものは
+    subtitle_status="deferred" の行にする（呼び出し側が取り直す）
+    """
+    video_url = f"https://www.youtube.com/watch?v={video_id}"
+    try:
+        ydl = ydls.get()
+        info = _limited(
+            limiter, "extract_info", ydl.extract_info, video_url, False
+        ) or {}
+
+        selected = _select_subtitle(info)
+        if selected is None:
+            return _result_row(video_id, kind="none", status="not_found")
+        lang, sub = selected
+
+        # 字幕データが info に含まれていなければ URL から取得
+        data = sub.get("data")
+        if data is None:
+            data = _limited(limiter, "urlopen", _read_url, ydl, sub["url"])
+        metrics.inc(
+            "subtitle_bytes", len(data.encode("utf-8") if isinstance(data, str) else data)
+        )
+
+        kind = "manual" if lang in (info.get("subtitles") or {}) else "auto"
+        text = parse_subtitle_text(data, dedupe=kind == "auto")
+        return _result_row(video_id, text, lang, kind)
+
+    except CircuitOpenError as e:
+        return _result_row(video_id, status="deferred", error=f"{type(e).__name__}: {e}")
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+        if _THROTTLED_RE.search(error) or _TRANSIENT_RE.search(error):
+            return _result_row(video_id, status="deferred", error=error)
+        return _result_row(video_id, status="error", error=error)
+
+
+def open_transcript_cache() -> TranscriptCache:
+    """設定値（TRANSCRIPT_CACHE_*）で字幕キャッシュを開く"""
+    return TranscriptCache(
+        TRANSCRIPT_CACHE,
+        version=SUBTITLE_PARSER_VERSION,
+        ttl_sec=TRANSCRIPT_CACHE_TTL_DAYS * 24 * 60 * 60,
+        max_bytes=int(TRANSCRIPT_CACHE_MAX_MB * 1024 * 1024),
+    )
 
 
-def delete_temp_directory(temp_dir: Path):
+def extract_subtitles_from_videos(
+    video_ids: list[str],
+    max_workers: int | None = None,
+    rate: float | None = None,
+    cache: TranscriptCache | None = None,
+    on_result: Callable[[dict], None] | None = None,
+    corpus: CorpusWriter | None = None,
+    ydl_factory: Callable[[dict], YoutubeDL] | None = None,
+    download: bool = True,
+) -> pd.DataFrame:
     """
-    一時ディレクトリを全て削除する
+    字幕をダウンロードし、抽出
+
+    cache を渡した場合はまずキャッシュを参照し、ミス（未取得・期限切れ）の動画だけ
+    ダウンロードして結果をキャッシュに保存する
+    ワーカースレッドごとに YoutubeDL を使い回し、全体の並列数・リクエスト頻度は
+    get_subtitle_limiter() が応答時間と制限（429・ボット確認）から調整する
+    一時的に失敗した動画は SUBTITLE_RETRIES 回まで取り直す。結果は video_ids と同じ順で返す
+    max_workers・rate を渡すと共有の limiter は使わず、それを上限に調整する（ベンチマーク用）
+    on_result を渡すと、1 本終わるごとに結果行を渡して呼び出す（チェックポイント用）
+    corpus を渡すと字幕本文はコーパスに書き、結果行の subtitles は None にする
+    （本文をメモリに溜めずに済む。分析は TranscriptCorpus から読む）
+    ydl_factory を渡すと YoutubeDL の代わりにそれで作ったインスタンスを使う
+    （extract_info, urlopen, close を持つもの。ベンチマークの偽の字幕提供元など）
+    download=False ならキャッシュに無い動画はダウンロードせず、
+    subtitle_status="error"（subtitle_error="not cached"）の行にする（手元のデータだけで分析する用）
+
+    Returns:
+        video_id, subtitles, subtitle_lang, subtitle_kind ("manual" / "auto" / "none"),
+        subtitle_status ("ok" / "not_found" / "error" / "deferred"), subtitle_error
+        を列に持つ DataFrame
     """
-    if temp_dir.exists():
-        try:
-            shutil.rmtree(temp_dir)
-            print(f"\n Deleted temporary directory {temp_dir}. ")
-        except OSError as e:
-            print(f"\n Warning: Failed to delete temporary directory: {e}")
+    if max_workers is None and rate is None:
+        limiter = get_subtitle_limiter()
+    else:
+        limiter = AdaptiveLimiter(
+            "subtitles",
+            max_workers or SUBTITLE_WORKERS,
+            rate=rate or SUBTITLE_RATE,
+            target_latency=SUBTITLE_TARGET_LATENCY,
+        )
+    ydls = _WorkerYDL(ydl_factory)
+    data = [None] * len(video_ids)
 
+    def finish(i: int, row: dict) -> None:
+        if corpus is not None:
+            if row["subtitle_status"] not in RETRY_STATUSES:
+                corpus.add(row["video_id"], row["subtitles"])
+            row = {**row, "subtitles": None}
+        data[i] = row
+        if on_result:
+            on_result(row)
 
-if __name__ == "__main__":
-    # テスト動画ID (字幕が存在する動画に差し替えてください)
-    test_video_ids = ["tnDeaea4cGk"]
+    # 1. キャッシュから取得
+    pending = []
+    for i, video_id in enumerate(video_ids):
+        entry = cache.get(video_id, SUBTITLE_LANGS) if cache else None
+        if cache:
+            metrics.inc("subtitle_cache", result="miss" if entry is None else "hit")
+        if entry is None:
+            pending.append(i)
+        elif entry["kind"] == "none":
+            finish(i, _result_row(video_id, kind="none", status="not_found"))
+        else:
+            finish(
+                i, _result_row(video_id, entry["text"], entry["lang"], entry["kind"])
+            )
+
+    if cache and len(pending) < len(video_ids):
+        print(f"{len(video_ids) - len(pending)} subtitles loaded from cache.")
+    if not download:
+        for i in pending:
+            finish(i, _result_row(video_ids[i], status="error", error="not cached"))
+        pending = []
+
+    # 2. キャッシュに無い動画だけダウンロード（一時的な失敗は後ろに回して取り直す）
+    attempts = dict.fromkeys(pending, 1)
+    deferred = 0
     try:
-        # execute
-        df = extract_subtitles_from_videos(test_video_ids)
+        with ThreadPoolExecutor(max_workers=limiter.max_concurrency) as executor:
+            futures = {
+                executor.submit(_fetch_one, video_ids[i], ydls, limiter): i
+                for i in pending
+            }
+            cnt = 0
+            while futures:
+                completed, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in completed:
+                    i = futures.pop(future)
+                    row = future.result()
+                    if (
+                        row["subtitle_status"] == "deferred"
+                        and attempts[i] <= SUBTITLE_RETRIES
+                        and not limiter.exhausted
+                    ):
+                        attempts[i] += 1
+                        metrics.inc("subtitle_retries")
+                        retry = executor.submit(_fetch_one, video_ids[i], ydls, limiter)
+                        futures[retry] = i
+                        continue
+                    cnt += 1
+                    deferred += row["subtitle_status"] == "deferred"
 
-        print("-" * 30)
-        print(f"video_id: {test_video_ids}")
-        if df:
-            print(f"extracted subtitles:\n{df[['video_id', 'subtitles']]}...")
-        print("-" * 30)
+                    # 取得に成功した結果（字幕なしを含む）はキャッシュに保存
+                    if cache and row["subtitle_status"] not in RETRY_STATUSES:
+                        cache.put(
+                            row["video_id"],
+                            row["subtitle_lang"],
+                            row["subtitle_kind"],
+                            row["subtitles"],
+                        )
+                    finish(i, row)
 
+                    if row["subtitle_status"] == "not_found":
+                        print(f"No subtitles were found for {row['video_id']}.")
+                    elif row["subtitle_status"] in RETRY_STATUSES:
+                        print(
+                            f"Failed to extract subtitles for {row['video_id']}: "
+                            f"{row['subtitle_error']}"
+                        )
+
+                    if cnt % 25 == 0:
+                        print(f"Processed {cnt} videos so far...")
     finally:
-        # 処理が成功しても失敗しても、最後にフォルダを削除する
-        delete_temp_directory(TMP_SUB_DIR)
+        ydls.close()
+
+    if deferred:
+        print(
+            f"{deferred} videos deferred after repeated throttling or transient errors;"
+            " they are fetched again on the next run."
+        )
+        print(f"  [subtitles] {limiter.report()}")
+    df = pd.DataFrame(data, columns=SUBTITLE_COLUMNS)
+    return df
+
+
+if __name__ == "__main__":
+    # テスト動画ID (字幕が存在する動画に差し替えてください)
+    test_video_ids = ["tnDeaea4cGk"]
+    df = extract_subtitles_from_videos(test_video_ids)
+
+    print("-" * 30)
+    print(f"video_id: {test_video_ids}")
+    if not df.empty:
+        print(f"extracted subtitles:\n{df[['video_id', 'subtitles']]}...")
+    print("-" * 30)
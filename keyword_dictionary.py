@@ -0,0 +1,153 @@
+import argparse
+import hashlib
+import json
+import os
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+from keywords import KEYWORD_CATEGORIES, KeywordMatcher
+
+load_dotenv()
+# キーワード辞書ファイル（.json / .yaml / .yml / .tsv）。空欄なら keywords.py の組み込み辞書
+KEYWORD_DICTIONARY = os.getenv("KEYWORD_DICTIONARY", "").strip()
+
+# 辞書ファイルの形式:
+#   JSON / YAML : {"カテゴリ名": ["キーワード", ...], ...}（カテゴリの順序は出力列の順序になる）
+#   TSV         : 1 行に「カテゴリ名<TAB>キーワード」。空行と # で始まる行は無視する
+# カテゴリ名は列名（{category}_per_min, is_{category}）になるので英数字と _ のみ。
+# "none" は primary_category で「該当なし」に使うので使えない
+
+
+def _validate(categories: dict, path: Path) -> dict[str, set[str]]:
+    if not isinstance(categories, dict) or not categories:
+        raise ValueError(f"{path}: expected a mapping of category -> keywords.")
+    result = {}
+    for category, keywords in categories.items():
+        if (
+            not isinstance(category, str)
+            or not category.isascii()
+            or not category.replace("_", "a").isalnum()
+            or category == "none"
+        ):
+            raise ValueError(
+                f"{path}: invalid category name {category!r} "
+                "(letters, digits and '_' only, and not 'none')."
+            )
+        if not isinstance(keywords, (list, tuple, set)) or not all(
+            isinstance(k, str) for k in keywords
+        ):
+            raise ValueError(f"{path}: keywords of {category!r} must be a list of strings.")
+        result[category] = {k.strip() for k in keywords if k.strip()}
+    return result
+
+
+def _read_tsv(path: Path) -> dict[str, list[str]]:
+    categories = {}
+    with path.open("r", encoding="utf-8-sig") as f:
+        for lineno, line in enumerate(f, 1):
+            line = line.rstrip("\n")
+            if not line.strip() or line.startswith("#"):
+                continue
+            parts = line.split("\t")
+            if len(parts) != 2:
+                raise ValueError(f"{path}:{lineno}: expected 'category<TAB>keyword'.")
+            category, keyword = (p.strip() for p in parts)
+            categories.setdefault(category, []).append(keyword)
+    return categories
+
+
+def load_dictionary(path: Path | str) -> dict[str, set[str]]:
+    """辞書ファイルを読み、{カテゴリ名: キーワードの集合} を返す（形式は拡張子で判断）"""
+    path = Path(path)
+    suffix = path.suffix.lower()
+    if suffix == ".json":
+        with path.open("r", encoding="utf-8-sig") as f:
+            categories = json.load(f)
+    elif suffix in (".yaml", ".yml"):
+        try:
+            import yaml
+        except ImportError:
+            raise ImportError(
+                "PyYAML is required for YAML dictionaries (pip install pyyaml)."
+            ) from None
+        with path.open("r", encoding="utf-8-sig") as f:
+            categories = yaml.safe_load(f)
+    elif suffix == ".tsv":
+        categories = _read_tsv(path)
+    else:
+        raise ValueError(f"Unsupported dictionary format: {path} (.json, .yaml, .yml, .tsv)")
+    return _validate(categories, path)
+
+
+def dictionary_hash(categories: dict[str, set[str]]) -> str:
+    """
+    辞書の内容のハッシュ（ファイル形式・キーワードの並び順・コメントには依存しない）
+    カテゴリの順序は出力列の順序になるので含める
+    """
+    content = json.dumps(
+        [[c, sorted(kws)] for c, kws in categories.items()],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def load_categories(path: Path | str | None = None) -> dict[str, set[str]]:
+    """設定値（KEYWORD_DICTIONARY）の辞書を読む（空欄なら組み込みの KEYWORD_CATEGORIES）"""
+    path = KEYWORD_DICTIONARY if path is None else path
+    return load_dictionary(path) if path else KEYWORD_CATEGORIES
+
+
+_keyword_matcher: KeywordMatcher | None = None
+
+
+def get_keyword_matcher() -> KeywordMatcher:
+    """設定値（KEYWORD_DICTIONARY）のマッチャーを返す（初回のみ読み込み・構築）"""
+    global _keyword_matcher
+    if _keyword_matcher is None:
+        _keyword_matcher = KeywordMatcher(load_categories())
+    return _keyword_matcher
+
+
+def export_dictionary(categories: dict[str, set[str]], path: Path | str) -> None:
+    """辞書をファイルに書き出す（JSON または TSV。辞書ファイルの雛形作り用）"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if path.suffix.lower() == ".tsv":
+        lines = [f"{c}\t{k}" for c, kws in categories.items() for k in sorted(kws)]
+        path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    elif path.suffix.lower() == ".json":
+        content = {c: sorted(kws) for c, kws in categories.items()}
+        path.write_text(
+            json.dumps(content, ensure_ascii=False, indent=2) + "\n", encoding="utf-8"
+        )
+    else:
+        raise ValueError(f"Unsupported export format: {path} (.json, .tsv)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compile or export keyword dictionaries")
+    sub = parser.add_subparsers(dest="command", required=True)
+    compile_ = sub.add_parser("compile", help="validate a dictionary and build its matcher")
+    compile_.add_argument(
+        "path", nargs="?", help="dictionary file (default: KEYWORD_DICTIONARY)"
+    )
+    export = sub.add_parser("export", help="write the built-in dictionary as a template")
+    export.add_argument("path", help="output file (.json or .tsv)")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export_dictionary(KEYWORD_CATEGORIES, args.path)
+        print(f"Built-in dictionary written to {args.path}")
+        return
+
+    categories = load_categories(args.path)
+    KeywordMatcher(categories)
+    print(f"Dictionary: {args.path or KEYWORD_DICTIONARY or '(built-in)'}")
+    print(f"Hash: {dictionary_hash(categories)}")
+    for category, keywords in categories.items():
+        print(f"  {category}: {len(keywords)} keywords")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,6 +8,20 @@ for 'Sekai Gyoten News'(Japanese TV program on "https://www.youtube.com/@nittele
 A keyword dictionary for classifying medical, legal, and everyday unexpected events.
 医療、法律、日常の意外な出来事を分類するためのキーワード辞書
 """
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import metrics
+from transcript_corpus import TranscriptCorpus
+
 # ============================================
 # Medical related keywords
 # 医療関連キーワード
@@ -83,6 +97,142 @@ KEYWORD_CATEGORIES = {
     "daily_surprising": daily_surprising_keywords,
 }
 
+# ============================================
+# 複数キーワード一括照合（Aho-Corasick）
+# ============================================
+
+
+class KeywordMatcher:
+    """
+    全カテゴリのキーワードから Aho-Corasick オートマトンを構築し、
+    テキストを 1 回走査するだけでカテゴリ別・キーワード別の出現回数を数える
+
+    カウントの意味は `str.count` を各キーワードに適用した場合と同じ:
+    - 異なるキーワード同士の重なりはそれぞれ数える（"感染症" → "感染" と "感染症"）
+    - 同じキーワード同士の重なりは数えない（"ガンガン" の "ガン" は 2 回）
+    """
+
+    def __init__(self, categories: dict[str, set[str]]):
+        self.categories = list(categories.keys())
+        self.keywords = sorted({k for kws in categories.values() for k in kws if k})
+        # カテゴリ → キーワード（KeywordHitMatrix に保存して再集計に使う）
+        self.category_keywords = {
+            c: sorted(k for k in kws if k) for c, kws in categories.items()
+        }
+        keyword_index = {k: i for i, k in enumerate(self.keywords)}
+        self.keyword_lengths = [len(k) for k in self.keywords]
+        # キーワード番号 → 所属カテゴリ番号（複数カテゴリに属するキーワードにも対応）
+        self.keyword_categories = [[] for _ in self.keywords]
+        for c, kws in enumerate(categories.values()):
+            for k in kws:
+                if k:
+                    self.keyword_categories[keyword_index[k]].append(c)
+
+        self._automaton = self._build_automaton(self.keywords)
+
+    @staticmethod
+    def _build_automaton(keys: list[str]) -> tuple:
+        """キーワード列から (遷移表, 出力, キーワード長, 先頭文字の正規表現) を作る"""
+        # 1. トライ木（goto 関数）
+        goto = [{}]
+        outputs = [[]]
+        for i, k in enumerate(keys):
+            state = 0
+            for ch in k:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][ch] = nxt
+                    goto.append({})
+                    outputs.append([])
+                state = nxt
+            outputs[state].append(i)
+
+        # 2. 失敗関数を幅優先で求め、遷移表（DFA）に畳み込む
+        fail = [0] * len(goto)
+        delta = [dict(goto[0])] + [None] * (len(goto) - 1)
+        queue = list(goto[0].values())
+        for state in queue:
+            delta[state] = {**delta[fail[state]], **goto[state]}
+            for ch, nxt in goto[state].items():
+                fail[nxt] = delta[fail[state]].get(ch, 0)
+                outputs[nxt] = outputs[nxt] + outputs[fail[nxt]]
+                queue.append(nxt)
+
+        # 初期状態から遷移できる文字（＝キーワードの先頭文字）だけを正規表現で探し、
+        # それ以外の文字は C 実装の検索で読み飛ばす
+        first = "".join(re.escape(ch) for ch in goto[0])
+        start_re = re.compile("[" + first + "]" if first else "(?!)")
+        lengths = [len(k) for k in keys]
+        return delta, [tuple(o) for o in outputs], lengths, start_re
+
+    def count_keywords(self, text) -> list[int]:
+        """
+        キーワード別の出現回数（self.keywords と同じ順）を返す
+        text は str のほか UTF-8 のバイト列（bytes, memoryview, mmap）も受け付ける
+        （バイト列は str に復号してから数える。1 文字ずつ進めるのでバイト単位より遷移が少ない）
+        """
+        if not isinstance(text, str):
+            text = str(text, "utf-8")
+        delta, outputs, lengths, start_re = self._automaton
+        counts = [0] * len(self.keywords)
+        last_end = [0] * len(self.keywords)  # 同一キーワードの重複カウント防止用
+
+        n = len(text)
+        pos = 0
+        for m in start_re.finditer(text):
+            if m.start() < pos:  # オートマトンで既に読んだ範囲
+                continue
+            # 初期状態に戻るまでオートマトンを進める
+            pos = m.start()
+            state = 0
+            while pos < n:
+                state = delta[state].get(text[pos], 0)
+                pos += 1
+                if not state:
+                    break
+                for k in outputs[state]:
+                    if pos - lengths[k] >= last_end[k]:
+                        counts[k] += 1
+                        last_end[k] = pos
+        return counts
+
+    def count_categories(self, text) -> list[int]:
+        """カテゴリ別の出現回数（self.categories と同じ順）を返す"""
+        category_counts = [0] * len(self.categories)
+        for k, n in enumerate(self.count_keywords(text)):
+            if n:
+                for c in self.keyword_categories[k]:
+                    category_counts[c] += n
+        return category_counts
+
+    def count(self, text: str) -> tuple[dict[str, int], dict[str, int]]:
+        """
+        テキストを 1 回走査し、(カテゴリ別出現回数, キーワード別出現回数) を返す
+        キーワード別は出現したものだけを含む
+        """
+        keyword_counts = self.count_keywords(text)
+        category_counts = dict.fromkeys(self.categories, 0)
+        per_keyword = {}
+        for k, n in enumerate(keyword_counts):
+            if n:
+                per_keyword[self.keywords[k]] = n
+                for c in self.keyword_categories[k]:
+                    category_counts[self.categories[c]] += n
+        return category_counts, per_keyword
+
+
+_default_matcher: KeywordMatcher | None = None
+
+
+def get_matcher() -> KeywordMatcher:
+    """KEYWORD_CATEGORIES から構築したマッチャーを返す（初回のみ構築）"""
+    global _default_matcher
+    if _default_matcher is None:
+        _default_matcher = KeywordMatcher(KEYWORD_CATEGORIES)
+    return _default_matcher
+
+
 # ============================================
 # ユーティリティ関数
 # ============================================
@@ -107,8 +257,8 @@ def count_keywords_in_category(text: str, category: str) -> int:
 def classify_text(text: str) -> dict:
     """テキストを全カテゴリで分析して分類結果を返す"""
     result = {}
-    for category in KEYWORD_CATEGORIES.keys():
-        count = count_keywords_in_category(text, category)
+    category_counts, _ = get_matcher().count(text)
+    for category, count in category_counts.items():
         result[category] = {
             "matched": count > 0,
             "count": count,
@@ -153,15 +303,470 @@ def analyze_by_keywords(df, category: str, threshold: float = 0.5) -> None:
     if "duration_min" not in df.columns:
         df["duration_min"] = df["duration"] / 60
 
-    # 3. 1分あたりのキーワード出現回数
-    df[f"{category}_per_min"] = (
-        df[f"{category}_word_count"] / df["duration_min"]
-    ).round(3)
+    # 3. 1分あたりのキーワード出現回数（duration が 0・欠損なら 0.0）
+    df[f"{category}_per_min"] = per_minute(
+        df[[f"{category}_word_count"]].to_numpy(), df["duration"].to_numpy()
+    )[:, 0]
 
     # 4. threshold 以上なら該当カテゴリとみなす
     df[f"is_{category}"] = df[f"{category}_per_min"] >= threshold
 
 
+def count_matrix(texts, matcher: KeywordMatcher | None = None) -> np.ndarray:
+    """
+    字幕テキスト列から 動画 × カテゴリ の出現回数行列を作る
+    str のほか UTF-8 のバイト列（TranscriptCorpus.view() のスライスなど）も受け付け、
+    それ以外（欠損値など）は空文字列として扱う
+    """
+    matcher = matcher or get_matcher()
+    counts = np.zeros((len(texts), len(matcher.categories)), dtype=np.int64)
+    for i, t in enumerate(texts):
+        if isinstance(t, (str, bytes, memoryview)) and len(t):
+            counts[i] = matcher.count_categories(t)
+    return counts
+
+
+# これより少ない字幕はプロセスを起動するより 1 コアで数えた方が速い
+PARALLEL_MIN_TEXTS = 200
+# 1 ワーカーあたりのチャンク数（処理時間のばらつきを均すため少し細かく分ける）
+CHUNKS_PER_WORKER = 4
+
+
+def keyword_hit_rows(
+    texts, matcher: KeywordMatcher | None = None
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    字幕ごとのキーワード別出現回数を CSR 形式 (indptr, indices, data) で返す
+    indices は matcher.keywords の番号。出現しなかったキーワードは持たない
+    """
+    matcher = matcher or get_matcher()
+    indptr = np.zeros(len(texts) + 1, dtype=np.int64)
+    indices = []
+    data = []
+    for i, t in enumerate(texts):
+        nnz = 0
+        if isinstance(t, (str, bytes, memoryview)) and len(t):
+            counts = np.asarray(matcher.count_keywords(t), dtype=np.int32)
+            nz = np.flatnonzero(counts)
+            indices.append(nz.astype(np.int32))
+            data.append(counts[nz])
+            nnz = len(nz)
+        indptr[i + 1] = indptr[i] + nnz
+    return (
+        indptr,
+        np.concatenate(indices) if indices else np.zeros(0, dtype=np.int32),
+        np.concatenate(data) if data else np.zeros(0, dtype=np.int32),
+    )
+
+
+def _stack_rows(parts: list[tuple]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """チャンクごとの CSR を縦に連結する"""
+    indptrs = [parts[0][0]]
+    for indptr, _, _ in parts[1:]:
+        indptrs.append(indptr[1:] + indptrs[-1][-1])
+    return (
+        np.concatenate(indptrs),
+        np.concatenate([p[1] for p in parts]),
+        np.concatenate([p[2] for p in parts]),
+    )
+
+
+# ワーカープロセス内の状態（プロセスごとに 1 回だけ受け取る・開く）
+_worker_matcher: KeywordMatcher | None = None
+_worker_count = None
+_worker_corpora: dict[str, TranscriptCorpus] = {}
+
+
+def _init_worker(matcher: KeywordMatcher, per_keyword: bool) -> None:
+    global _worker_matcher, _worker_count
+    _worker_matcher = matcher
+    _worker_count = keyword_hit_rows if per_keyword else count_matrix
+
+
+def _count_texts_chunk(texts: list):
+    return _worker_count(texts, _worker_matcher)
+
+
+def _count_corpus_chunk(args: tuple[str, list[str]]) -> np.ndarray:
+    """コーパスはワーカー側でメモリマップする（本文をプロセス間で送らない）"""
+    corpus_path, video_ids = args
+    corpus = _worker_corpora.get(corpus_path)
+    if corpus is None:
+        corpus = _worker_corpora[corpus_path] = TranscriptCorpus(corpus_path)
+    views = [corpus.view(v) for v in video_ids]
+    counts = _worker_count(views, _worker_matcher)
+    del views
+    return counts
+
+
+def resolve_workers(workers: int | None) -> int:
+    """0 / None は CPU コア数"""
+    return workers if workers and workers > 0 else (os.cpu_count() or 1)
+
+
+def count_matrix_parallel(
+    texts=None,
+    matcher: KeywordMatcher | None = None,
+    workers: int | None = None,
+    corpus: TranscriptCorpus | None = None,
+    video_ids: list[str] | None = None,
+    per_keyword: bool = False,
+):
+    """
+    count_matrix をプロセスプールで並列に計算する（結果は count_matrix と同じ）
+    per_keyword=True なら keyword_hit_rows と同じキーワード別の CSR を返す
+
+    マッチャーは各ワーカーに 1 回だけ渡し、字幕はチャンクに分けて配る
+    corpus と video_ids を渡した場合は、本文ではなく video_id のチャンクを配り、
+    各ワーカーが自分でコーパスをメモリマップして読む
+    件数が PARALLEL_MIN_TEXTS 未満、または workers が 1 なら同じプロセスで数える
+    """
+    matcher = matcher or get_matcher()
+    workers = resolve_workers(workers)
+    items = video_ids if corpus is not None else texts
+    n = len(items)
+    count = keyword_hit_rows if per_keyword else count_matrix
+
+    if workers <= 1 or n < PARALLEL_MIN_TEXTS:
+        if corpus is not None:
+            texts = [corpus.view(v) for v in video_ids]
+        return count(texts, matcher)
+
+    size = max(1, -(-n // (workers * CHUNKS_PER_WORKER)))
+    chunks = [list(items[i : i + size]) for i in range(0, n, size)]
+    if corpus is not None:
+        func = _count_corpus_chunk
+        chunks = [(str(corpus.path), chunk) for chunk in chunks]
+    else:
+        func = _count_texts_chunk
+
+    # パイプラインはスレッドを使っているので fork ではなく forkserver（無ければ spawn）で起動する
+    # forkserver が既定で先に読み込むのは __main__（main.py / cli.py とその依存）なので、
+    # ワーカーが使うこのモジュール（numpy・pandas を含む）だけにする。各ワーカーは
+    # forkserver から fork されるので、読み込み済みのモジュールを読み直さない
+    # （__main__ は multiprocessing の仕様で __mp_main__ として読み直されるが、
+    # 重い依存は読み込み済みで、if __name__ == "__main__" の処理は実行されない）
+    methods = multiprocessing.get_all_start_methods()
+    if "forkserver" in methods:
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload([__name__])
+    else:
+        context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=context,
+        initializer=_init_worker,
+        initargs=(matcher, per_keyword),
+    ) as executor:
+        parts = list(executor.map(func, chunks))
+    return _stack_rows(parts) if per_keyword else np.vstack(parts)
+
+
+def per_minute(counts: np.ndarray, duration_sec) -> np.ndarray:
+    """
+    出現回数を 1 分あたりに換算する（小数第 3 位で丸め）
+    duration が 0・負・欠損の動画は inf/NaN にせず 0.0 とする
+    """
+    duration_min = np.asarray(duration_sec, dtype=np.float64) / 60
+    valid = np.isfinite(duration_min) & (duration_min > 0)
+    safe = np.where(valid, duration_min, 1.0)
+    rates = np.asarray(counts, dtype=np.float64) / safe.reshape(-1, 1)
+    rates[~valid] = 0.0
+    return rates.round(3)
+
+
+def primary_categories(rates: np.ndarray, categories: list[str]) -> np.ndarray:
+    """
+    各行で 1 分あたり出現回数が最大のカテゴリ名を返す
+    すべて 0 の行は "none"（同率の場合は categories の先頭側を優先）
+    """
+    names = np.array(list(categories) + ["none"], dtype=object)
+    if rates.shape[1] == 0:
+        return np.full(rates.shape[0], "none", dtype=object)
+    best = rates.argmax(axis=1)
+    best[rates.max(axis=1) <= 0] = len(categories)
+    return names[best]
+
+
+def score_categories(
+    counts: np.ndarray, duration_sec, categories: list[str], threshold: float = 0.5
+) -> pd.DataFrame:
+    """
+    動画 × カテゴリ の出現回数行列から分析列をまとめて計算する
+
+    Returns:
+        {category}_word_count, {category}_per_min, is_{category}（カテゴリ順）と
+        primary_category を列に持つ DataFrame
+    """
+    rates = per_minute(counts, duration_sec)
+    flags = rates >= threshold
+
+    columns = {}
+    for j, category in enumerate(categories):
+        columns[f"{category}_word_count"] = counts[:, j]
+        columns[f"{category}_per_min"] = rates[:, j]
+        columns[f"is_{category}"] = flags[:, j]
+    columns["primary_category"] = primary_categories(rates, categories)
+    return pd.DataFrame(columns)
+
+
+def keyword_set_hash(keywords) -> str:
+    """数えたキーワードの集合のハッシュ（並び順には依存しない）"""
+    content = json.dumps(sorted(keywords), ensure_ascii=False)
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()[:16]
+
+
+class KeywordHitMatrix:
+    """
+    動画 × キーワード の出現回数行列（CSR 形式の疎行列）
+
+    分析時に保存しておけば、閾値の変更・キーワードのカテゴリ移動・キーワードの重み付けを
+    字幕を読み直さずに行列演算だけで再計算できる（score_categories と同じ列を返す）
+    .npz（numpy）で保存する
+
+    行ごとに、数えたキーワードの集合（keyword_set_hash）を row_sets に持つ
+    違うキーワードで数えた行をつなげても、その行で数えていないキーワードは 0 ではなく
+    「数えていない」ので、そのキーワードを使う再集計は ValueError にする
+    """
+
+    def __init__(
+        self,
+        video_ids,
+        keywords: list[str],
+        indptr: np.ndarray,
+        indices: np.ndarray,
+        data: np.ndarray,
+        duration_sec,
+        categories: dict[str, list[str]],
+        row_sets=None,
+        keyword_sets: dict[str, list[str]] | None = None,
+    ):
+        self.video_ids = np.asarray(video_ids, dtype=str)
+        self.keywords = list(keywords)
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int32)
+        self.data = np.asarray(data, dtype=np.int32)
+        self.duration_sec = np.asarray(duration_sec, dtype=np.float64)
+        # 分析したときのカテゴリ割り当て（再集計のデフォルト）
+        self.categories = {c: list(kws) for c, kws in categories.items()}
+        # 行ごとのキーワード集合のハッシュと、ハッシュ → キーワード（省略時は全行が keywords）
+        if row_sets is None:
+            h = keyword_set_hash(self.keywords)
+            row_sets = np.full(len(self.video_ids), h)
+            keyword_sets = {h: self.keywords}
+        self.row_sets = np.asarray(row_sets, dtype=str)
+        self.keyword_sets = {h: list(kws) for h, kws in keyword_sets.items()}
+
+    def __len__(self) -> int:
+        return len(self.video_ids)
+
+    def to_dense(self) -> np.ndarray:
+        """動画 × キーワード の密行列（確認用）"""
+        dense = np.zeros((len(self), len(self.keywords)), dtype=np.int64)
+        rows = np.repeat(np.arange(len(self)), np.diff(self.indptr))
+        dense[rows, self.indices] = self.data
+        return dense
+
+    def category_counts(
+        self,
+        categories: dict[str, list[str]] | None = None,
+        weights: dict[str, float] | None = None,
+    ) -> np.ndarray:
+        """
+        動画 × カテゴリ の出現回数行列（count_matrix と同じ）
+        categories でカテゴリの割り当てを、weights でキーワードごとの重みを変えられる
+        （重みを付けた場合は float になる）。行列に無いキーワードは数えられないので ValueError
+        """
+        categories = categories if categories is not None else self.categories
+        column = {k: j for j, k in enumerate(self.keywords)}
+        missing = sorted(
+            {k for kws in categories.values() for k in kws if k and k not in column}
+        )
+        if missing:
+            raise ValueError(
+                f"Keywords not in the hit matrix (re-analyze the transcripts): {missing}"
+            )
+        needed = {k for kws in categories.values() for k in kws if k}
+        uncounted = set()
+        stale = np.zeros(len(self), dtype=bool)
+        for h, kws in self.keyword_sets.items():
+            if not needed <= set(kws):
+                uncounted |= needed - set(kws)
+                stale |= self.row_sets == h
+        if stale.any():
+            raise ValueError(
+                f"{int(stale.sum())} videos were counted without some of these keywords"
+                f" (re-analyze them): {sorted(uncounted)}"
+            )
+
+        rows = np.repeat(np.arange(len(self)), np.diff(self.indptr))
+        values = self.data.astype(np.float64)
+        if weights:
+            w = np.ones(len(self.keywords))
+            for k, weight in weights.items():
+                if k in column:
+                    w[column[k]] = weight
+            values = values * w[self.indices]
+
+        counts = np.zeros((len(self), len(categories)))
+        for c, kws in enumerate(categories.values()):
+            member = np.zeros(len(self.keywords), dtype=bool)
+            member[[column[k] for k in kws if k]] = True
+            mask = member[self.indices]
+            counts[:, c] = np.bincount(rows[mask], weights=values[mask], minlength=len(self))
+        return counts if weights else counts.astype(np.int64)
+
+    def scores(
+        self,
+        threshold: float = 0.5,
+        categories: dict[str, list[str]] | None = None,
+        weights: dict[str, float] | None = None,
+    ) -> pd.DataFrame:
+        """video_id と score_categories の列（1分あたりの回数・判定・主要カテゴリ）を返す"""
+        categories = categories if categories is not None else self.categories
+        counts = self.category_counts(categories, weights)
+        df = score_categories(counts, self.duration_sec, list(categories), threshold)
+        df.insert(0, "video_id", self.video_ids)
+        return df
+
+    def merge(self, newer: "KeywordHitMatrix") -> "KeywordHitMatrix":
+        """newer の動画を追加した行列を返す（同じ動画は newer の行で置き換える）"""
+        return KeywordHitMatrix.concat([self, newer])
+
+    @classmethod
+    def concat(cls, parts: list["KeywordHitMatrix"]) -> "KeywordHitMatrix":
+        """
+        行列を順につなげる（同じ動画は後の行列の行だけを残す）
+        キーワードは全ての行列の和集合、カテゴリ割り当ては最後の行列のもの
+        """
+        keywords = sorted(set().union(*(p.keywords for p in parts)))
+        column = {k: j for j, k in enumerate(keywords)}
+
+        def remap(m: "KeywordHitMatrix") -> np.ndarray:
+            mapping = np.array([column[k] for k in m.keywords], dtype=np.int32)
+            return mapping[m.indices] if len(m.indices) else m.indices
+
+        video_ids = np.concatenate([p.video_ids for p in parts])
+        # 同じ動画は最後の行だけを残す
+        _, last = np.unique(video_ids[::-1], return_index=True)
+        keep = np.zeros(len(video_ids), dtype=bool)
+        keep[len(video_ids) - 1 - last] = True
+        lengths = np.concatenate([np.diff(p.indptr) for p in parts])
+        entry_mask = np.repeat(keep, lengths)
+
+        row_sets = np.concatenate([p.row_sets for p in parts])[keep]
+        used = set(row_sets.tolist())
+        keyword_sets = {
+            h: kws for p in parts for h, kws in p.keyword_sets.items() if h in used
+        }
+        return cls(
+            video_ids[keep],
+            keywords,
+            np.concatenate([[0], np.cumsum(lengths[keep])]),
+            np.concatenate([remap(p) for p in parts])[entry_mask],
+            np.concatenate([p.data for p in parts])[entry_mask],
+            np.concatenate([p.duration_sec for p in parts])[keep],
+            parts[-1].categories,
+            row_sets=row_sets,
+            keyword_sets=keyword_sets,
+        )
+
+    def save(self, path: Path | str) -> None:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp.npz")
+        np.savez_compressed(
+            tmp,
+            video_ids=self.video_ids,
+            keywords=np.asarray(self.keywords, dtype=str),
+            indptr=self.indptr,
+            indices=self.indices,
+            data=self.data,
+            duration_sec=self.duration_sec,
+            categories=np.asarray(json.dumps(self.categories, ensure_ascii=False)),
+            row_sets=self.row_sets,
+            keyword_sets=np.asarray(json.dumps(self.keyword_sets, ensure_ascii=False)),
+        )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: Path | str) -> "KeywordHitMatrix":
+        with np.load(path) as f:
+            # row_sets の無い古い行列は、全行を保存されたキーワードで数えたものとして読む
+            has_sets = "row_sets" in f.files
+            return cls(
+                f["video_ids"],
+                f["keywords"].tolist(),
+                f["indptr"],
+                f["indices"],
+                f["data"],
+                f["duration_sec"],
+                json.loads(f["categories"].item()),
+                row_sets=f["row_sets"] if has_sets else None,
+                keyword_sets=json.loads(f["keyword_sets"].item()) if has_sets else None,
+            )
+
+
+def analyze_all_categories(
+    df,
+    threshold: float = 0.5,
+    matcher: KeywordMatcher | None = None,
+    corpus: TranscriptCorpus | None = None,
+    workers: int = 1,
+) -> KeywordHitMatrix:
+    """
+    全カテゴリのキーワード分析列と primary_category を一度に追加（インプレイス）
+
+    analyze_by_keywords をカテゴリごとに呼ぶのと同じ列を追加するが、
+    字幕テキストは KeywordMatcher で 1 回だけ走査し、
+    1分あたりの出現回数・判定・主要カテゴリは行列演算でまとめて求める
+
+    Args:
+        df: video_id, subtitles, duration(秒) を含む DataFrame（インプレイス修正）
+        threshold: 関連性判定の閾値（デフォルト 0.5回/分）
+        matcher: 使用するマッチャー（省略時は KEYWORD_CATEGORIES から構築）
+        corpus: TranscriptCorpus を渡すと、字幕は subtitles 列ではなく
+            コーパスのメモリマップから video_id ごとに読む（コピーせずに走査）
+        workers: 出現回数を数えるプロセス数（1 なら同じプロセス、0 なら CPU コア数）
+
+    Returns:
+        動画 × キーワード の出現回数行列（保存すれば字幕を読まずに再計算できる）
+    """
+    matcher = matcher or get_matcher()
+
+    # 1. 動画 × キーワード の出現回数（字幕 1 本につき 1 回の走査）
+    metrics.inc("keyword_texts", len(df))
+    with metrics.timer("keyword_matching_seconds"):
+        if corpus is not None:
+            rows = count_matrix_parallel(
+                matcher=matcher,
+                workers=workers,
+                corpus=corpus,
+                video_ids=df["video_id"].tolist(),
+                per_keyword=True,
+            )
+        else:
+            rows = count_matrix_parallel(
+                df["subtitles"].tolist(), matcher, workers, per_keyword=True
+            )
+    video_ids = df["video_id"] if "video_id" in df.columns else df.index.astype(str)
+    hits = KeywordHitMatrix(
+        video_ids, matcher.keywords, *rows, df["duration"], matcher.category_keywords
+    )
+
+    # 2. 動画時間を分に変換（duration は秒単位と想定）
+    if "duration_min" not in df.columns:
+        df["duration_min"] = df["duration"] / 60
+
+    # 3. カテゴリ別の出現回数 → 1分あたりの出現回数・閾値判定・主要カテゴリ
+    with metrics.timer("keyword_scoring_seconds"):
+        scores = score_categories(
+            hits.category_counts(), df["duration"].to_numpy(), matcher.categories, threshold
+        )
+        df[scores.columns.tolist()] = scores.set_axis(df.index)
+    return hits
+
+
 def add_title_keyword_flags(df, category: str) -> None:
     """
     タイトルに指定カテゴリのキーワードが含まれているかを判定
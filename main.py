@@ -1,10 +1,30 @@
 import os
+import math
+import time
+import atexit
+import argparse
 from dotenv import load_dotenv
 from pathlib import Path
 import pandas as pd
 
-import youtube_client, fetch_transcripts
-from keywords import analyze_by_keywords, KEYWORD_CATEGORIES
+# youtube_client（requests）・parquet_output / stats_history（pyarrow）・transcript_index は
+# 使う関数の中で読み込む（手元のデータだけを扱う cli.py のコマンドを速く起動するため）
+import fetch_transcripts
+import metrics
+from crawl_state import CrawlState
+from checkpoint import RunCheckpoint
+from transcript_corpus import CorpusWriter, TranscriptCorpus
+from quota import (
+    QuotaScheduler,
+    QuotaExceededError,
+    PRIORITY_NEW_UPLOADS,
+    PRIORITY_STATISTICS,
+    PRIORITY_BACKFILL,
+)
+from keyword_dictionary import get_keyword_matcher
+from keywords import analyze_all_categories, KeywordHitMatrix
+from throttle import CircuitOpenError
+from work_queue import WorkQueue
 
 
 ### Perform initial settings in .env and run in python main.py ###
@@ -14,7 +34,8 @@ from keywords import analyze_by_keywords, KEYWORD_CATEGORIES
 ### 環境変数読み込み ###
 
 load_dotenv()
-API_KEY = os.environ["YOUTUBE_API_KEY"].strip()
+# API を使う処理の開始時に確認する（手元のデータだけの分析ではキーは要らない）
+API_KEY = os.getenv("YOUTUBE_API_KEY", "").strip()
 TITLE_FILTER = os.getenv("TITLE_FILTER", "").strip()  # Noneでチャンネル全動画
 SUBTITLE_LANGS = os.getenv("SUBTITLE_LANGS", "ja").strip()
 
@@ -24,98 +45,938 @@ VIDEO_IDS = (
 )
 
 OUTPUT_DIR = Path(os.getenv("OUTPUT_DIR", "output").strip())
-OUTPUT_DIR.mkdir(exist_ok=True)
+OUTPUT_FILE = OUTPUT_DIR / "video_analysis_result.csv"
+# 動画 × キーワード の出現回数行列（--rescore で字幕を読まずに再計算する元データ）
+KEYWORD_HITS_FILE = OUTPUT_DIR / "keyword_hits.npz"
+# --stream 中にバッチごとの出現回数行列を置くディレクトリ（終了時に KEYWORD_HITS_FILE へまとめる）
+KEYWORD_HITS_SHARDS = OUTPUT_DIR / "keyword_hits.shards"
+# --rescore の出力
+KEYWORD_SCORES_FILE = OUTPUT_DIR / "keyword_scores.csv"
+# cli.py crawl / details の出力（subs・analyze の入力）
+VIDEO_LIST_FILE = OUTPUT_DIR / "videos.csv"
+VIDEO_DETAILS_FILE = OUTPUT_DIR / "video_details.csv"
+# 出力形式: csv（1 ファイル）または parquet（metrics / transcripts の 2 データセット）
+OUTPUT_FORMAT = os.getenv("OUTPUT_FORMAT", "csv").strip().lower()
+
+# クロール状態などを保存するディレクトリ
+STATE_DIR = Path(os.getenv("STATE_DIR", "state").strip())
+CRAWL_STATE_FILE = STATE_DIR / "crawl_state.json"
+# --refresh-stats で取得した再生数などの履歴（Parquet、スナップショットごとに 1 ファイル）
+STATS_HISTORY_DIR = STATE_DIR / "stats_history"
+# 再開用チェックポイント（正常終了すると削除される）
+CHECKPOINT_DIR = STATE_DIR / "checkpoint"
+# cli.py details の再開用チェックポイント
+DETAILS_CHECKPOINT_DIR = STATE_DIR / "details_checkpoint"
+# cli.py queue の作業キュー（複数のワーカー・ホストで共有するディレクトリ）
+WORK_QUEUE_DIR = Path(os.getenv("WORK_QUEUE_DIR", str(STATE_DIR / "queue")).strip())
+# 1 タスク（シャード）あたりの動画数
+QUEUE_SHARD_SIZE = int(os.getenv("QUEUE_SHARD_SIZE", "200"))
+# タスクのリース（秒）。実行中は延長し続け、ワーカーが落ちたら期限後に別のワーカーが取り直す
+QUEUE_LEASE_SEC = float(os.getenv("QUEUE_LEASE_SEC", "600"))
+# 失敗・リース切れがこの回数に達したタスクは failed にする
+QUEUE_MAX_ATTEMPTS = int(os.getenv("QUEUE_MAX_ATTEMPTS", "3"))
+# 実行できるタスクが無く、他のワーカーが実行中のときに待つ間隔（秒）
+QUEUE_POLL_SEC = 5.0
+# 動画詳細をチェックポイントに書き出す単位（動画数）
+CHECKPOINT_CHUNK = int(os.getenv("CHECKPOINT_CHUNK", "500"))
+
+# --stream 時に 1 度に処理する動画数
+STREAM_BATCH_SIZE = int(os.getenv("STREAM_BATCH_SIZE", "25"))
 
 THRESHOLD = float(os.getenv("THRESHOLD", "0.5"))
+# キーワード分析のプロセス数（0 で CPU コア数。字幕が少ないときは 1 プロセスで数える）
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", "0"))
 
 DEBUG = os.getenv("DEBUG", "False").strip().lower() == "true"
 
+# 実行レポート（段階ごとの時間・リクエスト数・待ち時間など）の JSON（空欄で無効）
+RUN_REPORT = os.getenv("RUN_REPORT", str(OUTPUT_DIR / "run_report.json")).strip()
+# 同じ内容の Prometheus textfile（node_exporter の textfile コレクター用、空欄で無効）
+PROMETHEUS_TEXTFILE = os.getenv("PROMETHEUS_TEXTFILE", "").strip()
+# --profile の出力先（段階ごとに 1 ファイル）
+PROFILE_DIR = OUTPUT_DIR / "profiles"
+
+# API の割り当てが尽きて処理を後回しにしたときの終了コード
+EXIT_QUOTA_DEFERRED = 3
+# API・字幕の制限が冷却期間を置いても続き、処理を後回しにしたときの終了コード
+EXIT_THROTTLED = 4
+
 ########################
 
 
-def analyze_subtitles(df: pd.DataFrame) -> pd.DataFrame:
-    """キーワード分析を実行し、DataFrame をReturn"""
-
-    # 1. 全カテゴリで分析
-    for category in KEYWORD_CATEGORIES.keys():
-        print(f" Analyzing:{category}")
-        analyze_by_keywords(df, category=category, threshold=THRESHOLD)
-
-    # 2. 主要カテゴリを決定（最も出現回数が多いカテゴリ）
-    def get_primary_category(row):
-        """各行で最も該当度が高いカテゴリを返す"""
-        scores = {}
-        for category in KEYWORD_CATEGORIES.keys():
-            col = f"{category}_per_min"
-            scores[category] = row.get(col, 0)
-        return (
-            max(scores, key=scores.get)
-            if max(scores.values(), default=0) > 0
-            else "none"
-        )
+def check_output_settings() -> None:
+    """出力の設定を確認し、OUTPUT_DIR を作る（結果を書き出す処理の開始時に呼ぶ）"""
+    if OUTPUT_FORMAT not in ("csv", "parquet"):
+        raise ValueError(f"OUTPUT_FORMAT must be 'csv' or 'parquet': {OUTPUT_FORMAT}")
+    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+
+
+def analyze_subtitles(
+    df: pd.DataFrame, corpus: TranscriptCorpus | None = None
+) -> tuple[pd.DataFrame, KeywordHitMatrix]:
+    """
+    キーワード分析を実行し、DataFrame と キーワードごとの出現回数行列 をReturn
+    （corpus があれば字幕はそこから読む）
+    """
+
+    # 1. 全カテゴリで分析（字幕は 1 本につき 1 回だけ走査）
+    # 2. 主要カテゴリ（1分あたり出現回数が最大のカテゴリ）も行列演算でまとめて決定
+    matcher = get_keyword_matcher()
+    print(f" Analyzing:{', '.join(matcher.categories)}")
+    hits = analyze_all_categories(
+        df,
+        threshold=THRESHOLD,
+        matcher=matcher,
+        corpus=corpus,
+        workers=ANALYSIS_WORKERS,
+    )
 
-    df["primary_category"] = df.apply(get_primary_category, axis=1)
     first_cols = ["video_id", "title", "primary_category"]
     df = df[first_cols + [c for c in df.columns if c not in first_cols]]
 
+    return df, hits
+
+
+def save_keyword_hits(hits: KeywordHitMatrix, merge: bool) -> None:
+    """
+    出現回数行列を保存（merge=True なら前回の行列に追加し、同じ動画は今回の行で置き換え）
+    """
+    if merge and KEYWORD_HITS_FILE.exists():
+        hits = KeywordHitMatrix.load(KEYWORD_HITS_FILE).merge(hits)
+    hits.save(KEYWORD_HITS_FILE)
+
+
+def save_keyword_hit_shards(merge: bool) -> None:
+    """
+    --stream のバッチごとの出現回数行列（KEYWORD_HITS_SHARDS）を 1 つにまとめて保存し、
+    シャードを削除する（前回の実行が途中で落ちて残ったシャードもここでまとめる）
+    """
+    shards = sorted(KEYWORD_HITS_SHARDS.glob("*.npz"))
+    if shards:
+        parts = [KeywordHitMatrix.load(path) for path in shards]
+        save_keyword_hits(KeywordHitMatrix.concat(parts), merge)
+    for path in shards:
+        path.unlink()
+    if KEYWORD_HITS_SHARDS.exists():
+        KEYWORD_HITS_SHARDS.rmdir()
+
+
+def rescore() -> int:
+    """
+    保存済みの出現回数行列から、現在の THRESHOLD・キーワード辞書（KEYWORD_DICTIONARY）で
+    1分あたりの出現回数・判定・主要カテゴリを計算し直して CSV に保存（字幕は読まない）
+    再計算した動画数を返す
+    """
+    hits = KeywordHitMatrix.load(KEYWORD_HITS_FILE)
+    scores = hits.scores(THRESHOLD, get_keyword_matcher().category_keywords)
+    scores.to_csv(KEYWORD_SCORES_FILE, index=False, encoding="utf-8-sig")
+    return len(scores)
+
+
+def merge_with_previous(df: pd.DataFrame, output_path: Path) -> pd.DataFrame:
+    """
+    前回の分析結果に今回の結果を追加（同じ動画は今回の結果で置き換え）
+    """
+    if not output_path.exists():
+        return df
+    previous = pd.read_csv(output_path, encoding="utf-8-sig")
+    merged = pd.concat([df, previous], ignore_index=True)
+    return merged.drop_duplicates("video_id", keep="first").reset_index(drop=True)
+
+
+def append_to_csv(
+    df: pd.DataFrame, output_path: Path, columns: list[str] | None = None
+) -> list[str]:
+    """
+    分析結果を CSV に追記し、ファイルの列順を返す
+    columns が None ならヘッダー付きで新規作成（既存ファイルは上書き）
+    """
+    if columns is None:
+        df.to_csv(output_path, index=False, encoding="utf-8-sig")
+        return df.columns.tolist()
+    # 追記時は BOM を書かない。列は既存ファイルに合わせる
+    df.reindex(columns=columns).to_csv(
+        output_path, mode="a", header=False, index=False, encoding="utf-8"
+    )
+    return columns
+
+
+def run_streaming(
+    playlist_ids: list[str],
+    crawl_state: CrawlState,
+    incremental: bool,
+    transcript_cache,
+    checkpoint: RunCheckpoint,
+    resume: bool = False,
+) -> int:
+    """
+    動画を STREAM_BATCH_SIZE 本ずつ 詳細取得 → 字幕取得 → 分析 → CSV 追記 の順に流す
+    メモリに載るのは 1 バッチ分だけで、CSV にはバッチごとに追記する
+    （Parquet はバッチごとに一時ディレクトリに書き、最後にデータセットへまとめて移す）
+    CSV に書いた動画はチェックポイントに記録し、resume=True ならそれらを飛ばす
+    処理した動画数を返す
+    """
+    import youtube_client
+
+    columns = None
+    if (incremental or resume) and OUTPUT_FILE.exists():
+        columns = pd.read_csv(OUTPUT_FILE, nrows=0, encoding="utf-8-sig").columns
+        columns = columns.tolist()
+    # 全件クロールの新規実行なら出力を置き換え、それ以外は前回の出力に追加する
+    fresh = not (incremental or resume)
+    done_ids = checkpoint.done_ids("streamed") if resume else set()
+    parquet_writer = None
+    if OUTPUT_FORMAT == "parquet":
+        import parquet_output
+
+        # Parquet はバッチごとに一時ディレクトリに書き、最後に 1 回だけデータセットへ移す
+        parquet_writer = parquet_output.ResultWriter(OUTPUT_DIR, replace=fresh, resume=resume)
+    # 出現回数行列はバッチごとにシャードとして書き、最後に 1 回だけまとめる
+    if fresh:
+        for path in KEYWORD_HITS_SHARDS.glob("*.npz"):
+            path.unlink()
+    KEYWORD_HITS_SHARDS.mkdir(parents=True, exist_ok=True)
+
+    total = 0
+    batches = youtube_client.iter_video_ids(
+        playlist_ids,
+        API_KEY,
+        title_filter=TITLE_FILTER,
+        batch_size=STREAM_BATCH_SIZE,
+        crawl_state=crawl_state,
+        full=not incremental,
+    )
+    while True:
+        # 段階ごとの時間はバッチをまたいで合算する
+        with metrics.stage("crawl") as stage:
+            batch = next(batches, None)
+            stage.add_rows(len(batch or []))
+        if batch is None:
+            break
+        video_ids = [v["video_id"] for v in batch if v["video_id"] not in done_ids]
+        if not video_ids:
+            continue
+        with metrics.stage("details") as stage:
+            df_video_details = youtube_client.get_video_details(video_ids, API_KEY)
+            stage.add_rows(len(df_video_details))
+        with metrics.stage("subtitles") as stage:
+            df_subtitles = fetch_transcripts.extract_subtitles_from_videos(
+                video_ids, cache=transcript_cache
+            )
+            stage.add_rows(len(df_subtitles))
+        result = pd.merge(df_video_details, df_subtitles, on="video_id", how="outer")
+        with metrics.stage("analysis") as stage:
+            result_analyzed, hits = analyze_subtitles(result)
+            stage.add_rows(len(result_analyzed))
+
+        with metrics.stage("save") as stage:
+            if parquet_writer is not None:
+                parquet_writer.write(result_analyzed)
+            else:
+                columns = append_to_csv(result_analyzed, OUTPUT_FILE, columns)
+            hits.save(KEYWORD_HITS_SHARDS / f"{time.time_ns()}.npz")
+            stage.add_rows(len(result_analyzed))
+        checkpoint.append_rows("streamed", [{"video_id": v} for v in video_ids])
+        total += len(result_analyzed)
+        print(f"  {total} videos analyzed and saved to {output_location()}")
+
+    with metrics.stage("save"):
+        if parquet_writer is not None:
+            parquet_writer.close()
+        save_keyword_hit_shards(merge=not fresh)
+    return total
+
+
+def crawl_with_quota(
+    playlist_ids: list[str], crawl_state: CrawlState, incremental: bool
+) -> tuple[pd.DataFrame, list[str]]:
+    """
+    プレイリストごとのクロールを割り当ての範囲内で実行する
+    差分クロール（新着動画）は全件クロール（バックフィル）より優先される
+    割り当てが尽きたプレイリストはクロール状態を更新しないので、次回の実行で取得される
+    (動画一覧, 後回しにしたプレイリストID) を返す
+    """
+    import youtube_client
+
+    priority = PRIORITY_NEW_UPLOADS if incremental else PRIORITY_BACKFILL
+    scheduler = QuotaScheduler(
+        youtube_client.get_quota_budget(), max_workers=youtube_client.API_MAX_WORKERS
+    )
+    for playlist_id in playlist_ids:
+        # 1 ページ目の 1 ユニットを下限の見積もりにする
+        scheduler.submit(
+            priority,
+            1,
+            playlist_id,
+            youtube_client.get_all_video_ids,
+            [playlist_id],
+            API_KEY,
+            title_filter=TITLE_FILTER,
+            max_workers=1,
+            crawl_state=crawl_state,
+            full=not incremental,
+        )
+    results, deferred = scheduler.run()
+    frames = [results[p] for p in playlist_ids if p in results]
+    df = (
+        pd.concat(frames, ignore_index=True)
+        if frames
+        else pd.DataFrame(columns=["video_id", "title"])
+    )
+    return df, deferred
+
+
+def get_details_with_checkpoint(
+    video_ids: list[str], checkpoint: RunCheckpoint, priority: int = PRIORITY_BACKFILL
+) -> tuple[pd.DataFrame, list[str]]:
+    """
+    動画詳細を CHECKPOINT_CHUNK 本ずつ取得してチェックポイントに追記する
+    チェックポイントに既にある動画は取得しない
+    割り当てに収まらないチャンクは後回しにし、(動画詳細, 後回しにした動画ID) を返す
+    """
+    import youtube_client
+
+    done_ids = checkpoint.done_ids("details")
+    remaining = [v for v in video_ids if v not in done_ids]
+    if done_ids:
+        print(f"  {len(video_ids) - len(remaining)} video details loaded from checkpoint.")
+
+    def fetch_chunk(chunk_ids: list[str]) -> None:
+        try:
+            chunk = youtube_client.get_video_details(chunk_ids, API_KEY)
+        except youtube_client.PartialResultError as e:
+            # 取得できたバッチは保存しておき、--resume では失敗した分だけを取り直す
+            checkpoint.append_rows("details", e.partial.to_dict("records"))
+            print(f"  Failed to fetch video details: {e}")
+            raise
+        checkpoint.append_rows("details", chunk.to_dict("records"))
+
+    # チャンク内は get_video_details が並列に取得するので、チャンクは順番に流す
+    scheduler = QuotaScheduler(youtube_client.get_quota_budget())
+    chunks = {}
+    for i in range(0, len(remaining), CHECKPOINT_CHUNK):
+        chunk_ids = remaining[i : i + CHECKPOINT_CHUNK]
+        name = f"details[{i}]"
+        chunks[name] = chunk_ids
+        # 50 本ごとに 1 ユニット
+        scheduler.submit(
+            priority, math.ceil(len(chunk_ids) / 50), name, fetch_chunk, chunk_ids
+        )
+    _, deferred = scheduler.run()
+    deferred_ids = [v for name in deferred for v in chunks[name]]
+
+    df = pd.DataFrame(
+        checkpoint.load_rows("details"), columns=youtube_client.VIDEO_DETAIL_COLUMNS
+    )
+    df["date"] = pd.to_datetime(df["date"]).dt.date
+    return df, deferred_ids
+
+
+def refresh_statistics(playlist_ids: list[str], crawl_state: CrawlState) -> int:
+    """
+    既知の動画（クロール状態）の再生数・高評価数・コメント数だけを取得し、
+    時刻付きのスナップショットとして STATS_HISTORY_DIR に追記する
+    字幕の取得や分析は行わない。記録した動画数を返す
+    """
+    import stats_history
+    import youtube_client
+
+    videos = crawl_state.all_videos(playlist_ids)
+    if TITLE_FILTER:
+        videos = [v for v in videos if TITLE_FILTER in v["title"]]
+    video_ids = list(dict.fromkeys(v["video_id"] for v in videos))
+    if not video_ids:
+        print("No known videos. Run the full pipeline first.")
+        return 0
+    print(f"  Refreshing statistics of {len(video_ids)} known videos...")
+
+    scheduler = QuotaScheduler(youtube_client.get_quota_budget())
+    names = []
+    for i in range(0, len(video_ids), CHECKPOINT_CHUNK):
+        chunk_ids = video_ids[i : i + CHECKPOINT_CHUNK]
+        names.append(f"statistics[{i}]")
+        scheduler.submit(
+            PRIORITY_STATISTICS,
+            math.ceil(len(chunk_ids) / 50),
+            names[-1],
+            youtube_client.get_video_statistics,
+            chunk_ids,
+            API_KEY,
+        )
+    results, deferred = scheduler.run()
+    if deferred:
+        print(f"  Quota exhausted: {len(deferred)} chunks skipped in this snapshot.")
+
+    stats = pd.concat(
+        [results[name] for name in names if name in results]
+        or [pd.DataFrame(columns=youtube_client.VIDEO_STATISTICS_COLUMNS)],
+        ignore_index=True,
+    )
+    if stats.empty:
+        return 0
+    path = stats_history.append_snapshot(stats, STATS_HISTORY_DIR)
+    print(f"✓Save statistics snapshot: {path}")
+
+    velocity = stats_history.view_velocity(
+        stats_history.load_history(STATS_HISTORY_DIR, stats["video_id"].tolist())
+    )
+    if not velocity.empty:
+        print("\n[Fastest growing videos (views per hour since the previous snapshot)]")
+        print(velocity.head(10))
+    return len(stats)
+
+
+def get_subtitles_with_checkpoint(
+    video_ids: list[str],
+    checkpoint: RunCheckpoint,
+    transcript_cache,
+    corpus: CorpusWriter | None = None,
+) -> pd.DataFrame:
+    """
+    字幕を取得し、1 本終わるごとにチェックポイントに追記する
+    チェックポイントに既にある動画（取得エラー以外）は取得しない
+    corpus を渡すと字幕本文はそこに書き、返す DataFrame の subtitles 列は空になる
+    """
+    done_rows = [
+        row
+        for row in checkpoint.load_rows("subtitles")
+        if row["subtitle_status"] not in fetch_transcripts.RETRY_STATUSES
+    ]
+    done_ids = {row["video_id"] for row in done_rows}
+    remaining = [v for v in video_ids if v not in done_ids]
+    if done_ids:
+        print(f"  {len(video_ids) - len(remaining)} subtitles loaded from checkpoint.")
+
+    def save_row(row: dict) -> None:
+        if row["subtitle_status"] not in fetch_transcripts.RETRY_STATUSES:
+            checkpoint.append_rows("subtitles", [row])
+
+    df_new = fetch_transcripts.extract_subtitles_from_videos(
+        remaining, cache=transcript_cache, on_result=save_row, corpus=corpus
+    )
+    df_done = pd.DataFrame(done_rows, columns=fetch_transcripts.SUBTITLE_COLUMNS)
+    return pd.concat([df_done, df_new], ignore_index=True)
+
+
+def update_transcript_index(transcript_cache) -> None:
+    """今回キャッシュに保存された字幕を検索用の索引に追加する（TRANSCRIPT_INDEX が空なら何もしない）"""
+    from transcript_index import open_transcript_index
+
+    index = open_transcript_index()
+    if index is None:
+        return
+    with metrics.stage("index") as stage:
+        added = index.update(transcript_cache)
+        stage.add_rows(added)
+    print(f"  {added} transcripts added to the search index ({len(index)} in total).")
+    index.close()
+
+
+def open_work_queue() -> WorkQueue:
+    """
+    設定値（WORK_QUEUE_DIR・QUEUE_*）で作業キューを開く
+    並列のワーカーが同じ割り当てを使うので、API の使用量はキューの SQLite で数える
+    """
+    import youtube_client
+
+    queue = WorkQueue(
+        WORK_QUEUE_DIR, lease_sec=QUEUE_LEASE_SEC, max_attempts=QUEUE_MAX_ATTEMPTS
+    )
+    youtube_client.use_quota_ledger(queue.path)
+    return queue
+
+
+def enqueue_playlists(queue: WorkQueue, playlist_ids: list[str]) -> int:
+    """プレイリストごとのクロールをタスクにする（動画のシャードより先に実行される）"""
+    return queue.put_many(
+        "playlist",
+        [(p, {"playlist_id": p, "index": i}) for i, p in enumerate(playlist_ids)],
+        priority=0,
+    )
+
+
+def run_queue_task(queue: WorkQueue, task: dict, transcript_cache) -> None:
+    """
+    タスクを 1 つ実行する
+    playlist: プレイリストの全動画を取得し、QUEUE_SHARD_SIZE 本ずつの videos タスクを追加する
+    videos:   動画詳細と字幕を取得し、main.py の統合後と同じ行を結果ファイルに書く
+    """
+    import youtube_client
+
+    payload = task["payload"]
+    if task["kind"] == "playlist":
+        playlist_id = payload["playlist_id"]
+        with metrics.stage("crawl") as stage:
+            # 途中のページで失敗したら一部の動画だけで完了にせず、タスクを失敗にして取り直す
+            videos = youtube_client.get_all_video_ids(
+                [playlist_id],
+                API_KEY,
+                title_filter=TITLE_FILTER,
+                max_workers=1,
+                strict=True,
+            )
+            stage.add_rows(len(videos))
+        video_ids = videos["video_id"].tolist()
+        shards = []
+        for start in range(0, len(video_ids), QUEUE_SHARD_SIZE):
+            chunk = video_ids[start : start + QUEUE_SHARD_SIZE]
+            # 再実行で新着が増えて区切りがずれても、別のシャードとして全動画を覆うようにする
+            key = f"{playlist_id}:{chunk[0]}:{chunk[-1]}"
+            shards.append((key, {**payload, "offset": start, "video_ids": chunk}))
+        added = queue.put_many("videos", shards, priority=1)
+        print(f"  {playlist_id}: {len(video_ids)} videos, {added} shards queued.")
+        return
+
+    video_ids = payload["video_ids"]
+    with metrics.stage("details") as stage:
+        df_video_details = youtube_client.get_video_details(video_ids, API_KEY)
+        stage.add_rows(len(df_video_details))
+    with metrics.stage("subtitles") as stage:
+        df_subtitles = fetch_transcripts.extract_subtitles_from_videos(
+            video_ids, cache=transcript_cache
+        )
+        stage.add_rows(len(df_subtitles))
+    deferred = int((df_subtitles["subtitle_status"] == "deferred").sum())
+    limiter = fetch_transcripts.get_subtitle_limiter()
+    if deferred and limiter.exhausted:
+        raise CircuitOpenError(f"{limiter.name}: {deferred} subtitles deferred")
+    if deferred:
+        # 取得できた字幕はキャッシュにあるので、シャードごと後で取り直す（空の字幕を結果にしない）
+        raise RuntimeError(f"{deferred} subtitles deferred by throttling or transient errors")
+    result = pd.merge(df_video_details, df_subtitles, on="video_id", how="outer")
+    queue.write_result(task, result.to_dict("records"))
+
+
+def run_queue_worker(queue: WorkQueue, worker: str, max_tasks: int | None = None) -> int:
+    """
+    キューが空になるまで（max_tasks 個まで）タスクを取って実行する
+    他のワーカーの実行中のタスクが残っていれば、新しいシャード・リース切れを待って続ける
+    割り当て切れならタスクを戻して EXIT_QUOTA_DEFERRED、制限が続いて諦めたら
+    タスクを戻して EXIT_THROTTLED、それ以外は 0 を返す
+    """
+    transcript_cache = fetch_transcripts.open_transcript_cache()
+    done = 0
+    try:
+        while max_tasks is None or done < max_tasks:
+            task = queue.claim(worker)
+            if task is None:
+                if not queue.unfinished():
+                    break
+                time.sleep(min(QUEUE_POLL_SEC, QUEUE_LEASE_SEC))
+                continue
+            print(f"[{worker}] {task['kind']} {task['key']} (attempt {task['attempts']})")
+            try:
+                with queue.hold(task):
+                    run_queue_task(queue, task, transcript_cache)
+            except QuotaExceededError:
+                queue.release(task)
+                print("\nDaily API quota exhausted: the task was returned to the queue.")
+                return EXIT_QUOTA_DEFERRED
+            except CircuitOpenError as e:
+                # 以降のタスクもすべて失敗するので、試行回数を使わずに戻して終わる
+                queue.release(task)
+                print(f"\nStill throttled ({e}): the task was returned to the queue.")
+                return EXIT_THROTTLED
+            except Exception as e:
+                failed = queue.fail(task, f"{type(e).__name__}: {e}")
+                state = "gave up" if failed else "will retry"
+                print(f"  Task {task['key']} failed ({state}): {type(e).__name__}: {e}")
+                continue
+            if not queue.complete(task):
+                # リースが切れて別のワーカーが取り直した（完了にするのはそのワーカー）
+                print(f"  Task {task['key']} lost its lease to another worker.")
+                continue
+            done += 1
+    finally:
+        print(f"\n[{worker}] {done} tasks done. Queue: {queue.report()}")
+        update_transcript_index(transcript_cache)
+        print_cache_reports(transcript_cache)
+    return 0
+
+
+def load_queue_results(queue: WorkQueue, corpus: CorpusWriter) -> pd.DataFrame:
+    """
+    完了した videos タスクの結果を集め、main.py の統合後と同じ表（video_id 順）を返す
+    字幕本文は corpus に書き、subtitles 列は空にする。複数のプレイリストにある動画は
+    プレイリスト・シャードの順で最初の行を使う
+    """
+    import youtube_client
+
+    tasks = sorted(
+        queue.tasks("videos", "done"),
+        key=lambda t: (t["payload"]["index"], t["payload"]["offset"]),
+    )
+    rows = []
+    seen = set()
+    for task in tasks:
+        for row in queue.read_result(task):
+            if row["video_id"] in seen:
+                continue
+            seen.add(row["video_id"])
+            if row["subtitle_status"] not in fetch_transcripts.RETRY_STATUSES:
+                corpus.add(row["video_id"], row["subtitles"])
+            rows.append({**row, "subtitles": None})
+
+    columns = youtube_client.VIDEO_DETAIL_COLUMNS + fetch_transcripts.SUBTITLE_COLUMNS[1:]
+    df = pd.DataFrame(rows, columns=columns)
+    df["date"] = pd.to_datetime(df["date"]).dt.date
+    # main.py の外部結合（pd.merge(how="outer")）と同じく video_id の順に並べる
+    return df.sort_values("video_id", ignore_index=True)
+
+
+def print_cache_reports(transcript_cache=None) -> None:
+    """字幕キャッシュ・APIレスポンスキャッシュ・API割り当て・レート調整の集計を表示して閉じる"""
+    import youtube_client
+
+    if transcript_cache is not None:
+        print("\n[Transcript cache]")
+        print(f"  {transcript_cache.report()}")
+        transcript_cache.close()
+    else:
+        print()
+
+    response_cache = youtube_client.get_response_cache()
+    if response_cache is not None:
+        print("[API response cache]")
+        print(f"  {response_cache.report()}")
+        youtube_client.close_response_cache()
+
+    budget = youtube_client.get_quota_budget()
+    print("[API quota]")
+    print(f"  {budget.report()}")
+    budget.save()
+
+    # 調整した並列数・頻度と、制限された回数（リクエストを送った分だけ）
+    limiters = [youtube_client.get_api_limiter(), fetch_transcripts.get_subtitle_limiter()]
+    if any(limiter.stats["requests"] for limiter in limiters):
+        print("[Rate control]")
+        for limiter in limiters:
+            if limiter.stats["requests"]:
+                print(f"  {limiter.name}: {limiter.report()}")
+
+
+def write_run_reports() -> None:
+    """
+    段階ごとの計測値を表示し、実行レポート（JSON）・Prometheus textfile・
+    プロファイル（--profile 時）を書き出す（終了時に atexit から呼ばれる）
+    """
+    m = metrics.get_metrics()
+    if m.stages:
+        print("\n[Stages]")
+        print(m.summary())
+    if RUN_REPORT:
+        print(f"  run report: {m.write_json(RUN_REPORT)}")
+    if PROMETHEUS_TEXTFILE:
+        print(f"  prometheus textfile: {m.write_prometheus(PROMETHEUS_TEXTFILE)}")
+    for path in m.write_profiles():
+        print(f"  profile: {path}")
+
+
+def exit_quota_deferred(transcript_cache, what: str) -> None:
+    """割り当て切れで処理を後回しにしたとき、チェックポイントを残して終了する"""
+    print(f"\nDaily API quota exhausted: {what} deferred.")
+    print("Run `python main.py --resume` after the quota resets (midnight Pacific Time).")
+    print_cache_reports(transcript_cache)
+    exit(EXIT_QUOTA_DEFERRED)
+
+
+def exit_throttled(transcript_cache, what: str, error: CircuitOpenError) -> None:
+    """制限が続いて諦めたとき、割り当て切れと同じくチェックポイントを残して終了する"""
+    print(f"\nStill throttled after repeated cooldowns ({error}): {what} deferred.")
+    print("Run `python main.py --resume` later.")
+    print_cache_reports(transcript_cache)
+    exit(EXIT_THROTTLED)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="YouTube channel analysis pipeline")
+    parser.add_argument(
+        "--full-crawl",
+        action="store_true",
+        help="crawl every video again instead of only new uploads (drops deleted videos)",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="process videos in small batches and append results to the CSV as they finish",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="continue an interrupted run from its checkpoint, skipping finished stages and videos",
+    )
+    parser.add_argument(
+        "--refresh-stats",
+        action="store_true",
+        help="only fetch views/likes/comments of known videos and append a snapshot to the history",
+    )
+    parser.add_argument(
+        "--rescore",
+        action="store_true",
+        help="recompute keyword scores from the saved hit matrix with the current THRESHOLD "
+        "and categories, without reading transcripts",
+    )
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="cprofile",
+        choices=metrics.PROFILE_MODES,
+        help="profile each stage with cProfile (default) or by sampling every thread's "
+        f"stack, and write the results to {PROFILE_DIR}",
+    )
+    return parser.parse_args()
+
+
+def output_location() -> str:
+    if OUTPUT_FORMAT == "parquet":
+        import parquet_output
+
+        metrics_path = OUTPUT_DIR / parquet_output.METRICS_DIR
+        transcripts_path = OUTPUT_DIR / parquet_output.TRANSCRIPTS_DIR
+        return f"{metrics_path}, {transcripts_path}"
+    return str(OUTPUT_FILE)
+
+
+def attach_subtitles(df: pd.DataFrame, corpus: TranscriptCorpus) -> pd.DataFrame:
+    """コーパスにある動画の subtitles 列を字幕本文で埋めたコピーを返す"""
+    df = df.copy()
+    df["subtitles"] = [
+        corpus.text(v) if v in corpus else text
+        for v, text in zip(df["video_id"], df["subtitles"])
+    ]
     return df
 
 
-def save_to_csv(df: pd.DataFrame, output_path: Path):
+def _chunks(df: pd.DataFrame, corpus: TranscriptCorpus | None):
+    """保存用に CHECKPOINT_CHUNK 行ずつ字幕本文を付けて返す（本文を一度に全部持たない）"""
+    if corpus is None:
+        yield df
+        return
+    # 0 行でも空のチャンクを 1 つ返す（ヘッダーだけの出力・置き換えのため）
+    for start in range(0, max(len(df), 1), CHECKPOINT_CHUNK):
+        yield attach_subtitles(df.iloc[start : start + CHECKPOINT_CHUNK], corpus)
+
+
+def save_to_parquet(
+    df: pd.DataFrame,
+    output_dir: Path,
+    replace: bool,
+    corpus: TranscriptCorpus | None = None,
+):
+    """
+    分析結果を metrics / transcripts の Parquet データセットに保存（channel_id で分割）
+    replace=False なら既存のデータセットに追加する（既に保存済みの動画は今回の結果で置き換え）
     """
-    分析結果を CSV に保存
+    import parquet_output
+
+    writer = parquet_output.ResultWriter(output_dir, replace)
+    for chunk in _chunks(df, corpus):
+        writer.write(chunk)
+    metrics_path, transcripts_path = writer.close()
+    print(f"✓Save analysis results: {metrics_path}, {transcripts_path}")
+
+
+def save_to_csv(
+    df: pd.DataFrame, output_path: Path, corpus: TranscriptCorpus | None = None
+):
     """
-    df.to_csv(output_path, index=False, encoding="utf-8-sig")
+    分析結果を CSV に保存（corpus があれば字幕本文はチャンクごとにそこから読む）
+    """
+    columns = None
+    for chunk in _chunks(df, corpus):
+        columns = append_to_csv(chunk, output_path, columns)
     print(f"✓Save analysis results: {output_path}")
 
 
 if __name__ == "__main__":
+    import youtube_client
+
+    args = parse_args()
+
+    if args.rescore:
+        # 保存済みの出現回数行列だけで再計算（API・字幕には触れない）
+        if not KEYWORD_HITS_FILE.exists():
+            print(f"ERROR: {KEYWORD_HITS_FILE} not found. Run the analysis first.")
+            exit(1)
+        try:
+            total = rescore()
+        except ValueError as e:
+            print(f"ERROR: {e}")
+            exit(1)
+        print(f"Rescored {total} videos (threshold: {THRESHOLD}): {KEYWORD_SCORES_FILE}")
+        exit(0)
+
     if not VIDEO_IDS:
         print("ERROR: VIDEO_IDS not set. Please check your .env file.")
         exit(1)
 
     if not API_KEY:
         raise ValueError("YouTube API key is missing.")
+    check_output_settings()
 
     print("=" * 60)
     print("YouTube channel analysis pipeline")
     print("=" * 60)
 
+    # 終了のしかた（正常終了・割り当て切れ・中断）にかかわらず計測値を書き出す
+    if args.profile:
+        metrics.get_metrics().enable_profiling(args.profile, PROFILE_DIR)
+    atexit.register(write_run_reports)
+
+    if args.refresh_stats:
+        # 統計情報だけを更新（チェックポイント・出力 CSV には触れない）
+        print("\n[1] Getting playlist ID...")
+        try:
+            with metrics.stage("playlists"):
+                playlist_data = youtube_client.get_playlist_ids(VIDEO_IDS, API_KEY)
+            print("[2] Refreshing video statistics...")
+            with metrics.stage("statistics") as stage:
+                total = refresh_statistics(
+                    playlist_data["playlist_id"].tolist(), CrawlState(CRAWL_STATE_FILE)
+                )
+                stage.add_rows(total)
+        except CircuitOpenError as e:
+            exit_throttled(None, "statistics refresh", e)
+        print(f"\nStatistics refreshed: {total} videos")
+        print_cache_reports()
+        exit(0)
+
+    # チェックポイント: --resume なら前回の続きから、そうでなければ新規に開始
+    checkpoint = RunCheckpoint(CHECKPOINT_DIR)
+    resume = args.resume and checkpoint.exists()
+    if resume:
+        print(f"\nResuming from checkpoint: {CHECKPOINT_DIR}")
+    else:
+        if args.resume:
+            print("\nNo checkpoint found. Starting a new run.")
+        checkpoint.clear()
+
     # Step 1: プレイリストID取得
     print("\n[1] Getting playlist ID...")
-    playlist_data = youtube_client.get_playlist_ids(VIDEO_IDS, API_KEY)
-    if DEBUG:
-        print("Playlist Data:")
-        print(playlist_data)
+    if checkpoint.has_stage("playlists"):
+        playlist_ids = checkpoint.load_stage("playlists")
+    else:
+        try:
+            with metrics.stage("playlists"):
+                playlist_data = youtube_client.get_playlist_ids(VIDEO_IDS, API_KEY)
+        except CircuitOpenError as e:
+            exit_throttled(None, "the whole run", e)
+        if DEBUG:
+            print("Playlist Data:")
+            print(playlist_data)
+        playlist_ids = playlist_data["playlist_id"].tolist()
+        checkpoint.save_stage("playlists", playlist_ids)
 
-    # Step 2: 全動画ID取得
+    crawl_state = CrawlState(CRAWL_STATE_FILE)
+    run_info = checkpoint.load_stage("run")
+    if run_info is None:
+        run_info = {
+            "incremental": not args.full_crawl
+            and all(crawl_state.has_playlist(p) for p in playlist_ids)
+        }
+        checkpoint.save_stage("run", run_info)
+    incremental = run_info["incremental"]
+    transcript_cache = fetch_transcripts.open_transcript_cache()
+
+    if args.stream:
+        # Step 2-7: バッチごとに 動画ID → 詳細 → 字幕 → 分析 → CSV追記
+        print(f"[2-7] Streaming videos in batches of {STREAM_BATCH_SIZE}...")
+        try:
+            total = run_streaming(
+                playlist_ids,
+                crawl_state,
+                incremental,
+                transcript_cache,
+                checkpoint,
+                resume,
+            )
+        except QuotaExceededError:
+            exit_quota_deferred(transcript_cache, "remaining batches")
+        except CircuitOpenError as e:
+            exit_throttled(transcript_cache, "remaining batches", e)
+        crawl_state.save(CRAWL_STATE_FILE)  # 結果を保存してから既知の動画として記録
+        checkpoint.clear()
+        update_transcript_index(transcript_cache)
+
+        print("\n" + "=" * 60)
+        print(f"Analysis finished: {total} videos")
+        print("=" * 60)
+        print_cache_reports(transcript_cache)
+        print(f"\n output: {output_location()}")
+        exit(0)
+
+    # Step 2: 全動画ID取得（前回までに取得済みの動画に到達したら打ち切り）
     print("[2] Getting all video IDs...")
-    playlist_ids = playlist_data["playlist_id"].tolist()
-    filtered_videos_data = youtube_client.get_all_video_ids(
-        playlist_ids, API_KEY, title_filter=TITLE_FILTER
-    )
+    if checkpoint.has_stage("videos"):
+        filtered_videos_data = pd.DataFrame(
+            checkpoint.load_stage("videos"), columns=["video_id", "title"]
+        )
+        # 中断前のクロールで更新されたクロール状態を引き継ぐ
+        crawl_state = CrawlState(checkpoint.path / "crawl_state.json")
+    else:
+        try:
+            with metrics.stage("crawl") as stage:
+                filtered_videos_data, deferred_playlists = crawl_with_quota(
+                    playlist_ids, crawl_state, incremental
+                )
+                stage.add_rows(len(filtered_videos_data))
+        except CircuitOpenError as e:
+            exit_throttled(transcript_cache, "the crawl", e)
+        if deferred_playlists:
+            # 後回しにしたプレイリストは次回の実行でクロールされる
+            print(
+                f"  Quota exhausted: {len(deferred_playlists)} playlists deferred "
+                "to the next run."
+            )
+        crawl_state.save(checkpoint.path / "crawl_state.json")
+        checkpoint.save_stage("videos", filtered_videos_data.to_dict("records"))
     if DEBUG:
         print("All Videos Data:")
         print(filtered_videos_data)
 
+    new_label = "new " if incremental else ""
     if TITLE_FILTER:
         print(
-            f"{len(filtered_videos_data)} videos matched title filter '{TITLE_FILTER}'."
+            f"{len(filtered_videos_data)} {new_label}videos matched title filter '{TITLE_FILTER}'."
         )
     else:
-        print(f"{len(filtered_videos_data)} videos found.")
+        print(f"{len(filtered_videos_data)} {new_label}videos found.")
+
+    if filtered_videos_data.empty:
+        crawl_state.save(CRAWL_STATE_FILE)
+        checkpoint.clear()
+        print("No new videos to analyze.")
+        exit(0)
 
-    # Step 3: 動画詳細情報取得
+    # Step 3: 動画詳細情報取得（チャンクごとにチェックポイントへ保存）
     print("[3] Getting video details...")
     all_video_ids = filtered_videos_data["video_id"].tolist()
-    df_video_details = youtube_client.get_video_details(all_video_ids, API_KEY)
+    try:
+        with metrics.stage("details") as stage:
+            df_video_details, deferred_ids = get_details_with_checkpoint(
+                all_video_ids,
+                checkpoint,
+                PRIORITY_NEW_UPLOADS if incremental else PRIORITY_BACKFILL,
+            )
+            stage.add_rows(len(df_video_details))
+    except CircuitOpenError as e:
+        exit_throttled(transcript_cache, "video details", e)
+    if deferred_ids:
+        exit_quota_deferred(transcript_cache, f"details of {len(deferred_ids)} videos")
     if DEBUG:
         print("Video Details:")
         print(df_video_details)
 
-    # Step 4: 字幕取得
+    # Step 4: 字幕取得（キャッシュ・チェックポイントに無い動画だけダウンロード）
+    # 字幕本文はメモリに溜めず、チェックポイント内のコーパス（連結ファイル＋索引）に書く
     print("[4] Downloading subtitles...")
-    df_subtitles = fetch_transcripts.extract_subtitles_from_videos(all_video_ids)
+    corpus_path = checkpoint.path / "corpus"
+    with metrics.stage("subtitles") as stage, CorpusWriter(corpus_path) as corpus_writer:
+        df_subtitles = get_subtitles_with_checkpoint(
+            all_video_ids, checkpoint, transcript_cache, corpus_writer
+        )
+        stage.add_rows(len(df_subtitles))
+    corpus = TranscriptCorpus(corpus_path)
 
     # Step 5: データ統合
     print("[5] Data integration in progress...")
@@ -132,15 +993,26 @@ if __name__ == "__main__":
 
     # Step 6 キーワード分析 & CSV出力
     print("[6] Keyword analysis in progress...")
-    result_analyzed = analyze_subtitles(result)
+    with metrics.stage("analysis") as stage:
+        result_analyzed, hits = analyze_subtitles(result, corpus)
+        stage.add_rows(len(result_analyzed))
 
-    # Step 7: CSV に保存
+    # Step 7: CSV に保存（差分クロール時は前回の結果に追加）
     print("[7] Saving results...")
-    save_to_csv(result_analyzed, OUTPUT_DIR / "video_analysis_result.csv")
-
-    # Step 8: 一時ディレクトリ削除
-    print("[8] Deleting temporary subtitle files...")
-    fetch_transcripts.delete_temp_directory(fetch_transcripts.TMP_SUB_DIR)
+    with metrics.stage("save") as stage:
+        stage.add_rows(len(result_analyzed))
+        if OUTPUT_FORMAT == "parquet":
+            # 差分クロール時は今回の動画だけを既存のデータセットに追加する
+            save_to_parquet(result_analyzed, OUTPUT_DIR, not incremental, corpus)
+        else:
+            if incremental:
+                result_analyzed = merge_with_previous(result_analyzed, OUTPUT_FILE)
+            save_to_csv(result_analyzed, OUTPUT_FILE, corpus)
+        save_keyword_hits(hits, merge=incremental)
+    corpus.close()
+    crawl_state.save(CRAWL_STATE_FILE)  # 結果を保存してから既知の動画として記録
+    checkpoint.clear()
+    update_transcript_index(transcript_cache)
 
     print("\n" + "=" * 60)
     print("Analysis finished")
@@ -151,15 +1023,11 @@ if __name__ == "__main__":
     if not result_analyzed.empty:
         print(
             result_analyzed[
-                [
-                    "video_id",
-                    "title",
-                    "primary_category",
-                    "medical_per_min",
-                    "legal_per_min",
-                    "daily_surprising_per_min",
-                ]
+                ["video_id", "title", "primary_category"]
+                + [f"{c}_per_min" for c in get_keyword_matcher().categories]
             ].head(10)
         )
 
-    print(f"\n output file: {OUTPUT_DIR / 'analysis_result.csv'}")
+    print_cache_reports(transcript_cache)
+
+    print(f"\n output: {output_location()}")
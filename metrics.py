@@ -0,0 +1,359 @@
+import cProfile
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+# Prometheus のメトリクス名の接頭辞
+PREFIX = "ytca"
+# 待ち時間ヒストグラムの上限値（秒）。+Inf は自動で足す
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# --profile の方式: cProfile（メインスレッドの関数ごとの時間）/ sample（全スレッドのスタックを定期採取）
+PROFILE_MODES = ("cprofile", "sample")
+# sample 方式の採取間隔（秒）
+SAMPLE_INTERVAL = 0.005
+
+
+class Histogram:
+    """Prometheus 形式の累積ヒストグラム（件数・合計・最大値も持つ）"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # 最後は +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        for i, upper in enumerate(self.buckets):
+            if value <= upper:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def cumulative(self) -> list[tuple[str, int]]:
+        """(le, その値以下の件数) の列（最後は "+Inf"）"""
+        total = 0
+        result = []
+        for upper, n in zip([*map(str, self.buckets), "+Inf"], self.counts):
+            total += n
+            result.append((upper, total))
+        return result
+
+    def quantile(self, q: float) -> float | None:
+        """分位点の近似値（その分位点を含むバケットの上限。+Inf なら最大値）"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        for (upper, total) in self.cumulative():
+            if total >= rank:
+                return self.max if upper == "+Inf" else min(float(upper), self.max)
+        return self.max
+
+
+class _Sampler:
+    """全スレッドのスタックを定期的に採取し、折りたたみ形式（flamegraph 用）で数える"""
+
+    def __init__(self, counts: Counter, interval: float = SAMPLE_INTERVAL):
+        self.counts = counts
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self) -> None:
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{Path(code.co_filename).name}:{code.co_name}")
+                    frame = frame.f_back
+                self.counts[";".join(reversed(stack))] += 1
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+
+class StageHandle:
+    """stage() の with で受け取る。処理した行数を add_rows() で記録する"""
+
+    def __init__(self):
+        self.rows = 0
+
+    def add_rows(self, n: int) -> None:
+        self.rows += n
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels: tuple) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+
+def _number(value) -> str:
+    """サンプルの値（整数はそのまま全桁、小数は repr で丸めずに書く。:g は 6 桁に丸める）"""
+    if isinstance(value, int):
+        return str(int(value))
+    return repr(float(value))
+
+
+class Metrics:
+    """
+    実行中の計測値を集める（スレッドセーフ）
+
+    - 段階（stage）ごとの経過時間・呼び出し回数・処理行数
+    - カウンター（リクエスト数・バイト数・リトライ・待機秒数など、ラベル付き）
+    - ヒストグラム（API・字幕取得の待ち時間など、ラベル付き）
+    JSON の実行レポートと Prometheus の textfile 形式で書き出す
+    enable_profiling() すると、段階ごとに cProfile またはスタックの採取結果を保存する
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+        self.counters: dict[tuple, float] = {}
+        self.histograms: dict[tuple, Histogram] = {}
+        self.stages: dict[str, dict] = {}
+        self.profile_mode: str | None = None
+        self.profile_dir: Path | None = None
+        self._profiles: dict[str, cProfile.Profile] = {}
+        self._samples: dict[str, Counter] = {}
+        self._profiling = False
+
+    # --- 記録 ---
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        """with の間の経過秒数をヒストグラム name に記録する"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def enable_profiling(self, mode: str, directory: Path | str) -> None:
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Profile mode must be one of {PROFILE_MODES}: {mode}")
+        self.profile_mode = mode
+        self.profile_dir = Path(directory)
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        パイプラインの 1 段階を計測する（同じ名前は合算。--stream のバッチごとなど）
+        プロファイルは入れ子になった内側の段階では取らない（外側の段階に含まれる）
+        """
+        handle = StageHandle()
+        profile = sampler = None
+        if self.profile_mode and not self._profiling:
+            self._profiling = True
+            if self.profile_mode == "cprofile":
+                profile = self._profiles.setdefault(name, cProfile.Profile())
+                profile.enable()
+            else:
+                sampler = _Sampler(self._samples.setdefault(name, Counter()))
+                sampler.start()
+        start = time.perf_counter()
+        try:
+            yield handle
+        finally:
+            elapsed = time.perf_counter() - start
+            if profile is not None:
+                profile.disable()
+            if sampler is not None:
+                sampler.stop()
+            if profile is not None or sampler is not None:
+                self._profiling = False
+            with self._lock:
+                stats = self.stages.setdefault(name, {"seconds": 0.0, "calls": 0, "rows": 0})
+                stats["seconds"] += elapsed
+                stats["calls"] += 1
+                stats["rows"] += handle.rows
+
+    # --- 書き出し ---
+
+    def to_dict(self) -> dict:
+        """JSON の実行レポート"""
+        with self._lock:
+            stages = {
+                name: {
+                    **s,
+                    "seconds": round(s["seconds"], 3),
+                    "rows_per_sec": round(s["rows"] / s["seconds"], 2)
+                    if s["rows"] and s["seconds"] > 0
+                    else None,
+                }
+                for name, s in self.stages.items()
+            }
+            counters = [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(self.counters.items())
+            ]
+            histograms = [
+                {
+                    "name": name,
+                    "labels": dict(labels),
+                    "count": h.count,
+                    "sum": round(h.sum, 6),
+                    "max": round(h.max, 6),
+                    "p50": h.quantile(0.5),
+                    "p95": h.quantile(0.95),
+                    "buckets": dict(h.cumulative()),
+                }
+                for (name, labels), h in sorted(self.histograms.items())
+            ]
+        return {
+            "started_at": datetime.fromtimestamp(self.started_at, timezone.utc).isoformat(),
+            "finished_at": datetime.now(timezone.utc).isoformat(),
+            "seconds": round(time.time() - self.started_at, 3),
+            "stages": stages,
+            "counters": counters,
+            "histograms": histograms,
+        }
+
+    def to_prometheus(self) -> str:
+        """Prometheus の textfile 形式（node_exporter の textfile コレクター用）"""
+        lines = []
+        with self._lock:
+            lines += [
+                f"# TYPE {PREFIX}_run_timestamp_seconds gauge",
+                f"{PREFIX}_run_timestamp_seconds {self.started_at:.3f}",
+                f"# TYPE {PREFIX}_run_seconds gauge",
+                f"{PREFIX}_run_seconds {time.time() - self.started_at:.3f}",
+            ]
+            for field in ("seconds", "calls", "rows"):
+                lines.append(f"# TYPE {PREFIX}_stage_{field} gauge")
+                for name, s in self.stages.items():
+                    labels = _labels((("stage", name),))
+                    lines.append(f"{PREFIX}_stage_{field}{labels} {_number(s[field])}")
+
+            for name in sorted({name for name, _ in self.counters}):
+                metric = f"{PREFIX}_{name}_total"
+                lines.append(f"# TYPE {metric} counter")
+                for (n, labels), value in sorted(self.counters.items()):
+                    if n == name:
+                        lines.append(f"{metric}{_labels(labels)} {_number(value)}")
+
+            for name in sorted({name for name, _ in self.histograms}):
+                metric = f"{PREFIX}_{name}"
+                lines.append(f"# TYPE {metric} histogram")
+                for (n, labels), h in sorted(self.histograms.items()):
+                    if n != name:
+                        continue
+                    for upper, total in h.cumulative():
+                        le = _labels(labels + (("le", upper),))
+                        lines.append(f"{metric}_bucket{le} {total}")
+                    lines.append(f"{metric}_sum{_labels(labels)} {_number(h.sum)}")
+                    lines.append(f"{metric}_count{_labels(labels)} {h.count}")
+        return "\n".join(lines) + "\n"
+
+    def write_json(self, path: Path | str) -> Path:
+        return _write_atomic(Path(path), json.dumps(self.to_dict(), indent=2) + "\n")
+
+    def write_prometheus(self, path: Path | str) -> Path:
+        # textfile コレクターが書きかけを読まないよう、別名で書いてから置き換える
+        return _write_atomic(Path(path), self.to_prometheus())
+
+    def write_profiles(self) -> list[Path]:
+        """
+        段階ごとのプロファイルを profile_dir に保存する
+        cprofile: {stage}.prof（pstats / snakeviz で開ける）と上位の関数を並べた {stage}.txt
+        sample:   {stage}.folded（flamegraph.pl・speedscope で開ける折りたたみ形式）
+        """
+        if self.profile_dir is None:
+            return []
+        self.profile_dir.mkdir(parents=True, exist_ok=True)
+        paths = []
+        for name, profile in self._profiles.items():
+            path = self.profile_dir / f"{name}.prof"
+            profile.dump_stats(path)
+            with (self.profile_dir / f"{name}.txt").open("w", encoding="utf-8") as f:
+                pstats.Stats(profile, stream=f).sort_stats("cumulative").print_stats(40)
+            paths.append(path)
+        for name, counts in self._samples.items():
+            path = self.profile_dir / f"{name}.folded"
+            path.write_text(
+                "".join(f"{stack} {n}\n" for stack, n in counts.most_common()),
+                encoding="utf-8",
+            )
+            paths.append(path)
+        return paths
+
+    def summary(self) -> str:
+        """段階ごとの経過時間・行数を表示用の文字列で返す"""
+        with self._lock:
+            stages = list(self.stages.items())
+        lines = []
+        for name, s in stages:
+            line = f"  {name}: {s['seconds']:.2f} s"
+            if s["rows"]:
+                rate = s["rows"] / s["seconds"] if s["seconds"] > 0 else 0.0
+                line += f", {s['rows']} rows ({rate:.1f} rows/s)"
+            lines.append(line)
+        return "\n".join(lines)
+
+
+def _write_atomic(path: Path, text: str) -> Path:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, path)
+    return path
+
+
+# プロセス全体で共有する計測値（youtube_client・fetch_transcripts・keywords・main が記録する）
+_metrics = Metrics()
+
+
+def get_metrics() -> Metrics:
+    return _metrics
+
+
+def inc(name: str, value: float = 1, **labels) -> None:
+    _metrics.inc(name, value, **labels)
+
+
+def observe(name: str, value: float, **labels) -> None:
+    _metrics.observe(name, value, **labels)
+
+
+def timer(name: str, **labels):
+    return _metrics.timer(name, **labels)
+
+
+def stage(name: str):
+    return _metrics.stage(name)
@@ -0,0 +1,195 @@
+import shutil
+import uuid
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+# 分析結果は 2 つのデータセットに分けて保存し、video_id で結合する
+#   metrics/     : 動画情報・キーワード分析の列（字幕本文を含まないので軽い）
+#   transcripts/ : 字幕本文
+# どちらも channel_id でパーティション分割する（metrics/channel_id=UC.../part-*.parquet）
+METRICS_DIR = "metrics"
+TRANSCRIPTS_DIR = "transcripts"
+# ResultWriter が実行中のバッチを置くディレクトリ（close() でデータセットに移す）
+STAGING_DIR = "parquet.staging"
+REPLACE_MARKER = "replace"
+PARTITION_COLUMN = "channel_id"
+TRANSCRIPT_COLUMNS = ["video_id", "channel_id", "subtitle_lang", "subtitle_kind", "subtitles"]
+
+INT_COLUMNS = ["views", "duration", "likes", "comments"]
+CATEGORY_COLUMNS = ["primary_category", "subtitle_kind", "subtitle_status"]
+
+
+def _typed(df: pd.DataFrame) -> pd.DataFrame:
+    """列を型付きに揃える（日付・int64 の件数・bool の判定・カテゴリ型）"""
+    df = df.copy()
+    for col in df.columns:
+        if col == "date":
+            df[col] = pd.to_datetime(df[col]).dt.date
+        elif col in INT_COLUMNS or col.endswith("_word_count"):
+            # 詳細が取れなかった動画は欠損になるので nullable な Int64 にする
+            df[col] = pd.to_numeric(df[col]).round().astype("Int64")
+        elif col.startswith("is_"):
+            df[col] = df[col].astype("boolean")
+        elif col in CATEGORY_COLUMNS:
+            df[col] = df[col].astype("string").astype("category")
+        elif df[col].dtype == object:
+            # 全て欠損のバッチでも null 型にならないよう文字列型に固定する
+            # （追記したファイル同士でスキーマが食い違わないように）
+            df[col] = df[col].astype("string")
+    return df
+
+
+def _write_dataset(df: pd.DataFrame, path: Path) -> None:
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    if "date" in table.column_names:
+        # 日付が全て欠損のバッチも date32 にそろえる
+        i = table.column_names.index("date")
+        table = table.set_column(i, "date", table["date"].cast(pa.date32()))
+    # 既存のファイルは残し、今回の分を別名のファイルとして追加する
+    pq.write_to_dataset(
+        table,
+        path,
+        partition_cols=[PARTITION_COLUMN],
+        basename_template=f"part-{uuid.uuid4().hex}-{{i}}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+        compression="zstd",
+    )
+
+
+def _remove_videos(path: Path, video_ids: list[str]) -> None:
+    """
+    データセットから video_ids の行を消す
+    video_id 列だけを読んで確かめ、該当する行を含むファイルだけを書き直す（空になれば削除）
+    """
+    if not path.exists() or not video_ids:
+        return
+    for file in sorted(path.rglob("*.parquet")):
+        ids = pq.ParquetFile(file).read(columns=["video_id"])["video_id"]
+        found = pc.is_in(ids, value_set=pa.array(video_ids, type=ids.type))
+        if not pc.any(found).as_py():
+            continue
+        table = pq.ParquetFile(file).read()
+        table = table.filter(pc.invert(found))
+        if table.num_rows == 0:
+            file.unlink()
+            continue
+        tmp = file.with_suffix(".parquet.tmp")
+        pq.write_table(table, tmp, compression="zstd")
+        tmp.replace(file)
+
+
+def _staged_partitioning() -> ds.Partitioning:
+    # 詳細が取れなかった動画だけのバッチでも channel_id を文字列として読む
+    return ds.partitioning(pa.schema([(PARTITION_COLUMN, pa.string())]), flavor="hive")
+
+
+def _move_dataset(staged: Path, path: Path) -> None:
+    """
+    staged のデータセットを path に追加する（バッチごとの小さなファイルは
+    パーティションごとにまとめて書き直す。行はスキャンしながら流すので全体をメモリに載せない）
+    """
+    if not staged.exists():
+        return
+    dataset = ds.dataset(staged, format="parquet", partitioning=_staged_partitioning())
+    ds.write_dataset(
+        dataset,
+        path,
+        format="parquet",
+        partitioning=[PARTITION_COLUMN],
+        partitioning_flavor="hive",
+        basename_template=f"part-{uuid.uuid4().hex}-{{i}}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+        file_options=ds.ParquetFileFormat().make_write_options(compression="zstd"),
+    )
+
+
+class ResultWriter:
+    """
+    1 回の実行の分析結果をバッチごとに書き、close() で metrics / transcripts の
+    データセットにまとめて反映する
+
+    バッチは output_dir/STAGING_DIR に書き、close() で前回までに保存済みの同じ動画を
+    1 回だけ消してから（replace=True ならデータセットごと削除してから）移す
+    resume=True なら前回の実行が途中で落ちて残したバッチも引き継ぐ
+    """
+
+    def __init__(self, output_dir: Path | str, replace: bool = False, resume: bool = False):
+        self.output_dir = Path(output_dir)
+        self.metrics_path = self.output_dir / METRICS_DIR
+        self.transcripts_path = self.output_dir / TRANSCRIPTS_DIR
+        self.staging = self.output_dir / STAGING_DIR
+        if self.staging.exists() and not resume:
+            shutil.rmtree(self.staging)
+        self.staging.mkdir(parents=True, exist_ok=True)
+        # 置き換えるかどうかも残し、再開した実行が前回の指定を引き継ぐ
+        if replace:
+            (self.staging / REPLACE_MARKER).touch()
+        self.replace = (self.staging / REPLACE_MARKER).exists()
+
+    def write(self, df: pd.DataFrame) -> None:
+        if df.empty:
+            return
+        df = _typed(df)
+        _write_dataset(
+            df.drop(columns=["subtitles"], errors="ignore"), self.staging / METRICS_DIR
+        )
+        _write_dataset(df.reindex(columns=TRANSCRIPT_COLUMNS), self.staging / TRANSCRIPTS_DIR)
+
+    def close(self) -> tuple[Path, Path]:
+        """書いたバッチをデータセットに反映し、書き込んだデータセットのパスを返す"""
+        staged = self.staging / METRICS_DIR
+        video_ids = []
+        if staged.exists():
+            dataset = ds.dataset(
+                staged, format="parquet", partitioning=_staged_partitioning()
+            )
+            video_ids = dataset.to_table(columns=["video_id"])["video_id"].to_pylist()
+        datasets = ((METRICS_DIR, self.metrics_path), (TRANSCRIPTS_DIR, self.transcripts_path))
+        for name, path in datasets:
+            if self.replace:
+                if path.exists():
+                    shutil.rmtree(path)
+            else:
+                _remove_videos(path, video_ids)
+            _move_dataset(self.staging / name, path)
+        shutil.rmtree(self.staging)
+        return self.metrics_path, self.transcripts_path
+
+
+def write_results(
+    df: pd.DataFrame, output_dir: Path | str, replace: bool = False
+) -> tuple[Path, Path]:
+    """
+    分析結果を metrics / transcripts の 2 つの Parquet データセットに追記する
+    既に保存済みの動画は今回の結果で置き換える（CSV の merge_with_previous と同じ）
+    replace=True なら既存のデータセットを削除してから書く（全件クロール時）
+    書き込んだデータセットのパスを返す（複数のバッチを書くときは ResultWriter を使う）
+    """
+    writer = ResultWriter(output_dir, replace)
+    writer.write(df)
+    return writer.close()
+
+
+def _read_dataset(path: Path, columns=None, video_ids=None) -> pd.DataFrame:
+    if not path.exists():
+        return pd.DataFrame(columns=columns)
+    dataset = ds.dataset(path, format="parquet", partitioning="hive")
+    expr = ds.field("video_id").isin(list(video_ids)) if video_ids is not None else None
+    return dataset.to_table(columns=columns, filter=expr).to_pandas()
+
+
+def read_metrics(
+    output_dir: Path | str, columns: list[str] | None = None, video_ids=None
+) -> pd.DataFrame:
+    """metrics データセットを読む（字幕本文は読まない）"""
+    return _read_dataset(Path(output_dir) / METRICS_DIR, columns, video_ids)
+
+
+def read_transcripts(output_dir: Path | str, video_ids=None) -> pd.DataFrame:
+    """transcripts データセットを読む。video_ids を指定するとその動画だけ"""
+    return _read_dataset(Path(output_dir) / TRANSCRIPTS_DIR, None, video_ids)
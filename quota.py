@@ -0,0 +1,276 @@
+import heapq
+import itertools
+import json
+import os
+import sqlite3
+import threading
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from zoneinfo import ZoneInfo
+
+# YouTube Data API の 1 日の上限は太平洋時間の 0 時にリセットされる
+QUOTA_TIMEZONE = ZoneInfo("America/Los_Angeles")
+
+# list 系メソッド（videos.list, playlistItems.list, channels.list）は 1 回 1 ユニット
+UNITS_PER_REQUEST = 1
+
+# スケジューラの優先度（小さいほど先に実行）
+PRIORITY_NEW_UPLOADS = 0
+PRIORITY_STATISTICS = 1
+PRIORITY_BACKFILL = 2
+
+
+@contextmanager
+def _file_lock(path: Path):
+    """path の OS のファイルロック（排他）を取る。別のプロセスとの読み直し・置き換えを重ねない"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("a+b") as f:
+        if os.name == "nt":
+            import msvcrt
+
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        else:
+            import fcntl
+
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if os.name == "nt":
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class QuotaExceededError(RuntimeError):
+    """1 日の API ユニット上限に達したため、リクエストを送らなかった"""
+
+
+class QuotaBudget:
+    """
+    YouTube Data API の 1 日あたりのユニット使用量を記録する共有オブジェクト
+
+    使用量は path の JSON に日付（太平洋時間）ごとに保存され、複数回の実行をまたいで
+    合算される。reserve() / charge() はスレッドセーフ
+
+    ledger（SQLite ファイル）を指定すると、使用量はその quota_usage 表で数える。
+    残りの確認と計上を 1 つの BEGIN IMMEDIATE トランザクションで行うので、
+    同じファイルを使う複数のプロセス（作業キューのワーカー）でも上限を超えない
+    """
+
+    def __init__(
+        self,
+        daily_limit: int,
+        path: Path | str | None = None,
+        ledger: Path | str | None = None,
+    ):
+        self.daily_limit = daily_limit
+        self.path = Path(path) if path is not None else None
+        self.ledger = Path(ledger) if ledger is not None else None
+        self.run_usage = {}  # 今回の実行での操作ごとの使用量
+        self._lock = threading.Lock()
+        self._date = self._today()
+        self._used_before_run = self._read_saved() or 0
+        self._saved_units = 0  # 今回の実行分のうち path に保存済みの分
+        self._conn = None
+        if self.ledger is not None:
+            self._conn = sqlite3.connect(
+                self.ledger, timeout=60, isolation_level=None, check_same_thread=False
+            )
+            self._conn.execute("PRAGMA journal_mode=DELETE")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS quota_usage"
+                " (date TEXT PRIMARY KEY, used INTEGER NOT NULL)"
+            )
+            # その日の台帳が無ければ、JSON に保存済みの使用量から始める
+            self._conn.execute(
+                "INSERT OR IGNORE INTO quota_usage (date, used) VALUES (?, ?)",
+                (self._date, self._used_before_run),
+            )
+
+    @staticmethod
+    def _today() -> str:
+        return datetime.now(QUOTA_TIMEZONE).date().isoformat()
+
+    def _read_saved(self) -> int | None:
+        """path に保存された今日の使用量（無ければ None）"""
+        if self.path is None or not self.path.exists():
+            return None
+        with self.path.open("r", encoding="utf-8") as f:
+            saved = json.load(f)
+        return int(saved.get("used", 0)) if saved.get("date") == self._date else None
+
+    def _roll_over(self) -> None:
+        """実行中に日付が変わったら、それまでの使用量を前日分として扱う"""
+        today = self._today()
+        if today != self._date:
+            self._date = today
+            self._used_before_run = -sum(self.run_usage.values())
+            self._saved_units = sum(self.run_usage.values())
+
+    def _used(self) -> int:
+        self._roll_over()
+        if self._conn is not None:
+            row = self._conn.execute(
+                "SELECT used FROM quota_usage WHERE date = ?", (self._date,)
+            ).fetchone()
+            return row[0] if row else 0
+        return self._used_before_run + sum(self.run_usage.values())
+
+    @contextmanager
+    def _transaction(self):
+        """ledger があれば BEGIN IMMEDIATE で他のプロセスの計上を待つ（無ければ何もしない）"""
+        if self._conn is None:
+            yield
+            return
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    def _add(self, operation: str, units: int, check: bool) -> None:
+        """units を operation に計上する（check=True なら残りが足りないとき計上しない）"""
+        with self._transaction():
+            used = self._used()
+            if check and self.daily_limit - used < units:
+                raise QuotaExceededError(
+                    f"Daily YouTube API quota exhausted ({used}/{self.daily_limit} units)."
+                )
+            if self._conn is not None:
+                self._conn.execute(
+                    "INSERT INTO quota_usage (date, used) VALUES (?, ?)"
+                    " ON CONFLICT(date) DO UPDATE SET used = used + excluded.used",
+                    (self._date, units),
+                )
+        self.run_usage[operation] = self.run_usage.get(operation, 0) + units
+
+    @property
+    def used(self) -> int:
+        """今日の使用量（今回の実行分と、ledger なら他のプロセスの分を含む）"""
+        with self._lock:
+            return self._used()
+
+    @property
+    def remaining(self) -> int:
+        return max(0, self.daily_limit - self.used)
+
+    def ensure(self, units: int = UNITS_PER_REQUEST) -> None:
+        """units 分の残りが無ければ QuotaExceededError を送出する"""
+        if self.remaining < units:
+            raise QuotaExceededError(
+                f"Daily YouTube API quota exhausted ({self.used}/{self.daily_limit} units)."
+            )
+
+    def reserve(self, operation: str, units: int = UNITS_PER_REQUEST) -> None:
+        """
+        残りを確かめて units を operation に計上する（確認と計上を 1 つのロックの中で行う）
+        残りが足りなければ計上せずに QuotaExceededError を送出する
+        """
+        with self._lock:
+            self._add(operation, units, check=True)
+
+    def charge(self, operation: str, units: int = UNITS_PER_REQUEST) -> None:
+        with self._lock:
+            self._add(operation, units, check=False)
+
+    def save(self) -> None:
+        """
+        今日の使用量を path に保存する
+        path の隣のロックファイルを取ってから保存済みの値を読み直し、今回まだ保存していない
+        分だけを足すので、同じ path に保存する他のプロセスの分を上書きしない
+        """
+        if self.path is None:
+            return
+        with self._lock, _file_lock(self.path.with_name(self.path.name + ".lock")):
+            self._roll_over()
+            run_units = sum(self.run_usage.values())
+            used = (self._read_saved() or 0) + run_units - self._saved_units
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_name(
+                f"{self.path.name}.{os.getpid()}.{threading.get_ident()}.tmp"
+            )
+            with tmp.open("w", encoding="utf-8") as f:
+                json.dump({"date": self._date, "used": used}, f)
+            os.replace(tmp, self.path)
+            self._saved_units = run_units
+            self._used_before_run = used - run_units
+
+    def report(self) -> str:
+        per_operation = ", ".join(
+            f"{op}: {units}" for op, units in sorted(self.run_usage.items())
+        )
+        return (
+            f"this run: {sum(self.run_usage.values())} units ({per_operation or '-'}), "
+            f"today: {self.used}/{self.daily_limit} units, remaining: {self.remaining}"
+        )
+
+
+class QuotaScheduler:
+    """
+    ユニット見積もり付きの処理を優先度順に実行し、予算に収まらない処理は翌日以降に回す
+
+    同じ優先度の処理は max_workers 並列で実行する。見積もりは下限として扱い、
+    実行中に QuotaExceededError が出た処理も「後回し」に含める
+    """
+
+    def __init__(self, budget: QuotaBudget, max_workers: int = 1):
+        self.budget = budget
+        self.max_workers = max_workers
+        self._queue = []
+        self._order = itertools.count()
+
+    def submit(
+        self, priority: int, units: int, name: str, func: Callable, *args, **kwargs
+    ) -> None:
+        heapq.heappush(
+            self._queue, (priority, next(self._order), units, name, func, args, kwargs)
+        )
+
+    def run(self) -> tuple[dict, list[str]]:
+        """
+        Returns:
+            (名前 → 戻り値, 後回しにした処理の名前のリスト)
+        """
+        results = {}
+        deferred = []
+        while self._queue:
+            # 同じ優先度の処理をまとめて、予算に収まる分だけ実行する
+            priority = self._queue[0][0]
+            group = []
+            while self._queue and self._queue[0][0] == priority:
+                group.append(heapq.heappop(self._queue))
+
+            admitted = []
+            reserved = 0
+            for job in group:
+                units = job[2]
+                if reserved + units <= self.budget.remaining:
+                    admitted.append(job)
+                    reserved += units
+                else:
+                    deferred.append(job[3])
+
+            def execute(job):
+                _, _, _, name, func, args, kwargs = job
+                try:
+                    return name, func(*args, **kwargs), False
+                except QuotaExceededError:
+                    return name, None, True
+
+            workers = max(1, min(self.max_workers, len(admitted)))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                for name, result, was_deferred in executor.map(execute, admitted):
+                    if was_deferred:
+                        deferred.append(name)
+                    else:
+                        results[name] = result
+
+        return results, deferred
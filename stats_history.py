@@ -0,0 +1,85 @@
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# 統計スナップショットの列と型（動画ID は辞書エンコードで繰り返しを圧縮）
+HISTORY_SCHEMA = pa.schema(
+    [
+        ("snapshot_at", pa.timestamp("s", tz="UTC")),
+        ("video_id", pa.dictionary(pa.int32(), pa.string())),
+        ("views", pa.int64()),
+        ("likes", pa.int64()),
+        ("comments", pa.int64()),
+    ]
+)
+
+
+def append_snapshot(
+    stats: pd.DataFrame, history_dir: Path | str, taken_at: datetime | None = None
+) -> Path:
+    """
+    統計情報（video_id, views, likes, comments）を時刻付きのスナップショットとして追記する
+    各行の時刻は stats の fetched_at 列（API から取得した時刻）、無ければ taken_at（省略時は現在）
+    スナップショットごとに Parquet ファイルを 1 つ書き、history_dir 全体を 1 つの表として読む
+    """
+    history_dir = Path(history_dir)
+    history_dir.mkdir(parents=True, exist_ok=True)
+    taken_at = taken_at or datetime.now(timezone.utc)
+
+    df = stats[["video_id", "views", "likes", "comments"]].copy()
+    if "fetched_at" in stats:
+        snapshot_at = pd.to_datetime(stats["fetched_at"], utc=True).dt.floor("s")
+    else:
+        snapshot_at = pd.Timestamp(taken_at).tz_convert("UTC").floor("s")
+    df.insert(0, "snapshot_at", snapshot_at)
+    table = pa.Table.from_pandas(df, schema=HISTORY_SCHEMA, preserve_index=False)
+
+    # ファイル名は時刻順に並ぶようにし、同じ秒に書いても衝突しないようにする
+    name = f"{taken_at.astimezone(timezone.utc):%Y%m%dT%H%M%SZ}-{uuid.uuid4().hex[:8]}"
+    path = history_dir / f"{name}.parquet"
+    tmp = path.with_suffix(".parquet.tmp")
+    pq.write_table(table, tmp, compression="zstd")
+    tmp.replace(path)
+    return path
+
+
+def load_history(
+    history_dir: Path | str, video_ids: list[str] | None = None
+) -> pd.DataFrame:
+    """全スナップショットを snapshot_at, video_id の順に並べて読む"""
+    history_dir = Path(history_dir)
+    files = sorted(history_dir.glob("*.parquet")) if history_dir.exists() else []
+    if files:
+        filters = [("video_id", "in", list(video_ids))] if video_ids is not None else None
+        table = pq.read_table(files, schema=HISTORY_SCHEMA, filters=filters)
+    else:
+        table = HISTORY_SCHEMA.empty_table()
+    df = table.to_pandas()
+    df["video_id"] = df["video_id"].astype(str)
+    return df.sort_values(["snapshot_at", "video_id"], ignore_index=True)
+
+
+def view_velocity(history: pd.DataFrame) -> pd.DataFrame:
+    """
+    動画ごとに直近 2 回のスナップショットから 1 時間あたりの再生数の増加を求める
+    スナップショットが 1 回しかない動画は含めない
+    """
+    columns = ["video_id", "snapshot_at", "views", "views_delta", "views_per_hour"]
+    last_two = history.sort_values("snapshot_at").groupby("video_id").tail(2)
+    grouped = last_two.groupby("video_id")
+    latest = grouped.last()
+    previous = grouped.first()
+    hours = (latest["snapshot_at"] - previous["snapshot_at"]).dt.total_seconds() / 3600
+    mask = hours > 0
+    if not mask.any():
+        return pd.DataFrame(columns=columns)
+
+    result = latest.loc[mask, ["snapshot_at", "views"]].copy()
+    result["views_delta"] = latest.loc[mask, "views"] - previous.loc[mask, "views"]
+    result["views_per_hour"] = (result["views_delta"] / hours[mask]).round(1)
+    result = result.reset_index()
+    return result[columns].sort_values("views_per_hour", ascending=False, ignore_index=True)
@@ -0,0 +1,57 @@
+import sqlite3
+import time
+
+from api_cache import ResponseCache
+
+
+def test_size_bounded_eviction_keeps_recently_used_responses(tmp_path):
+    cache = ResponseCache(tmp_path / "api.sqlite3", max_bytes=10)
+    cache.put("a", '"e1"', "aaaa")
+    time.sleep(0.01)
+    cache.put("b", '"e2"', "bbbb")
+    time.sleep(0.01)
+    assert cache.get("a")["body"] == "aaaa"  # a を参照したので b の方が古い
+    time.sleep(0.01)
+    cache.put("c", '"e3"', "cccc")  # 合計 12 バイト → 最終参照が古い b を削除
+
+    assert cache.get("b") is None
+    assert cache.get("a")["body"] == "aaaa" and cache.get("c")["body"] == "cccc"
+    assert cache.stats["evicted"] == 1
+
+
+def test_unused_responses_are_pruned_on_open(tmp_path):
+    path = tmp_path / "api.sqlite3"
+    cache = ResponseCache(path)
+    cache.put("old", None, "x")
+    cache.put("new", None, "y")
+    cache.close()
+    conn = sqlite3.connect(path)
+    conn.execute("UPDATE responses SET last_access = ? WHERE key = 'old'", (time.time() - 100,))
+    conn.commit()
+    conn.close()
+
+    cache = ResponseCache(path, max_age_sec=50)
+
+    assert cache.get("old") is None
+    assert cache.get("new")["body"] == "y"
+    assert cache.stats["evicted"] == 1
+
+
+def test_cache_without_size_columns_is_upgraded(tmp_path):
+    path = tmp_path / "api.sqlite3"
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE responses (key TEXT PRIMARY KEY, etag TEXT,"
+        " body TEXT NOT NULL, fetched_at REAL NOT NULL)"
+    )
+    conn.execute("INSERT INTO responses VALUES ('a', NULL, 'ああ', ?)", (time.time(),))
+    conn.commit()
+    conn.close()
+
+    cache = ResponseCache(path, max_bytes=100, max_age_sec=3600)
+
+    assert cache.get("a")["body"] == "ああ"
+    cache.close()
+    conn = sqlite3.connect(path)
+    assert conn.execute("SELECT size FROM responses").fetchone() == (6,)
+    conn.close()
@@ -0,0 +1,45 @@
+import os
+
+from benchmarks import run_benchmarks
+from benchmarks.fake_youtube_api import FakeYouTubeAPI
+from benchmarks.synthetic_transcripts import make_lines, to_srt, to_vtt
+from fetch_transcripts import parse_subtitle_text
+
+
+def test_synthetic_subtitles_parse_to_the_same_text():
+    lines = make_lines("bv000000001", 30)
+
+    assert parse_subtitle_text(to_srt(lines)) == "".join(lines)
+    assert parse_subtitle_text(to_vtt(lines, rolling=True), dedupe=True) == "".join(lines)
+
+
+def test_fake_api_pages_uploads_newest_first():
+    api = FakeYouTubeAPI(num_videos=120, channels=2)
+
+    first = api.playlist_items({"playlistId": "UU" + api.channels[1][2:], "maxResults": "50"})
+    last = api.playlist_items(
+        {"playlistId": "UU" + api.channels[1][2:], "maxResults": "50", "pageToken": "50"}
+    )
+
+    ids = [i["snippet"]["resourceId"]["videoId"] for i in first["items"] + last["items"]]
+    assert ids == api.video_ids[1::2][::-1]
+    assert first["nextPageToken"] == "50" and "nextPageToken" not in last
+    assert api.playlist_items({"playlistId": "UUunknown"}) is None
+    api.stop()
+
+
+def test_benchmark_runs_every_stage_offline(tmp_path):
+    saved = dict(os.environ)
+    try:
+        rows = run_benchmarks.main(
+            ["--sizes", "60", "--channels", "2", "--cues", "5", "--workers", "1",
+             "--work-dir", str(tmp_path), "--json", str(tmp_path / "bench.json")]
+        )
+    finally:
+        os.environ.clear()
+        os.environ.update(saved)
+
+    assert [r["stage"] for r in rows] == run_benchmarks.STAGES
+    assert all(r["videos"] == 60 for r in rows)
+    assert rows[0]["requests"] == 1 + 2 + 2  # チャンネル照会 + 再生リスト 1 ページ × 2 + 詳細 50 本ずつ
+    assert (tmp_path / "bench.json").exists()
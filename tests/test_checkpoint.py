@@ -0,0 +1,25 @@
+from checkpoint import RunCheckpoint
+
+
+def test_stage_and_rows_roundtrip(tmp_path):
+    checkpoint = RunCheckpoint(tmp_path / "checkpoint")
+    checkpoint.save_stage("playlists", ["UU1", "UU2"])
+    checkpoint.append_rows("details", [{"video_id": "a"}, {"video_id": "b"}])
+
+    assert checkpoint.load_stage("playlists") == ["UU1", "UU2"]
+    assert checkpoint.done_ids("details") == {"a", "b"}
+
+    checkpoint.clear()
+    assert not checkpoint.exists()
+
+
+def test_truncated_last_line_is_skipped(tmp_path):
+    checkpoint = RunCheckpoint(tmp_path / "checkpoint")
+    checkpoint.append_rows("subtitles", [{"video_id": "a"}])
+    # 書き込み途中で強制終了した状態を再現
+    with (tmp_path / "checkpoint" / "subtitles.jsonl").open("a") as f:
+        f.write('{"video_id": "b", "subti')
+
+    checkpoint.append_rows("subtitles", [{"video_id": "c"}])
+
+    assert checkpoint.done_ids("subtitles") == {"a", "c"}
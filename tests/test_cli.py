@@ -0,0 +1,125 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+from fetch_transcripts import SUBTITLE_PARSER_VERSION
+from transcript_cache import TranscriptCache
+
+ROOT = Path(__file__).resolve().parents[1]
+HEAVY_MODULES = ["pandas", "numpy", "requests", "yt_dlp", "pyarrow"]
+
+
+def run_cli(args: list[str], env: dict) -> tuple[subprocess.CompletedProcess, list[str]]:
+    """cli.main を別プロセスで実行し、(結果, 読み込まれた重いモジュール) を返す"""
+    code = (
+        "import sys, cli\n"
+        f"code = cli.main({args!r})\n"
+        f"print('MODULES', ','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))\n"
+        "sys.exit(code)\n"
+    )
+    proc = subprocess.run(
+        [sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True
+    )
+    line = [x for x in proc.stdout.splitlines() if x.startswith("MODULES")][-1]
+    return proc, [m for m in line.split(" ", 1)[1].split(",") if m]
+
+
+def local_env(tmp_path: Path) -> dict:
+    env = dict(os.environ)
+    env.update(
+        {
+            "YOUTUBE_API_KEY": "",
+            "OUTPUT_DIR": str(tmp_path / "output"),
+            "STATE_DIR": str(tmp_path / "state"),
+            "TRANSCRIPT_CACHE": str(tmp_path / "transcripts.sqlite3"),
+            "TRANSCRIPT_INDEX": "",
+            "KEYWORD_DICTIONARY": "",
+            "OUTPUT_FORMAT": "csv",
+            "RUN_REPORT": "",
+        }
+    )
+    return env
+
+
+def test_help_imports_no_heavy_modules():
+    code = (
+        "import sys, cli\n"
+        "cli.build_parser().format_help()\n"
+        f"print([m for m in {HEAVY_MODULES!r} if m in sys.modules])\n"
+    )
+    proc = subprocess.run(
+        [sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True
+    )
+    assert proc.stdout.strip() == "[]", proc.stderr
+
+
+def test_analyze_uses_local_data_without_api_key(tmp_path):
+    output_dir = tmp_path / "output"
+    output_dir.mkdir()
+    pd.DataFrame(
+        {
+            "video_id": ["v1", "v2"],
+            "title": ["t1", "t2"],
+            "date": ["2024-01-01", "2024-01-02"],
+            "views": [1, 2],
+            "duration": [60, 60],
+            "likes": [0, 0],
+            "comments": [0, 0],
+            "URL": ["u1", "u2"],
+            "channel_id": ["UC1", "UC1"],
+            "channel_title": ["c", "c"],
+        }
+    ).to_csv(output_dir / "video_details.csv", index=False, encoding="utf-8-sig")
+    cache = TranscriptCache(tmp_path / "transcripts.sqlite3", version=SUBTITLE_PARSER_VERSION)
+    cache.put("v1", "ja", "manual", "病院で手術を受けた。病院の先生に診察してもらった")
+    cache.close()
+
+    proc, modules = run_cli(["analyze"], local_env(tmp_path))
+
+    assert proc.returncode == 0, proc.stdout + proc.stderr
+    assert "requests" not in modules and "yt_dlp" not in modules
+    result = pd.read_csv(output_dir / "video_analysis_result.csv", encoding="utf-8-sig")
+    rows = result.set_index("video_id")
+    assert rows.loc["v1", "primary_category"] == "medical"
+    assert rows.loc["v2", "subtitle_error"] == "not cached"
+    assert (output_dir / "keyword_hits.npz").exists()
+
+    proc, modules = run_cli(
+        ["export", str(tmp_path / "out.jsonl"), "--no-subtitles"], local_env(tmp_path)
+    )
+    assert proc.returncode == 0, proc.stdout + proc.stderr
+    exported = pd.read_json(tmp_path / "out.jsonl", lines=True)
+    assert sorted(exported["video_id"]) == ["v1", "v2"]
+    assert "subtitles" not in exported.columns
+
+
+def test_api_commands_report_a_missing_key(tmp_path):
+    proc, modules = run_cli(["crawl"], local_env(tmp_path))
+
+    assert proc.returncode == 1
+    assert "YOUTUBE_API_KEY is not set" in proc.stdout
+    assert "yt_dlp" not in modules
+
+
+def test_crawl_defers_when_the_quota_is_spent_before_the_playlists(tmp_path):
+    env = local_env(tmp_path)
+    env.update(
+        {
+            "YOUTUBE_API_KEY": "offline",
+            "YOUTUBE_API_BASE_URL": "http://127.0.0.1:9/youtube/v3",  # 送られれば失敗する
+            "VIDEO_IDS": "v1",
+            "API_CACHE": "",
+            "YOUTUBE_DAILY_QUOTA": "0",
+            "QUOTA_STATE": str(tmp_path / "quota.json"),
+        }
+    )
+
+    proc, _ = run_cli(["crawl"], env)
+
+    assert proc.returncode == 3, proc.stdout + proc.stderr  # main.EXIT_QUOTA_DEFERRED
+    assert "Quota exhausted" in proc.stdout
+    assert "Traceback" not in proc.stderr
+    assert not (tmp_path / "output" / "videos.csv").exists()
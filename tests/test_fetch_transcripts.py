@@ -0,0 +1,48 @@
+import time
+
+import fetch_transcripts
+from benchmarks.synthetic_transcripts import fake_ydl_factory
+
+
+def test_pool_keeps_the_order_and_reports_failures_as_rows(monkeypatch):
+    monkeypatch.setattr(fetch_transcripts, "SUBTITLE_RETRIES", 1)
+    monkeypatch.setattr(fetch_transcripts, "SUBTITLE_LANGS", ["ja"])
+    video_ids = [f"vid{i:03d}" for i in range(30)]
+    # 先頭の動画ほど遅く返し、終わる順を入力順と逆にする
+    slow = dict(zip(video_ids[:8], [0.08 - 0.01 * i for i in range(8)]))
+    errors = {
+        "vid002": "ERROR: [youtube] vid002: Private video",  # 取り直さない失敗
+        "vid017": "ERROR: HTTP Error 503: Service Unavailable",  # 一時的な失敗
+    }
+    started = []
+
+    def on_request(video_id):
+        started.append(video_id)
+        time.sleep(slow.get(video_id, 0))
+
+    df = fetch_transcripts.extract_subtitles_from_videos(
+        video_ids,
+        max_workers=8,
+        rate=1000,
+        ydl_factory=fake_ydl_factory(
+            cues=5, not_found_ratio=0, on_request=on_request, errors=errors
+        ),
+    )
+
+    assert df["video_id"].tolist() == video_ids
+    assert df.columns.tolist() == fetch_transcripts.SUBTITLE_COLUMNS
+
+    failed = df.set_index("video_id").loc[["vid002", "vid017"]]
+    assert failed["subtitle_status"].tolist() == ["error", "deferred"]
+    assert failed["subtitle_error"].tolist() == [
+        f"RuntimeError: {errors['vid002']}",
+        f"RuntimeError: {errors['vid017']}",
+    ]
+    assert (failed["subtitles"] == "").all()
+    assert started.count("vid002") == 1
+    assert started.count("vid017") == 2  # SUBTITLE_RETRIES 回取り直してから後回し
+
+    ok = df[~df["video_id"].isin(errors)]
+    assert (ok["subtitle_status"] == "ok").all()
+    assert (ok["subtitles"].str.len() > 0).all()
+    assert (ok["subtitle_error"] == "").all()
@@ -0,0 +1,73 @@
+import json
+
+import pandas as pd
+import pytest
+
+from keyword_dictionary import (
+    dictionary_hash,
+    export_dictionary,
+    load_dictionary,
+)
+from keywords import KEYWORD_CATEGORIES, KeywordMatcher, analyze_all_categories
+
+
+def test_json_and_tsv_dictionaries_are_equivalent(tmp_path):
+    (tmp_path / "d.json").write_text(
+        json.dumps({"food": ["ラーメン", "寿司"], "sports": ["野球"]}, ensure_ascii=False),
+        encoding="utf-8",
+    )
+    (tmp_path / "d.tsv").write_text(
+        "# 番組 A\nfood\t寿司\nfood\tラーメン\n\nsports\t野球\n", encoding="utf-8"
+    )
+
+    from_json = load_dictionary(tmp_path / "d.json")
+    from_tsv = load_dictionary(tmp_path / "d.tsv")
+
+    assert from_json == from_tsv == {"food": {"ラーメン", "寿司"}, "sports": {"野球"}}
+    assert dictionary_hash(from_json) == dictionary_hash(from_tsv)
+    assert dictionary_hash(from_json) != dictionary_hash(dict(reversed(from_json.items())))
+
+
+def test_invalid_category_names(tmp_path):
+    for name in ["none", "has space", "医療"]:
+        path = tmp_path / "d.json"
+        path.write_text(json.dumps({name: ["a"]}), encoding="utf-8")
+        with pytest.raises(ValueError):
+            load_dictionary(path)
+
+
+def test_dictionary_categories_drive_the_analysis():
+    categories = {"food": {"ラーメン", "寿司"}, "sports": {"野球"}, "music": {"ライブ"}}
+    matcher = KeywordMatcher(categories)
+
+    assert matcher.count_categories("寿司と野球と寿司".encode("utf-8")) == [2, 1, 0]
+
+    df = pd.DataFrame(
+        {"video_id": ["a"], "subtitles": ["ライブの後にラーメン"], "duration": [60]}
+    )
+    analyze_all_categories(df, threshold=0.5, matcher=matcher)
+    assert df[["is_food", "is_sports", "is_music"]].values.tolist() == [[True, False, True]]
+    assert df["primary_category"].tolist() == ["food"]  # 同率は先頭のカテゴリ
+
+
+def test_categories_without_a_keyword_list_are_rejected(tmp_path):
+    for keywords in [None, 3, "ラーメン", {"a": "b"}]:
+        path = tmp_path / "d.json"
+        path.write_text(json.dumps({"food": keywords}), encoding="utf-8")
+        with pytest.raises(ValueError, match="must be a list of strings"):
+            load_dictionary(path)
+
+    pytest.importorskip("yaml")
+    for content in ["food:\n", "food: 3\n"]:  # YAML ではリストを書き忘れると None
+        path = tmp_path / "d.yaml"
+        path.write_text(content, encoding="utf-8")
+        with pytest.raises(ValueError, match="must be a list of strings"):
+            load_dictionary(path)
+
+
+def test_export_round_trip(tmp_path):
+    export_dictionary(KEYWORD_CATEGORIES, tmp_path / "builtin.tsv")
+    export_dictionary(KEYWORD_CATEGORIES, tmp_path / "builtin.json")
+
+    assert load_dictionary(tmp_path / "builtin.tsv") == KEYWORD_CATEGORIES
+    assert load_dictionary(tmp_path / "builtin.json") == KEYWORD_CATEGORIES
@@ -0,0 +1,202 @@
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from keywords import (
+    KEYWORD_CATEGORIES,
+    KeywordHitMatrix,
+    KeywordMatcher,
+    analyze_all_categories,
+    analyze_by_keywords,
+    count_keywords_in_category,
+    get_matcher,
+    keyword_hit_rows,
+    keyword_set_hash,
+    primary_categories,
+    score_categories,
+)
+
+
+def test_matcher_counts_same_as_str_count():
+    matcher = get_matcher()
+    rng = random.Random(0)
+    fillers = "あいうえおかきくけこ今日は人生病院感染症ガン"
+
+    for _ in range(500):
+        parts = [
+            rng.choice(matcher.keywords) if rng.random() < 0.3 else rng.choice(fillers)
+            for _ in range(rng.randint(0, 40))
+        ]
+        text = "".join(parts)
+        category_counts, _ = matcher.count(text)
+        for category in KEYWORD_CATEGORIES:
+            assert category_counts[category] == count_keywords_in_category(
+                text, category
+            )
+
+
+def test_matcher_overlap_semantics():
+    matcher = KeywordMatcher({"a": {"ガン", "感染", "感染症"}, "b": {"症状"}})
+    category_counts, keyword_counts = matcher.count("ガンガン感染症状")
+
+    assert keyword_counts == {"ガン": 2, "感染": 1, "感染症": 1, "症状": 1}
+    assert category_counts == {"a": 4, "b": 1}  # 異なるキーワードの重なりは両方数える
+    assert matcher.count("ガガガ")[0] == {"a": 0, "b": 0}
+
+
+def test_matcher_keyword_in_multiple_categories():
+    matcher = KeywordMatcher({"a": {"事故"}, "b": {"事故", "交通事故"}})
+    category_counts, _ = matcher.count("交通事故と事故")
+
+    assert category_counts == {"a": 2, "b": 3}
+
+
+def test_analyze_all_categories_matches_per_category():
+    df = pd.DataFrame(
+        {
+            "video_id": ["a", "b", "c"],
+            "subtitles": ["病院で手術を受けた", "警察が逮捕した。犬が発見", ""],
+            "duration": [60, 120, 30],
+        }
+    )
+    expected = df.copy()
+    for category in KEYWORD_CATEGORIES:
+        analyze_by_keywords(expected, category=category, threshold=0.5)
+
+    analyze_all_categories(df, threshold=0.5)
+
+    pd.testing.assert_frame_equal(df[expected.columns], expected)
+
+
+def test_primary_categories_argmax_with_none():
+    rates = np.array([[0.0, 0.0], [1.0, 2.0], [3.0, 3.0], [0.5, 0.0]])
+
+    result = primary_categories(rates, ["a", "b"])
+
+    assert result.tolist() == ["none", "b", "a", "a"]  # 同率は先頭のカテゴリ
+
+
+def test_score_categories_zero_or_missing_duration():
+    counts = np.array([[3, 0], [3, 0], [3, 0], [3, 0]])
+    duration = np.array([120, 0, np.nan, -5])
+
+    scores = score_categories(counts, duration, ["a", "b"], threshold=0.5)
+
+    assert scores["a_per_min"].tolist() == [1.5, 0.0, 0.0, 0.0]  # inf/NaN にならない
+    assert scores["is_a"].tolist() == [True, False, False, False]
+    assert scores["primary_category"].tolist() == ["a", "none", "none", "none"]
+
+
+def test_parallel_count_matrix_matches_serial(monkeypatch, tmp_path):
+    import keywords
+    from transcript_corpus import CorpusWriter, TranscriptCorpus
+
+    monkeypatch.setattr(keywords, "PARALLEL_MIN_TEXTS", 1)
+    matcher = get_matcher()
+    rng = random.Random(1)
+    texts = [
+        "".join(rng.choice(matcher.keywords + ["あいう"]) for _ in range(rng.randint(0, 20)))
+        for _ in range(50)
+    ] + [None]
+    expected = keywords.count_matrix(texts, matcher)
+
+    assert (keywords.count_matrix_parallel(texts, matcher, workers=2) == expected).all()
+    rows = keywords.count_matrix_parallel(texts, matcher, workers=2, per_keyword=True)
+    serial = keyword_hit_rows(texts, matcher)
+    assert all((a == b).all() for a, b in zip(rows, serial))
+
+    video_ids = [f"v{i}" for i in range(len(texts))]
+    with CorpusWriter(tmp_path) as writer:
+        for video_id, text in zip(video_ids[:-1], texts[:-1]):
+            writer.add(video_id, text)
+    with TranscriptCorpus(tmp_path) as corpus:
+        counts = keywords.count_matrix_parallel(
+            matcher=matcher, workers=2, corpus=corpus, video_ids=video_ids
+        )
+    assert (counts == expected).all()
+
+
+def test_hit_matrix_rescore_matches_analysis(tmp_path):
+    df = pd.DataFrame(
+        {
+            "video_id": ["a", "b", "c"],
+            "subtitles": ["病院で手術を受けた", "警察が逮捕した。犬が発見", None],
+            "duration": [60, 120, 30],
+        }
+    )
+    hits = analyze_all_categories(df, threshold=0.5)
+    hits.save(tmp_path / "hits.npz")
+    loaded = KeywordHitMatrix.load(tmp_path / "hits.npz")
+
+    scores = loaded.scores(threshold=0.5)
+
+    pd.testing.assert_frame_equal(scores, df[scores.columns].reset_index(drop=True))
+    assert loaded.category_counts().tolist() == hits.category_counts().tolist()
+
+
+def test_hit_matrix_recategorize_and_weights():
+    matcher = KeywordMatcher({"a": {"ガン", "感染"}, "b": {"症状"}})
+    rows = keyword_hit_rows(["ガンガン感染", "症状"], matcher)
+    hits = KeywordHitMatrix(
+        ["x", "y"], matcher.keywords, *rows, [60, 60], matcher.category_keywords
+    )
+
+    assert hits.category_counts().tolist() == [[3, 0], [0, 1]]
+    moved = {"a": ["ガン"], "b": ["症状", "感染"]}
+    assert hits.category_counts(moved).tolist() == [[2, 1], [0, 1]]
+    assert hits.category_counts(weights={"ガン": 0.5}).tolist() == [[2.0, 0.0], [0.0, 1.0]]
+    assert hits.scores(threshold=2.5)["primary_category"].tolist() == ["a", "b"]
+    assert hits.scores(threshold=2.5)["is_a"].tolist() == [True, False]
+    with pytest.raises(ValueError):
+        hits.category_counts({"a": ["未知語"]})  # 行列に無いキーワードは数え直せない
+
+
+def test_hit_matrix_merge_replaces_same_video():
+    old_matcher = KeywordMatcher({"a": {"ガン"}})
+    new_matcher = KeywordMatcher({"a": {"ガン"}, "b": {"逮捕"}})
+    old = KeywordHitMatrix(
+        ["x", "y"],
+        old_matcher.keywords,
+        *keyword_hit_rows(["ガン", "ガンガン"], old_matcher),
+        [60, 60],
+        old_matcher.category_keywords,
+    )
+    new = KeywordHitMatrix(
+        ["y", "z"],
+        new_matcher.keywords,
+        *keyword_hit_rows(["逮捕", "ガン逮捕"], new_matcher),
+        [120, 60],
+        new_matcher.category_keywords,
+    )
+
+    merged = old.merge(new)
+
+    assert merged.video_ids.tolist() == ["x", "y", "z"]
+    assert merged.duration_sec.tolist() == [60, 120, 60]
+    assert merged.category_counts({"a": ["ガン"]}).tolist() == [[1], [0], [1]]
+    # x は「逮捕」を数えていないので 0 として再集計しない
+    with pytest.raises(ValueError, match="1 videos"):
+        merged.category_counts()
+    assert merged.row_sets.tolist()[1:] == [keyword_set_hash(new_matcher.keywords)] * 2
+
+
+def test_hit_matrix_concat_keeps_the_last_row_and_survives_saving(tmp_path):
+    matcher = KeywordMatcher({"a": {"ガン"}, "b": {"逮捕"}})
+
+    def hits(video_ids, texts):
+        rows = keyword_hit_rows(texts, matcher)
+        return KeywordHitMatrix(
+            video_ids, matcher.keywords, *rows, [60] * len(texts), matcher.category_keywords
+        )
+
+    merged = KeywordHitMatrix.concat(
+        [hits(["x", "y"], ["ガン", "逮捕"]), hits(["y"], ["ガンガン"]), hits(["z"], [""])]
+    )
+    merged.save(tmp_path / "hits.npz")
+    loaded = KeywordHitMatrix.load(tmp_path / "hits.npz")
+
+    assert loaded.video_ids.tolist() == ["x", "y", "z"]
+    assert loaded.category_counts().tolist() == [[1, 0], [2, 0], [0, 0]]
+    assert loaded.keyword_sets == {keyword_set_hash(matcher.keywords): matcher.keywords}
@@ -0,0 +1,89 @@
+import json
+import threading
+import time
+
+import pytest
+
+from metrics import Histogram, Metrics
+
+
+def test_histogram_buckets_are_cumulative():
+    h = Histogram(buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.7, 3.0):
+        h.observe(value)
+
+    assert h.cumulative() == [("0.1", 1), ("1.0", 3), ("+Inf", 4)]
+    assert h.quantile(0.5) == 1.0
+    assert h.quantile(1.0) == 3.0  # +Inf のバケットは最大値
+    assert Histogram().quantile(0.5) is None
+
+
+def test_stages_accumulate_and_export(tmp_path):
+    m = Metrics()
+    for rows in (3, 4):
+        with m.stage("details") as stage:
+            stage.add_rows(rows)
+    m.inc("api_requests", operation="videos", status=200)
+    m.inc("api_requests", operation="videos", status=200)
+    m.observe("api_request_seconds", 0.02, operation="videos")
+
+    report = json.loads(m.write_json(tmp_path / "report.json").read_text(encoding="utf-8"))
+    assert report["stages"]["details"]["calls"] == 2
+    assert report["stages"]["details"]["rows"] == 7
+    assert report["counters"] == [
+        {"name": "api_requests", "labels": {"operation": "videos", "status": 200}, "value": 2}
+    ]
+
+    text = m.write_prometheus(tmp_path / "ytca.prom").read_text(encoding="utf-8")
+    assert 'ytca_stage_rows{stage="details"} 7' in text
+    assert "# TYPE ytca_api_requests_total counter" in text
+    assert 'ytca_api_requests_total{operation="videos",status="200"} 2' in text
+    assert 'ytca_api_request_seconds_bucket{operation="videos",le="0.025"} 1' in text
+    assert 'ytca_api_request_seconds_bucket{operation="videos",le="+Inf"} 1' in text
+    assert 'ytca_api_request_seconds_count{operation="videos"} 1' in text
+
+
+def test_large_counters_are_written_without_rounding():
+    m = Metrics()
+    m.inc("api_response_bytes", 1234567891)
+    m.inc("transcript_bytes", 0.1)
+    m.inc("transcript_bytes", 0.2)
+
+    text = m.to_prometheus()
+    assert "ytca_api_response_bytes_total 1234567891\n" in text
+    assert f"ytca_transcript_bytes_total {0.1 + 0.2!r}\n" in text
+
+
+def test_profiling_writes_one_file_per_stage(tmp_path):
+    m = Metrics()
+    m.enable_profiling("cprofile", tmp_path)
+    with m.stage("analysis"):
+        with m.stage("inner"):  # 入れ子の段階はプロファイルしない
+            sum(range(1000))
+
+    assert [p.name for p in m.write_profiles()] == ["analysis.prof"]
+    assert (tmp_path / "analysis.txt").exists()
+    assert set(m.stages) == {"analysis", "inner"}
+
+
+def test_sampling_profile_sees_worker_threads(tmp_path):
+    def busy():
+        end = time.perf_counter() + 0.2
+        while time.perf_counter() < end:
+            pass
+
+    m = Metrics()
+    m.enable_profiling("sample", tmp_path)
+    with m.stage("subtitles"):
+        worker = threading.Thread(target=busy)
+        worker.start()
+        worker.join()
+
+    [path] = m.write_profiles()
+    assert path.name == "subtitles.folded"
+    assert "test_metrics.py:busy" in path.read_text(encoding="utf-8")
+
+
+def test_unknown_profile_mode_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        Metrics().enable_profiling("perf", tmp_path)
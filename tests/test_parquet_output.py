@@ -0,0 +1,105 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from parquet_output import ResultWriter, read_metrics, read_transcripts, write_results
+
+
+def results(video_ids, channel_ids):
+    n = len(video_ids)
+    return pd.DataFrame(
+        {
+            "video_id": video_ids,
+            "title": ["t"] * n,
+            "primary_category": ["medical"] * n,
+            "date": [date(2024, 1, 1)] * n,
+            "views": [10.0] * n,  # outer merge 後は float になっている
+            "duration": [60] * n,
+            "channel_id": channel_ids,
+            "subtitles": ["病院で手術"] * n,
+            "subtitle_lang": ["ja"] * n,
+            "subtitle_kind": ["auto"] * n,
+            "subtitle_status": ["ok"] * n,
+            "medical_word_count": [2] * n,
+            "medical_per_min": [2.0] * n,
+            "is_medical": [True] * n,
+        }
+    )
+
+
+def test_metrics_and_transcripts_are_split_and_partitioned(tmp_path):
+    write_results(results(["a", "b"], ["UC1", "UC2"]), tmp_path, replace=True)
+
+    metrics = read_metrics(tmp_path)
+    assert "subtitles" not in metrics.columns
+    assert str(metrics["views"].dtype) == "Int64"
+    assert str(metrics["primary_category"].dtype) == "category"
+    assert sorted(metrics["video_id"]) == ["a", "b"]
+    assert (tmp_path / "metrics" / "channel_id=UC1").is_dir()
+
+    transcripts = read_transcripts(tmp_path, ["b"])
+    assert transcripts["subtitles"].tolist() == ["病院で手術"]
+    assert transcripts["channel_id"].tolist() == ["UC2"]
+
+
+def test_append_and_replace(tmp_path):
+    write_results(results(["a"], ["UC1"]), tmp_path)
+    # 詳細が取れなかった行（欠損だらけ）を追記してもスキーマが崩れない
+    missing = results(["b"], [np.nan]).assign(date=np.nan, views=np.nan)
+    write_results(missing, tmp_path)
+
+    assert sorted(read_metrics(tmp_path)["video_id"]) == ["a", "b"]
+
+    write_results(results(["c"], ["UC1"]), tmp_path, replace=True)
+
+    assert read_metrics(tmp_path)["video_id"].tolist() == ["c"]
+
+
+def test_saved_videos_are_replaced_by_newer_results(tmp_path):
+    write_results(results(["a", "b"], ["UC1", "UC2"]), tmp_path)
+    newer = results(["a", "c"], ["UC1", "UC1"]).assign(views=99.0, subtitles="警察")
+    write_results(newer, tmp_path)
+
+    metrics = read_metrics(tmp_path).sort_values("video_id", ignore_index=True)
+    assert metrics["video_id"].tolist() == ["a", "b", "c"]
+    assert metrics["views"].tolist() == [99, 10, 99]
+    transcripts = read_transcripts(tmp_path, ["a"])
+    assert transcripts["subtitles"].tolist() == ["警察"]
+
+    # 全ての行が置き換えられたファイルは消える
+    write_results(results(["b"], ["UC2"]), tmp_path)
+    assert len(list((tmp_path / "metrics" / "channel_id=UC2").glob("*.parquet"))) == 1
+
+
+def test_writer_dedupes_once_and_compacts_the_batches(tmp_path):
+    write_results(results(["a", "b"], ["UC1", "UC1"]), tmp_path)
+    writer = ResultWriter(tmp_path)
+    for video_ids in (["a", "c"], ["d"], ["e"]):
+        writer.write(results(video_ids, ["UC1"] * len(video_ids)).assign(views=99.0))
+    assert read_metrics(tmp_path)["video_id"].tolist() == ["a", "b"]  # close() までは反映しない
+    writer.close()
+
+    metrics = read_metrics(tmp_path).sort_values("video_id", ignore_index=True)
+    assert metrics["video_id"].tolist() == ["a", "b", "c", "d", "e"]
+    assert metrics["views"].tolist() == [99, 10, 99, 99, 99]
+    # 3 つのバッチは 1 つのファイルにまとめられる（前回のファイルと合わせて 2 つ）
+    assert len(list((tmp_path / "metrics" / "channel_id=UC1").glob("*.parquet"))) == 2
+    assert len(read_transcripts(tmp_path)) == 5
+    assert not (tmp_path / "parquet.staging").exists()
+
+
+def test_resumed_writer_keeps_the_batches_and_the_replace_flag(tmp_path):
+    write_results(results(["old"], ["UC1"]), tmp_path)
+    crashed = ResultWriter(tmp_path, replace=True)
+    crashed.write(results(["a"], ["UC1"]))
+
+    resumed = ResultWriter(tmp_path, resume=True)
+    resumed.write(results(["b"], ["UC2"]))
+    resumed.close()
+
+    assert sorted(read_metrics(tmp_path)["video_id"]) == ["a", "b"]
+
+    ResultWriter(tmp_path).write(results(["c"], ["UC1"]))  # 再開しない実行は前回のバッチを捨てる
+    ResultWriter(tmp_path).close()
+    assert sorted(read_metrics(tmp_path)["video_id"]) == ["a", "b"]
@@ -0,0 +1,202 @@
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from benchmarks.fake_youtube_api import FakeYouTubeAPI
+
+ROOT = Path(__file__).resolve().parents[1]
+NUM_VIDEOS = 60
+STREAM_BATCH_SIZE = 7
+
+# 偽の yt-dlp（合成字幕）で main.py / cli.py を実行し、分析したバッチの行数を最後に出力する
+# FAKE_YDL_LATENCY を設定すると偽の yt-dlp の各リクエストがその秒数だけかかる
+BOOTSTRAP = """
+import atexit, json, os, runpy, sys
+import fetch_transcripts, keywords
+from benchmarks.synthetic_transcripts import fake_ydl_factory
+
+fetch_transcripts._new_youtube_dl = fake_ydl_factory(
+    cues=10, latency=float(os.environ.get("FAKE_YDL_LATENCY", "0"))
+)
+batch_rows = []
+analyze_all_categories = keywords.analyze_all_categories
+
+def counting(df, *args, **kwargs):
+    batch_rows.append(len(df))
+    return analyze_all_categories(df, *args, **kwargs)
+
+keywords.analyze_all_categories = counting
+atexit.register(lambda: print("BATCH_ROWS", json.dumps(batch_rows)))
+script, *args = sys.argv[1:]
+if script == "cli.py":
+    import cli
+    sys.exit(cli.main(args))
+sys.argv = [script, *args]
+runpy.run_path(script, run_name="__main__")
+"""
+
+
+@pytest.fixture(scope="module")
+def api():
+    with FakeYouTubeAPI(num_videos=NUM_VIDEOS, channels=2, cues=10) as api:
+        yield api
+
+
+def offline_env(api: FakeYouTubeAPI, work_dir: Path) -> dict:
+    env = dict(os.environ)
+    env.update(
+        {
+            "YOUTUBE_API_KEY": "offline",
+            "YOUTUBE_API_BASE_URL": api.base_url,
+            "VIDEO_IDS": ",".join(api.seed_video_ids()),
+            "OUTPUT_DIR": str(work_dir / "output"),
+            "STATE_DIR": str(work_dir / "state"),
+            "TRANSCRIPT_CACHE": str(work_dir / "transcripts.sqlite3"),
+            "TRANSCRIPT_INDEX": "",
+            "API_CACHE": "",
+            "QUOTA_STATE": "",
+            "KEYWORD_DICTIONARY": "",
+            "OUTPUT_FORMAT": "csv",
+            "RUN_REPORT": "",
+            "ANALYSIS_WORKERS": "1",
+            "STREAM_BATCH_SIZE": str(STREAM_BATCH_SIZE),
+            "SUBTITLE_RATE": "1000",
+            "SUBTITLE_MAX_RATE": "1000",
+            "NO_PROXY": "127.0.0.1",
+            "no_proxy": "127.0.0.1",
+        }
+    )
+    return env
+
+
+def start(script: str, args: list[str], env: dict) -> subprocess.Popen:
+    """script（main.py / cli.py）を偽の yt-dlp で実行する"""
+    return subprocess.Popen(
+        [sys.executable, "-c", BOOTSTRAP, script, *args],
+        cwd=ROOT,
+        env=env,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+
+
+def finish(proc: subprocess.Popen) -> list[int]:
+    """start() したプロセスの終了を待ち、分析したバッチごとの行数を返す"""
+    stdout, stderr = proc.communicate()
+    assert proc.returncode == 0, stdout + stderr
+    line = [x for x in stdout.splitlines() if x.startswith("BATCH_ROWS")][-1]
+    return json.loads(line.split(" ", 1)[1])
+
+
+def run(script: str, args: list[str], env: dict) -> list[int]:
+    return finish(start(script, args, env))
+
+
+def read_result(work_dir: Path) -> pd.DataFrame:
+    df = pd.read_csv(
+        work_dir / "output" / "video_analysis_result.csv",
+        dtype={"video_id": str},
+        encoding="utf-8-sig",
+    )
+    return df.sort_values("video_id", ignore_index=True)
+
+
+def read_hits(work_dir: Path) -> pd.DataFrame:
+    from keywords import KeywordHitMatrix
+
+    hits = KeywordHitMatrix.load(work_dir / "output" / "keyword_hits.npz")
+    df = pd.DataFrame(hits.to_dense(), index=hits.video_ids, columns=hits.keywords)
+    return df.sort_index()
+
+
+def test_stream_matches_batch_run_one_batch_at_a_time(api, tmp_path):
+    batch_rows = run("main.py", [], offline_env(api, tmp_path / "batch"))
+    stream_rows = run("main.py", ["--stream"], offline_env(api, tmp_path / "stream"))
+
+    assert batch_rows == [NUM_VIDEOS]
+    # メモリに載るのは 1 バッチ分だけ
+    assert max(stream_rows) <= STREAM_BATCH_SIZE and sum(stream_rows) == NUM_VIDEOS
+    batch, stream = read_result(tmp_path / "batch"), read_result(tmp_path / "stream")
+    pd.testing.assert_frame_equal(stream[batch.columns], batch)
+    pd.testing.assert_frame_equal(read_hits(tmp_path / "stream"), read_hits(tmp_path / "batch"))
+
+
+def test_queue_workers_match_main_and_share_the_quota(api, tmp_path):
+    run("main.py", [], offline_env(api, tmp_path / "batch"))
+    env = offline_env(api, tmp_path / "queue")
+    env.update({"QUEUE_SHARD_SIZE": "10", "QUOTA_STATE": str(tmp_path / "quota.json")})
+    requests_before = api.requests
+
+    run("cli.py", ["queue", "enqueue"], env)
+    workers = [start("cli.py", ["queue", "work", "--worker-id", w], env) for w in ("w1", "w2")]
+    for worker in workers:
+        assert finish(worker) == []  # ワーカーは分析しない
+    assert run("cli.py", ["queue", "merge"], env) == [NUM_VIDEOS]
+
+    pd.testing.assert_frame_equal(read_result(tmp_path / "queue"), read_result(tmp_path / "batch"))
+    # 2 つのワーカーと enqueue が送ったリクエストはすべてキューの台帳に計上される
+    ledger = sqlite3.connect(tmp_path / "queue" / "state" / "queue" / "queue.sqlite3")
+    [(used,)] = ledger.execute("SELECT used FROM quota_usage").fetchall()
+    ledger.close()
+    assert used == api.requests - requests_before
+    saved = json.loads((tmp_path / "quota.json").read_text(encoding="utf-8"))
+    assert saved["used"] == used
+
+
+def test_stream_to_parquet_matches_batch_run(api, tmp_path):
+    from parquet_output import read_metrics
+
+    for name, args in (("batch", []), ("stream", ["--stream"])):
+        env = offline_env(api, tmp_path / name)
+        env["OUTPUT_FORMAT"] = "parquet"
+        run("main.py", args, env)
+
+    batch, stream = (
+        read_metrics(tmp_path / name / "output").sort_values("video_id", ignore_index=True)
+        for name in ("batch", "stream")
+    )
+    # カテゴリ型の値の並びはバッチごとの辞書の順になるので、値だけを比べる
+    pd.testing.assert_frame_equal(stream[batch.columns], batch, check_categorical=False)
+    assert not (tmp_path / "stream" / "output" / "parquet.staging").exists()
+
+
+def test_resume_after_a_killed_run_skips_finished_stages(api, tmp_path):
+    run("main.py", [], offline_env(api, tmp_path / "batch"))
+    env = offline_env(api, tmp_path / "resumed")
+    env.update({"FAKE_YDL_LATENCY": "0.02", "SUBTITLE_WORKERS": "2", "SUBTITLE_MAX_WORKERS": "2"})
+    subtitles = tmp_path / "resumed" / "state" / "checkpoint" / "subtitles.jsonl"
+
+    # 字幕の取得中（動画詳細までは終わっている）にプロセスを強制終了する
+    proc = start("main.py", [], env)
+    deadline = time.monotonic() + 60
+    while not (subtitles.exists() and len(subtitles.read_text().splitlines()) >= 10):
+        assert proc.poll() is None, proc.communicate()
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    proc.kill()
+    proc.communicate()
+    done = len(subtitles.read_text().splitlines())
+    assert done < NUM_VIDEOS
+    assert not (tmp_path / "resumed" / "output" / "video_analysis_result.csv").exists()
+
+    requests_before = api.requests
+    proc = start("main.py", ["--resume"], env)
+    stdout, stderr = proc.communicate()
+    assert proc.returncode == 0, stdout + stderr
+
+    # プレイリスト・動画ID・動画詳細はチェックポイントから読み、API には送らない
+    assert api.requests == requests_before
+    assert f"{NUM_VIDEOS} video details loaded from checkpoint." in stdout
+    loaded = int(stdout.split(" subtitles loaded from checkpoint.")[0].rsplit(" ", 1)[-1])
+    assert loaded >= done
+    pd.testing.assert_frame_equal(read_result(tmp_path / "resumed"), read_result(tmp_path / "batch"))
+    pd.testing.assert_frame_equal(read_hits(tmp_path / "resumed"), read_hits(tmp_path / "batch"))
+    assert not (tmp_path / "resumed" / "state" / "checkpoint").exists()
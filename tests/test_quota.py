@@ -0,0 +1,141 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from quota import (
+    PRIORITY_BACKFILL,
+    PRIORITY_NEW_UPLOADS,
+    PRIORITY_STATISTICS,
+    QuotaBudget,
+    QuotaExceededError,
+    QuotaScheduler,
+)
+
+
+def test_charge_and_report(tmp_path):
+    budget = QuotaBudget(10, tmp_path / "quota.json")
+    budget.charge("get_video_details", 3)
+    budget.charge("get_all_video_ids")
+
+    assert budget.used == 4 and budget.remaining == 6
+    assert "get_video_details: 3" in budget.report()
+
+
+def test_usage_is_carried_over_within_the_day(tmp_path):
+    budget = QuotaBudget(10, tmp_path / "quota.json")
+    budget.charge("get_video_details", 7)
+    budget.save()
+
+    budget = QuotaBudget(10, tmp_path / "quota.json")
+
+    assert budget.used == 7 and budget.run_usage == {}
+    with pytest.raises(QuotaExceededError):
+        budget.ensure(4)
+
+
+def test_scheduler_runs_by_priority_and_defers_what_does_not_fit():
+    budget = QuotaBudget(5)
+    order = []
+
+    def job(name, units):
+        order.append(name)
+        budget.charge(name, units)
+        return name
+
+    scheduler = QuotaScheduler(budget)
+    scheduler.submit(PRIORITY_BACKFILL, 3, "backfill", job, "backfill", 3)
+    scheduler.submit(PRIORITY_STATISTICS, 2, "stats", job, "stats", 2)
+    scheduler.submit(PRIORITY_NEW_UPLOADS, 2, "new", job, "new", 2)
+
+    results, deferred = scheduler.run()
+
+    assert order == ["new", "stats"]
+    assert set(results) == {"new", "stats"}
+    assert deferred == ["backfill"]
+
+
+def test_scheduler_defers_jobs_that_run_out_mid_way():
+    budget = QuotaBudget(1)
+
+    def job():
+        budget.ensure()
+        budget.charge("job")
+        budget.ensure()  # 見積もり（1 ユニット）を超えて 2 回目のリクエスト
+
+    scheduler = QuotaScheduler(budget)
+    scheduler.submit(PRIORITY_NEW_UPLOADS, 1, "job", job)
+
+    assert scheduler.run() == ({}, ["job"])
+
+
+def test_reserve_never_overspends_across_threads():
+    budget = QuotaBudget(100)
+    refused = []
+
+    def request(_):
+        try:
+            budget.reserve("get_video_details")
+        except QuotaExceededError:
+            refused.append(1)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(request, range(150)))
+
+    assert budget.used == 100 and len(refused) == 50
+    with pytest.raises(QuotaExceededError):
+        budget.reserve("get_video_details")
+    assert budget.run_usage == {"get_video_details": 100}  # 断ったリクエストは計上しない
+
+
+def test_saving_merges_usage_saved_by_other_runs(tmp_path):
+    first = QuotaBudget(100, tmp_path / "quota.json")
+    second = QuotaBudget(100, tmp_path / "quota.json")
+    first.charge("a", 3)
+    second.charge("b", 4)
+    first.save()
+    second.save()
+    second.charge("b", 1)
+    second.save()
+
+    assert QuotaBudget(100, tmp_path / "quota.json").used == 8
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_concurrent_saves_keep_every_run_usage(tmp_path):
+    path = tmp_path / "quota.json"
+    budgets = [QuotaBudget(10**6, path) for _ in range(8)]
+
+    def run(budget):
+        for _ in range(20):
+            budget.charge("get_video_details")
+            budget.save()
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(run, budgets))
+
+    assert QuotaBudget(10**6, path).used == 160
+
+
+def test_ledger_is_shared_by_budgets_in_other_processes(tmp_path):
+    saved = QuotaBudget(100, tmp_path / "quota.json")
+    saved.charge("a", 10)
+    saved.save()
+    ledger = tmp_path / "queue.sqlite3"
+    workers = [QuotaBudget(30, tmp_path / "quota.json", ledger=ledger) for _ in range(2)]
+    refused = []
+
+    def request(i):
+        try:
+            workers[i % 2].reserve("get_video_details")
+        except QuotaExceededError:
+            refused.append(i)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(request, range(40)))
+
+    # 台帳は JSON に保存済みの 10 ユニットから始まり、2 つの予算の合計で上限に達する
+    assert workers[0].used == workers[1].used == 30 and len(refused) == 20
+    assert sum(sum(w.run_usage.values()) for w in workers) == 20
+    for worker in workers:
+        worker.save()
+    assert QuotaBudget(100, tmp_path / "quota.json").used == 30
@@ -0,0 +1,48 @@
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+
+from stats_history import append_snapshot, load_history, view_velocity
+
+
+def stats(views):
+    return pd.DataFrame(
+        {
+            "video_id": ["a", "b"],
+            "views": views,
+            "likes": [1, 2],
+            "comments": [0, 1],
+        }
+    )
+
+
+def test_snapshots_are_appended_and_read_as_one_table(tmp_path):
+    t0 = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    append_snapshot(stats([100, 10]), tmp_path, taken_at=t0)
+    append_snapshot(stats([160, 10]), tmp_path, taken_at=t0 + timedelta(hours=2))
+
+    history = load_history(tmp_path)
+
+    assert len(history) == 4
+    assert history["views"].dtype == "int64"
+    assert history["snapshot_at"].iloc[-1] == pd.Timestamp("2026-01-01 02:00", tz="UTC")
+    assert load_history(tmp_path, ["b"])["video_id"].tolist() == ["b", "b"]
+
+
+def test_view_velocity_uses_last_two_snapshots(tmp_path):
+    t0 = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    append_snapshot(stats([0, 0]), tmp_path, taken_at=t0)
+    append_snapshot(stats([100, 10]), tmp_path, taken_at=t0 + timedelta(hours=1))
+    append_snapshot(stats([160, 10]), tmp_path, taken_at=t0 + timedelta(hours=3))
+
+    velocity = view_velocity(load_history(tmp_path))
+
+    assert velocity["video_id"].tolist() == ["a", "b"]
+    assert velocity["views_per_hour"].tolist() == [30.0, 0.0]
+
+
+def test_empty_history(tmp_path):
+    history = load_history(tmp_path / "missing")
+
+    assert history.empty
+    assert view_velocity(history).empty
@@ -0,0 +1,111 @@
+from fetch_transcripts import parse_subtitle_text, subtitle_file_to_text
+
+SRT = """1
+00:00:01,000 --> 00:00:03,000
+病院で
+
+2
+00:00:03,000 --> 00:00:05,000
+手術を受けた
+"""
+
+VTT = """WEBVTT
+Kind: captions
+Language: ja
+
+NOTE
+このブロックはコメント
+
+00:01.000 --> 00:03.000
+病院で
+
+00:00:03.000 --> 00:00:05.000 align:start position:0%
+手術を受けた
+"""
+
+
+def test_parse_srt():
+    assert parse_subtitle_text(SRT) == "病院で手術を受けた"
+
+
+def test_parse_vtt_skips_header_and_note_blocks():
+    assert parse_subtitle_text(VTT) == "病院で手術を受けた"
+
+
+def test_parse_bytes_with_bom():
+    data = ("﻿" + VTT).encode("utf-8")
+
+    assert parse_subtitle_text(data) == "病院で手術を受けた"
+
+
+def test_subtitle_file_to_text(tmp_path):
+    path = tmp_path / "abc.ja.srt"
+    path.write_text(SRT, encoding="utf-8")
+
+    assert subtitle_file_to_text(path) == "病院で手術を受けた"
+    assert subtitle_file_to_text(tmp_path / "missing.srt") == ""
+
+
+# YouTube の自動生成字幕（ロールアップ表示）
+AUTO_VTT = """WEBVTT
+Kind: captions
+Language: ja
+
+00:00:00.000 --> 00:00:02.000 align:start position:0%
+ 
+病院で<00:00:00.500><c>手術を</c><00:00:01.000><c>受けた</c>
+
+00:00:02.000 --> 00:00:02.010 align:start position:0%
+病院で手術を受けた
+ 
+
+00:00:02.010 --> 00:00:04.000 align:start position:0%
+病院で手術を受けた
+警察が<00:00:03.000><c>逮捕した</c>
+
+00:00:04.000 --> 00:00:04.010 align:start position:0%
+警察が逮捕した
+ 
+
+00:00:04.010 --> 00:00:06.000 align:start position:0%
+警察が逮捕した
+犬&amp;猫
+"""
+
+
+def test_auto_vtt_rolling_lines_are_collapsed():
+    assert parse_subtitle_text(AUTO_VTT, dedupe=True) == "病院で手術を受けた警察が逮捕した犬&猫"
+
+
+def test_inline_tags_are_stripped_without_dedupe():
+    text = parse_subtitle_text(AUTO_VTT)
+
+    assert "<" not in text and "</c>" not in text
+    assert text.count("病院で手術を受けた") == 3  # dedupe しなければ重複は残る
+
+
+def test_growing_line_keeps_only_new_part():
+    vtt = """WEBVTT
+
+00:00:00.000 --> 00:00:01.000
+今日は
+
+00:00:01.000 --> 00:00:02.000
+今日はいい天気
+"""
+    assert parse_subtitle_text(vtt, dedupe=True) == "今日はいい天気"
+
+
+def test_header_words_inside_cues_are_kept():
+    vtt = """WEBVTT
+
+NOTE comment
+
+00:00:00.000 --> 00:00:01.000
+NOTE の使い方
+STYLE 指定
+
+00:00:01.000 --> 00:00:02.000
+NOTEBOOK を買った
+"""
+    assert parse_subtitle_text(vtt) == "NOTE の使い方STYLE 指定NOTEBOOK を買った"
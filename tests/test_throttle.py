@@ -0,0 +1,121 @@
+import time
+
+import pytest
+
+import fetch_transcripts
+import throttle
+from throttle import AdaptiveLimiter, CircuitOpenError
+from transcript_cache import TranscriptCache
+
+
+@pytest.fixture
+def fast_backoff(monkeypatch):
+    monkeypatch.setattr(throttle, "BACKOFF_BASE", 0.01)
+    monkeypatch.setattr(throttle, "BREAKER_THRESHOLD", 2)
+    monkeypatch.setattr(throttle, "BREAKER_COOLDOWN", 0.05)
+    monkeypatch.setattr(throttle, "BREAKER_MAX_TRIPS", 2)
+
+
+def test_successes_increase_and_throttling_halves(fast_backoff):
+    limiter = AdaptiveLimiter("t", 2, max_concurrency=4, rate=100, max_rate=200)
+    for _ in range(4):
+        with limiter.slot():
+            pass
+    assert 3 < limiter.limit <= 4
+    assert limiter.rate > 100
+
+    before = limiter.limit
+    with limiter.slot() as slot:
+        slot.throttled()
+    assert limiter.limit == pytest.approx(before / 2)
+    assert limiter.rate < 100
+
+    start = time.monotonic()
+    with limiter.slot():  # バックオフの間は待つ
+        pass
+    assert time.monotonic() - start >= 0.005
+
+
+def test_slow_responses_lower_concurrency_once_per_window():
+    limiter = AdaptiveLimiter("t", 4, target_latency=0.01)
+    with limiter.slot(), limiter.slot():
+        time.sleep(0.02)
+
+    assert limiter.limit == 2  # 同じ混雑の間に始まった 2 本では 1 回だけ減らす
+
+
+def test_errors_do_not_change_the_limits():
+    limiter = AdaptiveLimiter("t", 2)
+    with pytest.raises(ValueError), limiter.slot():
+        raise ValueError("boom")
+
+    assert limiter.limit == 2 and limiter.stats["throttled"] == 0
+
+
+def test_circuit_opens_probes_and_gives_up(fast_backoff):
+    limiter = AdaptiveLimiter("t", 4)
+    for _ in range(2):
+        with limiter.slot() as slot:
+            slot.throttled()
+    assert limiter.stats["trips"] == 1
+
+    start = time.monotonic()
+    with limiter.slot() as probe:  # クールダウン後の 1 本
+        probe.throttled()
+    assert time.monotonic() - start >= 0.04
+    assert limiter.exhausted
+    with pytest.raises(CircuitOpenError):
+        with limiter.slot():
+            pass
+
+
+def test_probe_success_closes_the_circuit(fast_backoff):
+    limiter = AdaptiveLimiter("t", 4)
+    for _ in range(2):
+        with limiter.slot() as slot:
+            slot.throttled()
+    with limiter.slot():
+        pass
+
+    assert "state: closed" in limiter.report()
+    assert not limiter.exhausted
+
+
+class FlakyYDL:
+    """最初の fails 回は 429 を返し、その後は字幕を返す偽の YoutubeDL"""
+
+    def __init__(self, fails: dict):
+        self.fails = fails
+
+    def extract_info(self, url, download=False):
+        video_id = url.rsplit("=", 1)[1]
+        if self.fails.get(video_id, 0) > 0:
+            self.fails[video_id] -= 1
+            raise RuntimeError("ERROR: HTTP Error 429: Too Many Requests")
+        srt = "1\n00:00:00,000 --> 00:00:01,000\nこんにちは\n"
+        return {"subtitles": {"ja": []}, "requested_subtitles": {"ja": {"data": srt}}}
+
+    def close(self):
+        pass
+
+
+def test_throttled_videos_are_retried_and_deferred(fast_backoff, monkeypatch, tmp_path):
+    monkeypatch.setattr(fetch_transcripts, "SUBTITLE_RETRIES", 1)
+    monkeypatch.setattr(fetch_transcripts, "SUBTITLE_LANGS", ["ja"])
+    monkeypatch.setattr(throttle, "BREAKER_THRESHOLD", 10)
+    fails = {"v1": 1, "v2": 5}
+    cache = TranscriptCache(tmp_path / "cache.sqlite3")
+
+    df = fetch_transcripts.extract_subtitles_from_videos(
+        ["v1", "v2", "v3"],
+        max_workers=1,
+        rate=1000,
+        cache=cache,
+        ydl_factory=lambda options: FlakyYDL(fails),
+    )
+
+    assert df["subtitle_status"].tolist() == ["ok", "deferred", "ok"]
+    assert df["subtitles"][0] == "こんにちは"
+    assert "429" in df["subtitle_error"][1]
+    assert cache.get("v2", ["ja"]) is None  # 次回取り直す
+    assert cache.get("v1", ["ja"])["text"] == "こんにちは"
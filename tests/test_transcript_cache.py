@@ -0,0 +1,50 @@
+import time
+
+from transcript_cache import TranscriptCache
+
+
+def test_get_put_and_language_order(tmp_path):
+    cache = TranscriptCache(tmp_path / "cache.sqlite3")
+
+    assert cache.get("v1", ["ja"]) is None
+    cache.put("v1", "en", "manual", "hello")
+
+    assert cache.get("v1", ["ja"]) is None  # 対象外の言語はミス
+    assert cache.get("v1", ["ja", "en"])["text"] == "hello"
+    assert cache.stats["hits"] == 1 and cache.stats["misses"] == 2
+
+
+def test_no_subtitles_entry_is_a_hit(tmp_path):
+    cache = TranscriptCache(tmp_path / "cache.sqlite3")
+    cache.put("v1", "", "none", "")
+
+    entry = cache.get("v1", ["ja"])
+
+    assert entry["kind"] == "none" and entry["text"] == ""
+
+
+def test_ttl_expiry(tmp_path):
+    cache = TranscriptCache(tmp_path / "cache.sqlite3", ttl_sec=0.05)
+    cache.put("v1", "ja", "auto", "こんにちは")
+    time.sleep(0.1)
+
+    assert cache.get("v1", ["ja"]) is None
+    assert cache.stats["expired"] == 1
+
+
+def test_size_bounded_eviction(tmp_path):
+    cache = TranscriptCache(tmp_path / "cache.sqlite3", max_bytes=10)
+    cache.put("v1", "ja", "auto", "aaaaaa")
+    time.sleep(0.01)
+    cache.put("v2", "ja", "auto", "bbbbbb")  # 合計 12 バイト → 古い v1 を削除
+
+    assert cache.get("v1", ["ja"]) is None
+    assert cache.get("v2", ["ja"])["text"] == "bbbbbb"
+    assert cache.stats["evicted"] == 1
+
+
+def test_entries_from_other_parser_version_are_misses(tmp_path):
+    TranscriptCache(tmp_path / "cache.sqlite3", version=1).put("v1", "ja", "auto", "a")
+
+    assert TranscriptCache(tmp_path / "cache.sqlite3", version=2).get("v1", ["ja"]) is None
+    assert TranscriptCache(tmp_path / "cache.sqlite3", version=1).get("v1", ["ja"])
@@ -0,0 +1,65 @@
+import random
+
+import pandas as pd
+
+from keywords import analyze_all_categories, get_matcher
+from transcript_corpus import CorpusWriter, TranscriptCorpus
+
+
+def test_write_and_read_back(tmp_path):
+    with CorpusWriter(tmp_path) as writer:
+        writer.add("a", "病院で手術")
+        writer.add("b", "")
+        writer.add("a", "警察に逮捕")  # 同じ動画は後に書いたものが優先
+
+    with TranscriptCorpus(tmp_path) as corpus:
+        assert len(corpus) == 2 and "a" in corpus and "x" not in corpus
+        assert corpus.text("a") == "警察に逮捕"
+        assert corpus.text("b") == ""
+        assert corpus.view("x") is None
+
+
+def test_half_written_index_line_is_ignored(tmp_path):
+    with CorpusWriter(tmp_path) as writer:
+        writer.add("a", "病院")
+    with (tmp_path / "index.tsv").open("a", encoding="utf-8") as f:
+        f.write("b\t6")  # 書きかけで終了
+
+    with TranscriptCorpus(tmp_path) as corpus:
+        assert corpus.video_ids() == ["a"]
+
+
+def test_matcher_counts_on_byte_slices_match_str():
+    matcher = get_matcher()
+    rng = random.Random(0)
+    fillers = "あいうえお今日は病院感染症ガンガン"
+    for _ in range(200):
+        text = "".join(
+            rng.choice(matcher.keywords) if rng.random() < 0.3 else rng.choice(fillers)
+            for _ in range(rng.randint(0, 30))
+        )
+        data = memoryview(("x" + text).encode("utf-8"))[1:]
+        assert matcher.count_keywords(data) == matcher.count_keywords(text)
+
+
+def test_analysis_from_corpus_matches_in_memory(tmp_path):
+    df = pd.DataFrame(
+        {
+            "video_id": ["a", "b", "c"],
+            "subtitles": ["病院で手術を受けた、感染症", "警察が逮捕", None],
+            "duration": [60, 120, 0],
+        }
+    )
+    with CorpusWriter(tmp_path) as writer:
+        writer.add("a", df["subtitles"][0])
+        writer.add("b", df["subtitles"][1])
+
+    expected = df.copy()
+    analyze_all_categories(expected)
+    actual = df.assign(subtitles=None)
+    with TranscriptCorpus(tmp_path) as corpus:
+        analyze_all_categories(actual, corpus=corpus)
+
+    pd.testing.assert_frame_equal(
+        actual.drop(columns="subtitles"), expected.drop(columns="subtitles")
+    )
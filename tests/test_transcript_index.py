@@ -0,0 +1,80 @@
+import numpy as np
+
+from transcript_cache import TranscriptCache
+import transcript_index
+from transcript_index import TranscriptIndex
+
+
+def make_cache(tmp_path):
+    cache = TranscriptCache(tmp_path / "cache.sqlite3")
+    cache.put("v1", "ja", "auto", "病院で手術を受けた。病院は遠い")
+    cache.put("v2", "ja", "auto", "警察が逮捕した")
+    cache.put("v3", "ja", "manual", "院内で病気が見つかった")  # 「病」「院」はあるが「病院」は無い
+    cache.put("v4", "", "none", "")
+    return cache
+
+
+def test_query_counts_substrings(tmp_path):
+    cache = make_cache(tmp_path)
+    index = TranscriptIndex(tmp_path / "index.sqlite3")
+
+    assert index.update(cache) == 3
+    result = index.query("病院")
+
+    assert result.values.tolist() == [["v1", 2]]
+    assert index.query("逮捕した")["video_id"].tolist() == ["v2"]
+    assert index.query("が")["video_id"].tolist() == ["v2", "v3"]
+    assert index.query("存在しない語").empty
+
+
+def test_update_is_incremental_and_reindexes_refetched_videos(tmp_path):
+    cache = make_cache(tmp_path)
+    index = TranscriptIndex(tmp_path / "index.sqlite3")
+    index.update(cache)
+
+    assert index.update(cache) == 0  # 新しい字幕が無ければ何もしない
+
+    cache.put("v5", "ja", "auto", "病院に搬送")
+    cache.put("v1", "ja", "auto", "警察に通報")  # 再取得で本文が変わった
+    assert index.update(cache) == 2
+
+    reopened = TranscriptIndex(tmp_path / "index.sqlite3")
+    assert reopened.query("病院")["video_id"].tolist() == ["v5"]
+    assert reopened.query("警察")["video_id"].tolist() == ["v1", "v2"]
+    assert len(reopened) == 4
+
+
+def test_counts_match_str_count_without_reading_texts(tmp_path):
+    cache = TranscriptCache(tmp_path / "cache.sqlite3")
+    texts = {"v1": "あああああ", "v2": "ガンガンガン", "v3": "感染症と感染と感染症"}
+    for video_id, text in texts.items():
+        cache.put(video_id, "ja", "auto", text)
+    index = TranscriptIndex(tmp_path / "index.sqlite3")
+    index.update(cache)
+    cache.close()  # 検索に本文は要らない
+
+    for term in ["ああ", "あああ", "ガンガン", "ン", "感染", "感染症", "染症と感"]:
+        expected = {v: t.count(term) for v, t in texts.items() if t.count(term)}
+        assert dict(index.query(term).values.tolist()) == expected, term
+
+
+def test_segments_are_merged_and_dead_documents_dropped(tmp_path, monkeypatch):
+    monkeypatch.setattr(transcript_index, "FLUSH_DOCS", 1)
+    monkeypatch.setattr(transcript_index, "MERGE_FACTOR", 2)
+    cache = make_cache(tmp_path)
+    index = TranscriptIndex(tmp_path / "index.sqlite3")
+    index.update(cache)
+
+    cache.put("v1", "ja", "auto", "警察に通報")
+    cache._conn.execute("DELETE FROM transcripts WHERE video_id = 'v2'")  # 容量超過で削除
+    cache._conn.commit()
+    index.update(cache)
+
+    assert len(index) == 2
+    assert index._conn.execute("SELECT COUNT(*) FROM segments").fetchone()[0] == 1
+    assert index.query("警察")["video_id"].tolist() == ["v1"]
+    live = {r[0] for r in index._conn.execute("SELECT doc_id FROM docs")}
+    posted = set()
+    for (blob,) in index._conn.execute("SELECT doc_ids FROM postings"):
+        posted.update(np.frombuffer(blob, dtype=np.uint32).tolist())
+    assert posted == live  # 削除した文書はセグメントをまとめたときに消える
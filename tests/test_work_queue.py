@@ -0,0 +1,97 @@
+import time
+
+from work_queue import WorkQueue
+
+
+def test_put_ignores_duplicates_and_claims_by_priority(tmp_path):
+    queue = WorkQueue(tmp_path)
+    assert queue.put_many("videos", [("a", {"n": 1}), ("b", {"n": 2})], priority=1) == 2
+    assert queue.put("playlist", "p", {"n": 0}) is True
+    assert queue.put("videos", "a", {"n": 9}, priority=1) is False
+
+    claimed = [queue.claim("w1")["key"], queue.claim("w2")["key"], queue.claim("w1")["key"]]
+
+    assert claimed == ["p", "a", "b"]
+    assert queue.claim("w1") is None
+    assert queue.counts() == {"playlist": {"leased": 1}, "videos": {"leased": 2}}
+    queue.close()
+
+
+def test_expired_lease_is_reclaimed_until_max_attempts(tmp_path):
+    queue = WorkQueue(tmp_path, lease_sec=0.05, max_attempts=2)
+    queue.put("videos", "a", {})
+
+    first = queue.claim("w1")
+    assert queue.claim("w2") is None  # リース中
+    time.sleep(0.1)
+    second = queue.claim("w2")
+    assert second["id"] == first["id"] and second["attempts"] == 2
+    assert queue.renew(first) is False  # 取り直されたリースは延長できない
+    queue.fail(first, "late")  # 別のワーカーのリースは上書きしない
+    assert queue.complete(first) is False
+    assert queue.counts() == {"videos": {"leased": 1}}
+    assert queue.tasks("videos", "leased")[0]["worker"] == "w2"
+
+    time.sleep(0.1)
+    assert queue.claim("w3") is None
+    assert queue.errors() == [("videos", "a", "lease expired")]
+    assert queue.unfinished() == 0
+    queue.close()
+
+
+def test_fail_retries_then_gives_up_and_release_keeps_attempts(tmp_path):
+    queue = WorkQueue(tmp_path, max_attempts=2)
+    queue.put("videos", "a", {})
+
+    queue.release(queue.claim("w1"))
+    task = queue.claim("w1")
+    assert task["attempts"] == 1
+    assert queue.fail(task, "HTTPError: 500") is False
+    assert queue.fail(queue.claim("w2"), "HTTPError: 500") is True
+
+    assert queue.errors() == [("videos", "a", "HTTPError: 500")]
+    assert queue.report() == "videos: 1 failed"
+    queue.close()
+
+
+def test_results_are_written_and_survive_reopening(tmp_path):
+    queue = WorkQueue(tmp_path)
+    queue.put("videos", "a", {"video_ids": ["v1", "v2"]})
+    task = queue.claim("w1")
+    with queue.hold(task):
+        queue.write_result(task, [{"video_id": "v1", "title": "字幕"}, {"video_id": "v2"}])
+    assert queue.complete(task) is True
+    queue.close()
+
+    reopened = WorkQueue(tmp_path)
+    [done] = reopened.tasks("videos", "done")
+    assert done["payload"] == {"video_ids": ["v1", "v2"]}
+    assert reopened.read_result(done) == [{"video_id": "v1", "title": "字幕"}, {"video_id": "v2"}]
+    assert not list((tmp_path / "results").glob("*.tmp"))
+
+    reopened.clear()
+    assert reopened.report() == "empty"
+    assert not list((tmp_path / "results").iterdir())
+    reopened.close()
+
+
+def test_worker_returns_the_task_and_stops_when_still_throttled(monkeypatch, tmp_path):
+    import main
+    from throttle import CircuitOpenError
+
+    def throttled(queue, task, transcript_cache):
+        raise CircuitOpenError("api: still throttled after 3 cooldowns")
+
+    monkeypatch.setattr(main, "run_queue_task", throttled)
+    monkeypatch.setattr(main.fetch_transcripts, "open_transcript_cache", lambda: None)
+    monkeypatch.setattr(main, "update_transcript_index", lambda transcript_cache: None)
+    monkeypatch.setattr(main, "print_cache_reports", lambda transcript_cache=None: None)
+    queue = WorkQueue(tmp_path)
+    queue.put_many("videos", [("a", {}), ("b", {})])
+
+    assert main.run_queue_worker(queue, "w1") == main.EXIT_THROTTLED
+
+    # 残りのタスクを失敗にせず、試行回数も使わずに戻す
+    assert queue.counts() == {"videos": {"pending": 2}}
+    assert queue.claim("w2")["attempts"] == 1
+    queue.close()
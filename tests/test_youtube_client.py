@@ -0,0 +1,226 @@
+import pandas as pd
+import pytest
+
+from benchmarks.fake_youtube_api import FakeYouTubeAPI
+from api_cache import ResponseCache
+from crawl_state import CrawlState
+from quota import QuotaBudget
+
+
+@pytest.fixture
+def api(monkeypatch):
+    """youtube_client を偽の API に向ける（レスポンスキャッシュなし・割り当ては保存しない）"""
+    # youtube_client は設定を読み込み時に決めるので、ベンチマークの設定より後に読み込む
+    import youtube_client
+
+    monkeypatch.setenv("NO_PROXY", "127.0.0.1")
+    monkeypatch.setenv("no_proxy", "127.0.0.1")
+    with FakeYouTubeAPI(num_videos=120) as api:
+        monkeypatch.setattr(youtube_client, "YOUTUBE_API_BASE_URL", api.base_url)
+        monkeypatch.setattr(youtube_client, "API_CACHE", "")
+        monkeypatch.setattr(youtube_client, "_response_cache", None)
+        monkeypatch.setattr(youtube_client, "_quota_budget", QuotaBudget(10**6))
+        yield api
+
+
+def test_incremental_crawl_fetches_only_the_new_page(api, tmp_path):
+    import youtube_client
+
+    playlist_id = "UU" + api.channels[0][2:]
+    state = CrawlState(tmp_path / "crawl_state.json")
+
+    first = youtube_client.get_all_video_ids([playlist_id], "key", crawl_state=state)
+    assert api.requests == 3  # 50 本ずつ 3 ページ
+    assert first["video_id"].tolist() == api.channel_videos(0)
+
+    api.set_videos(130)  # 新しい動画が 10 本増えた
+    requests_before = api.requests
+    new = youtube_client.get_all_video_ids([playlist_id], "key", crawl_state=state)
+
+    assert api.requests - requests_before == 1  # 1 ページ目で既知の動画に到達
+    assert new["video_id"].tolist() == api.channel_videos(0)[:10]
+    assert [v["video_id"] for v in state.known_videos(playlist_id)] == api.channel_videos(0)
+    assert state.newest_video_id(playlist_id) == api.channel_videos(0)[0]
+
+
+def test_full_crawl_replaces_the_known_videos(api, tmp_path):
+    import youtube_client
+
+    playlist_id = "UU" + api.channels[0][2:]
+    state = CrawlState(tmp_path / "crawl_state.json")
+    youtube_client.get_all_video_ids([playlist_id], "key", crawl_state=state)
+
+    api.set_videos(100)  # 20 本が削除された
+    videos = youtube_client.get_all_video_ids(
+        [playlist_id], "key", crawl_state=state, full=True
+    )
+
+    assert len(videos) == 100
+    assert len(state.known_videos(playlist_id)) == 100
+
+
+def test_response_cache_serves_fresh_revalidates_and_misses(api, monkeypatch, tmp_path):
+    import youtube_client
+
+    cache = ResponseCache(tmp_path / "api.sqlite3")
+    monkeypatch.setattr(youtube_client, "_response_cache", cache)
+    video_ids = api.seed_video_ids()
+
+    first = youtube_client.get_playlist_ids(video_ids, "key")
+    assert api.requests == 1 and cache.stats["misses"] == 1 and cache.stats["stored"] == 1
+
+    assert youtube_client.get_playlist_ids(video_ids, "key").equals(first)
+    assert api.requests == 1 and cache.stats["fresh"] == 1  # 有効期限内は送らない
+
+    monkeypatch.setitem(youtube_client.API_CACHE_TTLS, "static", 0)
+    assert youtube_client.get_playlist_ids(video_ids, "key").equals(first)
+    assert api.requests == 2 and cache.stats["revalidated"] == 1  # 304 で本文を再利用
+    assert cache.stats["stored"] == 1
+
+    youtube_client.close_response_cache()
+    assert youtube_client._response_cache is None
+
+
+def test_statistics_refreshes_inside_the_ttl_reach_the_api(api, monkeypatch, tmp_path):
+    import youtube_client
+    from stats_history import append_snapshot, load_history
+
+    monkeypatch.setattr(
+        youtube_client, "_response_cache", ResponseCache(tmp_path / "api.sqlite3")
+    )
+    video_ids = api.channel_videos(0)[:3]
+
+    first = youtube_client.get_video_statistics(video_ids, "key")
+    append_snapshot(first, tmp_path / "history")
+    api.views_added = 500  # TTL（1 時間）内に再生数が増えた
+    second = youtube_client.get_video_statistics(video_ids, "key")
+    append_snapshot(second, tmp_path / "history")
+
+    assert api.requests == 2
+    assert (second["views"] - first["views"]).tolist() == [500] * 3
+    assert (second["fetched_at"] >= first["fetched_at"]).all()
+
+    history = load_history(tmp_path / "history")
+    assert len(history) == 6
+    # スナップショットの時刻は保存した時刻ではなく API から取得した時刻
+    assert set(history["snapshot_at"]) == set(
+        pd.concat([first, second])["fetched_at"].dt.floor("s")
+    )
+
+
+def test_open_circuit_stops_the_playlist_crawl_and_returns_the_task(api, monkeypatch, tmp_path):
+    import main
+    import throttle
+    import youtube_client
+    from throttle import CircuitOpenError
+    from work_queue import WorkQueue
+
+    monkeypatch.setattr(throttle, "BREAKER_THRESHOLD", 1)
+    monkeypatch.setattr(throttle, "BREAKER_MAX_TRIPS", 1)
+    limiter = throttle.AdaptiveLimiter("api", 2)
+    with limiter.slot() as slot:
+        slot.throttled()
+    assert limiter.exhausted
+    monkeypatch.setattr(youtube_client, "_api_limiter", limiter)
+    playlist_id = "UU" + api.channels[0][2:]
+
+    with pytest.raises(CircuitOpenError):
+        youtube_client.get_all_video_ids([playlist_id], "key")
+
+    monkeypatch.setattr(main.fetch_transcripts, "open_transcript_cache", lambda: None)
+    monkeypatch.setattr(main, "update_transcript_index", lambda transcript_cache: None)
+    monkeypatch.setattr(main, "print_cache_reports", lambda transcript_cache=None: None)
+    queue = WorkQueue(tmp_path)
+    main.enqueue_playlists(queue, [playlist_id])
+
+    assert main.run_queue_worker(queue, "w1") == main.EXIT_THROTTLED
+    assert queue.counts() == {"playlist": {"pending": 1}}  # 空の一覧で完了にしない
+    assert api.requests == 0
+    queue.close()
+
+
+def test_failed_page_fails_the_playlist_task_instead_of_completing_it(api, monkeypatch, tmp_path):
+    import main
+    from work_queue import WorkQueue
+
+    monkeypatch.setattr(main.fetch_transcripts, "open_transcript_cache", lambda: None)
+    monkeypatch.setattr(main, "update_transcript_index", lambda transcript_cache: None)
+    monkeypatch.setattr(main, "print_cache_reports", lambda transcript_cache=None: None)
+    playlist_id = "UU" + api.channels[0][2:]
+    queue = WorkQueue(tmp_path)
+    main.enqueue_playlists(queue, [playlist_id])
+    api.fail_requests(400, "pageToken=50")  # 2 ページ目が 1 回だけ失敗する
+
+    assert main.run_queue_worker(queue, "w1", max_tasks=1) == 0
+
+    [playlist] = queue.tasks("playlist", "done")
+    assert playlist["attempts"] == 2  # 1 回目は失敗にして取り直した
+    [shard] = queue.tasks("videos", "pending")
+    assert shard["payload"]["video_ids"] == api.channel_videos(0)
+    queue.close()
+
+
+def test_concurrent_batches_keep_the_order_and_a_failed_batch_keeps_the_others(api):
+    import youtube_client
+
+    # 50 本ずつ 3 バッチ。入力順を API の順と逆にして、並列でも入力順で返ることを確かめる
+    video_ids = api.video_ids[::-1][:130]
+    details = youtube_client.get_video_details(video_ids, "key", max_workers=3)
+    assert details["video_id"].tolist() == video_ids
+
+    # 2 番目のバッチだけエラーを返す（400 は再試行されない）
+    failed = video_ids[50:100]
+    api.fail_requests(400, failed[0])
+    with pytest.raises(youtube_client.PartialResultError) as excinfo:
+        youtube_client.get_video_details(video_ids, "key", max_workers=3)
+
+    error = excinfo.value
+    assert [item for item, _ in error.errors] == [failed]
+    assert "1 of 3 requests failed" in str(error)
+    assert error.partial["video_id"].tolist() == video_ids[:50] + video_ids[100:]
+
+
+def test_field_selectors_are_sent_and_the_trimmed_responses_fill_every_column(
+    api, monkeypatch
+):
+    import youtube_client
+
+    playlists = youtube_client.get_playlist_ids(api.seed_video_ids(), "key")
+    videos = youtube_client.get_all_video_ids(playlists["playlist_id"].tolist(), "key")
+    video_ids = videos["video_id"].tolist()
+    details = youtube_client.get_video_details(video_ids, "key")
+    stats = youtube_client.get_video_statistics(video_ids, "key")
+
+    sent = {
+        (path.rsplit("/", 1)[-1], params["part"], params.get("fields"))
+        for path, params in api.queries
+    }
+    assert sent == {
+        ("videos", "snippet", youtube_client.PLAYLIST_ID_FIELDS),
+        ("playlistItems", "snippet", youtube_client.PLAYLIST_ITEM_FIELDS),
+        (
+            "videos",
+            "snippet,contentDetails,statistics",
+            youtube_client.VIDEO_DETAIL_FIELDS,
+        ),
+        ("videos", "statistics", youtube_client.VIDEO_STATISTICS_FIELDS),
+    }
+
+    # 偽の API は fields で絞った応答を返す。main.py が読む列はすべて埋まる
+    assert playlists["playlist_id"].tolist() == ["UU" + api.channels[0][2:]]
+    assert sorted(video_ids) == sorted(api.video_ids)
+    assert videos["title"].str.len().gt(0).all()
+    for df in (details, stats):
+        assert df["video_id"].tolist() == video_ids
+        assert df.notna().all().all()
+
+    # 絞らない応答から作った結果と同じになる
+    monkeypatch.setattr(youtube_client, "VIDEO_DETAIL_FIELDS", "")
+    monkeypatch.setattr(youtube_client, "VIDEO_STATISTICS_FIELDS", "")
+    pd.testing.assert_frame_equal(
+        youtube_client.get_video_details(video_ids, "key"), details
+    )
+    full_stats = youtube_client.get_video_statistics(video_ids, "key")
+    pd.testing.assert_frame_equal(
+        full_stats.drop(columns="fetched_at"), stats.drop(columns="fetched_at")
+    )
@@ -0,0 +1,258 @@
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+import metrics
+
+# 制限されたときの指数バックオフ（秒）: BACKOFF_BASE × 2^(連続回数-1)、上限 BACKOFF_MAX
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 60.0
+# この回数続けて制限されたら回路を開き、BREAKER_COOLDOWN 秒（開くたびに倍、上限 BREAKER_COOLDOWN_MAX）止める
+BREAKER_THRESHOLD = 5
+BREAKER_COOLDOWN = 30.0
+BREAKER_COOLDOWN_MAX = 300.0
+# 回路が続けてこの回数開いたら（再開の試しの 1 本も制限されたら）諦めて CircuitOpenError にする
+BREAKER_MAX_TRIPS = 3
+
+
+class TokenBucket:
+    """
+    スレッド間で共有するトークンバケット方式のレート制限
+
+    rate 回/秒 のペースでトークンが補充され、最大 capacity 個まで貯まる
+    acquire() はトークンが 1 個取れるまでブロックする
+    """
+
+    def __init__(self, rate: float, capacity: float | None = None):
+        if rate <= 0:
+            raise ValueError(f"rate must be positive: {rate}")
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def set_rate(self, rate: float) -> None:
+        """補充のペースを変える（それまでに貯まったトークンはそのまま）"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = rate
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """トークンを取得する。待機した秒数を返す"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill(time.monotonic())
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
+
+
+class CircuitOpenError(RuntimeError):
+    """制限が続いて回路が開いたまま諦めた（この実行ではもうリクエストを送らない）"""
+
+
+class _Slot:
+    """AdaptiveLimiter.slot() の with で受け取る。制限された（429 など）ら throttled() を呼ぶ"""
+
+    def __init__(self, probe: bool):
+        self.probe = probe
+        self.started = time.monotonic()
+        self.outcome = "ok"
+        self.retry_after = 0.0
+
+    def throttled(self, retry_after: float = 0.0) -> None:
+        self.outcome = "throttled"
+        self.retry_after = retry_after
+
+
+class AdaptiveLimiter:
+    """
+    観測した待ち時間と制限（429・403 など）から、同時リクエスト数と頻度を調整する（AIMD）
+
+    - 成功: 同時数を 1/同時数 ずつ（同時数ぶん成功するごとに +1）、頻度を rate_step/頻度 ずつ
+      （おおむね 1 秒ごとに +rate_step）増やす。待ち時間が target_latency を超えたら同時数を減らす
+    - 制限された: 同時数・頻度を decrease 倍に減らし、全リクエストをジッター付きの指数バックオフで
+      止める。減らすのは前回減らした後に始まったリクエストの結果だけ（同じ混雑で何度も減らさない）
+    - BREAKER_THRESHOLD 回続けて制限されたら回路を開き、クールダウンの間は全リクエストを止める
+      クールダウン後は 1 本だけ試し、成功すれば閉じる。BREAKER_MAX_TRIPS 回続けて開いたら
+      以降の slot() は CircuitOpenError を出す
+    rate が None なら頻度は制限せず、同時数とバックオフだけで調整する
+    """
+
+    def __init__(
+        self,
+        name: str,
+        concurrency: int,
+        max_concurrency: int | None = None,
+        rate: float | None = None,
+        max_rate: float | None = None,
+        min_rate: float = 0.1,
+        rate_step: float = 0.05,
+        target_latency: float | None = None,
+        decrease: float = 0.5,
+    ):
+        self.name = name
+        self.max_concurrency = max(1, max_concurrency or concurrency)
+        self.limit = float(min(max(1, concurrency), self.max_concurrency))
+        self.min_rate = min_rate
+        self.max_rate = max_rate if max_rate is not None else rate
+        self.rate_step = rate_step
+        self.target_latency = target_latency
+        self.decrease = decrease
+        self._bucket = TokenBucket(rate) if rate else None
+        self._cond = threading.Condition()
+        self._active = 0
+        self._streak = 0  # 続けて制限された回数
+        self._resume_at = 0.0  # バックオフ中はこの時刻まで待つ
+        self._last_decrease = 0.0
+        self._state = "closed"  # closed / open / half_open
+        self._open_until = 0.0
+        self._trips = 0  # 続けて回路が開いた回数
+        self._probing = False
+        self.stats = {"requests": 0, "throttled": 0, "trips": 0}
+
+    @property
+    def rate(self) -> float | None:
+        return self._bucket.rate if self._bucket else None
+
+    @property
+    def exhausted(self) -> bool:
+        """回路が BREAKER_MAX_TRIPS 回続けて開き、諦めた（slot() は CircuitOpenError を出す）"""
+        with self._cond:
+            return self._trips >= BREAKER_MAX_TRIPS
+
+    def _acquire(self) -> tuple[bool, float]:
+        """送ってよくなるまで待つ。(再開の試しの 1 本か, 待った秒数) を返す"""
+        start = time.monotonic()
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                if self._trips >= BREAKER_MAX_TRIPS:
+                    raise CircuitOpenError(
+                        f"{self.name}: still throttled after {self._trips} cooldowns"
+                    )
+                if self._state == "open":
+                    if now < self._open_until:
+                        self._cond.wait(self._open_until - now)
+                        continue
+                    self._state = "half_open"
+                if self._state == "half_open":
+                    if self._probing:
+                        self._cond.wait()
+                        continue
+                    self._probing = True
+                    probe = True
+                elif now < self._resume_at:
+                    self._cond.wait(self._resume_at - now)
+                    continue
+                elif self._active >= int(self.limit):
+                    self._cond.wait()
+                    continue
+                else:
+                    probe = False
+                self._active += 1
+                self.stats["requests"] += 1
+                break
+        waited = time.monotonic() - start
+        if self._bucket is not None:
+            waited += self._bucket.acquire()
+        return probe, waited
+
+    @contextmanager
+    def slot(self):
+        """
+        with の間に 1 リクエストを送る（同時数・頻度・バックオフ・回路の状態に従って待つ）
+        例外で抜けたら結果は "error"（調整には使わない）。制限されたら slot.throttled() を呼ぶ
+        """
+        probe, waited = self._acquire()
+        metrics.inc("rate_limit_sleep_seconds", waited, limiter=self.name)
+        slot = _Slot(probe)
+        try:
+            yield slot
+        except BaseException:
+            if slot.outcome == "ok":
+                slot.outcome = "error"
+            raise
+        finally:
+            self._release(slot, time.monotonic() - slot.started)
+
+    def _release(self, slot: _Slot, latency: float) -> None:
+        with self._cond:
+            now = time.monotonic()
+            self._active -= 1
+            if slot.probe:
+                self._probing = False
+            # 前回減らした後に始まったリクエストの結果でだけ減らす
+            may_decrease = slot.started >= self._last_decrease
+
+            if slot.outcome == "throttled":
+                self.stats["throttled"] += 1
+                metrics.inc("throttled_requests", limiter=self.name)
+                self._streak += 1
+                if may_decrease:
+                    self._decrease(now, rate=True)
+                backoff = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (self._streak - 1))
+                backoff = backoff * (0.5 + random.random() / 2)  # ジッター（同時に再開しない）
+                self._resume_at = max(self._resume_at, now + max(backoff, slot.retry_after))
+                if slot.probe or (
+                    self._state == "closed" and self._streak >= BREAKER_THRESHOLD
+                ):
+                    self._trip(now)
+            elif slot.outcome == "ok":
+                self._streak = 0
+                if slot.probe:
+                    self._state = "closed"
+                    self._trips = 0
+                if self.target_latency and latency > self.target_latency:
+                    if may_decrease:
+                        self._decrease(now, rate=False)
+                else:
+                    self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+                    if self._bucket is not None and self.max_rate:
+                        rate = self._bucket.rate
+                        self._bucket.set_rate(min(self.max_rate, rate + self.rate_step / rate))
+            elif slot.probe:
+                # 結果が分からない（制限以外のエラー）ので、次の 1 本でもう一度試す
+                self._state = "half_open"
+            self._cond.notify_all()
+
+    def _decrease(self, now: float, rate: bool) -> None:
+        self.limit = max(1.0, self.limit * self.decrease)
+        if rate and self._bucket is not None:
+            self._bucket.set_rate(max(self.min_rate, self._bucket.rate * self.decrease))
+        self._last_decrease = now
+
+    def _trip(self, now: float) -> None:
+        self._trips += 1
+        self.stats["trips"] += 1
+        metrics.inc("circuit_trips", limiter=self.name)
+        cooldown = min(BREAKER_COOLDOWN_MAX, BREAKER_COOLDOWN * 2 ** (self._trips - 1))
+        self._state = "open"
+        self._open_until = now + cooldown
+        self._streak = 0
+        print(f"  {self.name}: throttled repeatedly, pausing requests for {cooldown:.0f} s.")
+
+    def report(self) -> str:
+        with self._cond:
+            parts = [f"concurrency: {self.limit:.1f}/{self.max_concurrency}"]
+            if self._bucket is not None:
+                parts.append(f"rate: {self._bucket.rate:.2f}/{self.max_rate:.2f} per sec")
+            parts += [
+                f"requests: {self.stats['requests']}",
+                f"throttled: {self.stats['throttled']}",
+                f"circuit trips: {self.stats['trips']}",
+                f"state: {self._state}",
+            ]
+        return ", ".join(parts)
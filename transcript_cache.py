@@ -0,0 +1,213 @@
+import sqlite3
+import threading
+import time
+from collections.abc import Iterator
+from pathlib import Path
+
+
+class TranscriptCache:
+    """
+    字幕テキストの永続キャッシュ（SQLite）
+
+    キーは (video_id, lang, kind)。kind は "manual"（手動字幕）/ "auto"（自動生成字幕）、
+    字幕が無かった動画は kind="none" の空エントリとして記録し、再取得を避ける
+    ttl_sec より古いエントリ・version（テキスト抽出方法の版）が異なるエントリは
+    期限切れ（ミス扱い）、合計サイズが max_bytes を超えたら最終参照が古いものから削除する
+    """
+
+    def __init__(
+        self,
+        path: Path | str,
+        ttl_sec: float | None = None,
+        max_bytes: int | None = None,
+        version: int = 0,
+    ):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl_sec = ttl_sec
+        self.max_bytes = max_bytes
+        self.version = version
+        self.stats = {"hits": 0, "misses": 0, "expired": 0, "stored": 0, "evicted": 0}
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS transcripts (
+                video_id TEXT NOT NULL,
+                lang TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                text TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                fetched_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                version INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (video_id, lang, kind)
+            )
+            """
+        )
+        columns = [r[1] for r in self._conn.execute("PRAGMA table_info(transcripts)")]
+        if "version" not in columns:  # version 列が無い古いキャッシュ
+            self._conn.execute(
+                "ALTER TABLE transcripts ADD COLUMN version INTEGER NOT NULL DEFAULT 0"
+            )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_last_access ON transcripts(last_access)"
+        )
+        self._conn.commit()
+
+    def get(self, video_id: str, langs: list[str]) -> dict | None:
+        """
+        有効なエントリを返す（無ければ None）
+        言語は langs の順、同じ言語なら手動字幕を自動生成字幕より優先する
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT lang, kind, text, fetched_at, version FROM transcripts"
+                " WHERE video_id = ?",
+                (video_id,),
+            ).fetchall()
+
+            now = time.time()
+            fresh = [
+                r[:4]
+                for r in rows
+                if (self.ttl_sec is None or now - r[3] <= self.ttl_sec)
+                and r[4] == self.version
+            ]
+            if rows and not fresh:
+                self.stats["expired"] += 1
+
+            order = {lang: i for i, lang in enumerate(langs)}
+            kind_order = {"manual": 0, "auto": 1, "none": 2}
+            candidates = [r for r in fresh if r[0] in order or r[1] == "none"]
+            if not candidates:
+                self.stats["misses"] += 1
+                return None
+
+            lang, kind, text, fetched_at = min(
+                candidates,
+                key=lambda r: (order.get(r[0], len(order)), kind_order[r[1]]),
+            )
+            self._conn.execute(
+                "UPDATE transcripts SET last_access = ? WHERE video_id = ? AND lang = ? AND kind = ?",
+                (now, video_id, lang, kind),
+            )
+            self._conn.commit()
+            self.stats["hits"] += 1
+            return {
+                "video_id": video_id,
+                "lang": lang,
+                "kind": kind,
+                "text": text,
+                "fetched_at": fetched_at,
+            }
+
+    def put(self, video_id: str, lang: str, kind: str, text: str) -> None:
+        """エントリを保存（同じキーは上書き）し、必要ならサイズ上限まで削除する"""
+        now = time.time()
+        with self._lock:
+            # 同じ動画の古いエントリ（別言語・別種別や字幕なし記録）は置き換える
+            self._conn.execute("DELETE FROM transcripts WHERE video_id = ?", (video_id,))
+            self._conn.execute(
+                "INSERT INTO transcripts"
+                " (video_id, lang, kind, text, size, fetched_at, last_access, version)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    video_id,
+                    lang,
+                    kind,
+                    text,
+                    len(text.encode("utf-8")),
+                    now,
+                    now,
+                    self.version,
+                ),
+            )
+            self.stats["stored"] += 1
+            self._evict()
+            self._conn.commit()
+
+    def get_text(self, video_id: str) -> str | None:
+        """
+        保存されている字幕本文を期限・言語を問わず返す（索引の照合用。集計には数えない）
+        字幕が無い動画・未保存の動画は None
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT text FROM transcripts"
+                " WHERE video_id = ? AND kind != 'none' AND version = ?",
+                (video_id, self.version),
+            ).fetchone()
+        return row[0] if row else None
+
+    def video_ids(self) -> set[str]:
+        """字幕本文が保存されている動画（字幕なしの記録・version が異なるエントリを除く）"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT video_id FROM transcripts WHERE kind != 'none' AND version = ?",
+                (self.version,),
+            ).fetchall()
+        return {r[0] for r in rows}
+
+    def iter_texts(
+        self, since: float = 0.0, batch_size: int = 500
+    ) -> Iterator[tuple[str, str, float]]:
+        """
+        since より後に保存された字幕を (video_id, text, fetched_at) の保存順で返す
+        字幕が無い動画の記録・version が異なるエントリは含めない
+        """
+        last = (since, "")
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT video_id, text, fetched_at FROM transcripts"
+                    " WHERE kind != 'none' AND version = ?"
+                    " AND (fetched_at > ? OR (fetched_at = ? AND video_id > ?))"
+                    " ORDER BY fetched_at, video_id LIMIT ?",
+                    (self.version, last[0], last[0], last[1], batch_size),
+                ).fetchall()
+            if not rows:
+                return
+            yield from rows
+            last = (rows[-1][2], rows[-1][0])
+
+    def _evict(self) -> None:
+        """合計サイズが max_bytes を超えていれば、最終参照が古い順に削除する"""
+        if self.max_bytes is None:
+            return
+        (total,) = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM transcripts"
+        ).fetchone()
+        if total <= self.max_bytes:
+            return
+        rows = self._conn.execute(
+            "SELECT rowid, size FROM transcripts ORDER BY last_access"
+        ).fetchall()
+        doomed = []
+        for rowid, size in rows:
+            if total <= self.max_bytes:
+                break
+            doomed.append((rowid,))
+            total -= size
+        self._conn.executemany("DELETE FROM transcripts WHERE rowid = ?", doomed)
+        self.stats["evicted"] += len(doomed)
+
+    def report(self) -> str:
+        """キャッシュのヒット/ミス集計を文字列で返す"""
+        lookups = self.stats["hits"] + self.stats["misses"]
+        hit_rate = self.stats["hits"] / lookups * 100 if lookups else 0.0
+        with self._lock:
+            count, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM transcripts"
+            ).fetchone()
+        return (
+            f"hits: {self.stats['hits']}, misses: {self.stats['misses']} "
+            f"(expired: {self.stats['expired']}), hit rate: {hit_rate:.1f}%, "
+            f"stored: {self.stats['stored']}, evicted: {self.stats['evicted']}, "
+            f"entries: {count}, size: {total / 1024 / 1024:.1f} MB"
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,113 @@
+import mmap
+import os
+import threading
+from pathlib import Path
+
+# コーパスはディレクトリ単位:
+#   corpus.bin : 字幕テキストを UTF-8 で連結しただけのファイル（追記のみ）
+#   index.tsv  : video_id<TAB>開始バイト<TAB>バイト長（同じ動画は後の行が優先）
+BLOB_FILE = "corpus.bin"
+INDEX_FILE = "index.tsv"
+
+
+class CorpusWriter:
+    """
+    字幕テキストをコーパスに追記する（スレッドセーフ）
+
+    本文を書いてから索引の行を書くので、途中で落ちても索引にある動画は必ず読める
+    """
+
+    def __init__(self, path: Path | str):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._blob = (self.path / BLOB_FILE).open("ab")
+        self._index = (self.path / INDEX_FILE).open("a", encoding="utf-8")
+
+    def add(self, video_id: str, text: str) -> None:
+        data = (text or "").encode("utf-8")
+        with self._lock:
+            offset = self._blob.tell()
+            self._blob.write(data)
+            self._blob.flush()
+            self._index.write(f"{video_id}\t{offset}\t{len(data)}\n")
+            self._index.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            self._blob.close()
+            self._index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class TranscriptCorpus:
+    """
+    コーパスをメモリマップして読む
+
+    view() は mmap 上のスライス（memoryview）を返すのでコピーが発生せず、
+    ページは実際に読んだ分だけ OS が読み込む。KeywordMatcher はこれを直接走査できる
+    """
+
+    def __init__(self, path: Path | str):
+        self.path = Path(path)
+        self._index = {}
+        index_path = self.path / INDEX_FILE
+        if index_path.exists():
+            with index_path.open("r", encoding="utf-8") as f:
+                for line in f:
+                    parts = line.rstrip("\n").split("\t")
+                    if len(parts) != 3:  # 書きかけの行
+                        continue
+                    video_id, offset, length = parts
+                    self._index[video_id] = (int(offset), int(length))
+
+        self._file = None
+        self._mmap = None
+        self._view = memoryview(b"")
+        blob_path = self.path / BLOB_FILE
+        if blob_path.exists() and os.path.getsize(blob_path):
+            self._file = blob_path.open("rb")
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._view = memoryview(self._mmap)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, video_id: str) -> bool:
+        return video_id in self._index
+
+    def video_ids(self) -> list[str]:
+        return list(self._index)
+
+    def view(self, video_id: str) -> memoryview | None:
+        """字幕の UTF-8 バイト列（コピーなし）。コーパスに無ければ None"""
+        entry = self._index.get(video_id)
+        if entry is None:
+            return None
+        offset, length = entry
+        return self._view[offset : offset + length]
+
+    def text(self, video_id: str) -> str | None:
+        """字幕を str として読む（こちらはコピーが発生する）"""
+        view = self.view(video_id)
+        return None if view is None else str(view, "utf-8")
+
+    def close(self) -> None:
+        """view() で得たスライスが残っていると BufferError になるので、先に破棄しておく"""
+        self._view.release()
+        if self._mmap is not None:
+            self._mmap.close()
+            self._file.close()
+        self._mmap = None
+        self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,454 @@
+import argparse
+import itertools
+import os
+import sqlite3
+import threading
+from collections.abc import Iterator
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+
+from fetch_transcripts import open_transcript_cache
+from transcript_cache import TranscriptCache
+
+load_dotenv()
+# 字幕の転置インデックス（空欄で無効）
+TRANSCRIPT_INDEX = os.getenv("TRANSCRIPT_INDEX", "cache/transcript_index.sqlite3").strip()
+
+# 索引に書き込む前にメモリに溜める字幕の本数（1 回の書き込みが 1 つのセグメントになる）
+FLUSH_DOCS = 500
+# 同じ段のセグメントがこの数だけ溜まったら 1 つにまとめて次の段にする
+MERGE_FACTOR = 8
+# 削除した文書がこの割合（生きている文書に対して）を超えたら全セグメントをまとめる
+COMPACT_DEAD_RATIO = 0.25
+# 索引の形式（変えたら上げる。形式が違う索引は作り直す）
+INDEX_FORMAT = 2
+
+
+def doc_grams(text: str) -> tuple[np.ndarray, ...]:
+    """
+    字幕 1 本の n-gram を文字コードのキーにして返す（日本語は分かち書きしないので文字単位）
+    (1-gram のキー, 出現回数, 2-gram のキー, 出現回数, 2-gram ごとにまとめた出現位置)
+    2-gram のキーは 2 文字の文字コードを上位・下位 32 ビットに並べたもの
+    """
+    codes = np.frombuffer(
+        text.encode("utf-32-le", errors="surrogatepass"), dtype=np.uint32
+    ).astype(np.uint64)
+    unigrams, unigram_counts = np.unique(codes, return_counts=True)
+    keys = (codes[:-1] << np.uint64(32)) | codes[1:]
+    order = np.argsort(keys, kind="stable")  # 同じ 2-gram の中では位置の昇順
+    bigrams, bigram_counts = np.unique(keys[order], return_counts=True)
+    return (
+        unigrams,
+        unigram_counts.astype(np.uint32),
+        bigrams,
+        bigram_counts.astype(np.uint32),
+        order.astype(np.uint32),
+    )
+
+
+def _gram(key: int, bigram: bool) -> str:
+    return chr(key >> 32) + chr(key & 0xFFFFFFFF) if bigram else chr(key)
+
+
+def _grouped(
+    keys: np.ndarray, doc_ids: np.ndarray, counts: np.ndarray, starts: np.ndarray | None
+) -> Iterator[tuple]:
+    """
+    文書ごとに並んだ (キー, 文書番号, 出現回数) をキーごとにまとめ、
+    (キー, 文書番号の配列, 出現回数の配列, 出現位置の範囲) を返す
+    starts は各行の出現位置が positions のどこから始まるか（1-gram は None）
+    """
+    if not len(keys):
+        return
+    order = np.argsort(keys, kind="stable")  # 同じキーの中では文書番号の昇順
+    keys, doc_ids, counts = keys[order], doc_ids[order], counts[order]
+    gather = None
+    if starts is not None:
+        # 並べ替えた行の順に出現位置を集める添字（行ごとの [start, start + count) をつなげる）
+        lengths = counts.astype(np.int64)
+        first = np.cumsum(lengths) - lengths
+        gather = np.repeat(starts[order] - first, lengths) + np.arange(lengths.sum())
+        ends = np.cumsum(lengths)
+    bounds = np.flatnonzero(np.diff(keys)) + 1
+    for begin, end in zip(
+        np.concatenate([[0], bounds]).tolist(), np.concatenate([bounds, [len(keys)]]).tolist()
+    ):
+        span = None
+        if gather is not None:
+            span = gather[(ends[begin] - counts[begin]) : ends[end - 1]]
+        yield int(keys[begin]), doc_ids[begin:end], counts[begin:end], span
+
+
+def count_non_overlapping(starts: np.ndarray, length: int) -> int:
+    """昇順の一致位置から、重ならないものを先頭から数える（str.count と同じ数え方）"""
+    count = 0
+    end = -1
+    for start in starts.tolist():
+        if start >= end:
+            count += 1
+            end = start + length
+    return count
+
+
+def _uint32(blob: bytes | None) -> np.ndarray:
+    return np.frombuffer(blob or b"", dtype=np.uint32)
+
+
+class TranscriptIndex:
+    """
+    字幕キャッシュ（TranscriptCache）の文字 n-gram 転置インデックス（SQLite）
+
+    update() で追加した字幕はセグメント（FLUSH_DOCS 本ごと）として追記し、既存の行は
+    書き直さない。セグメントには n-gram ごとに文書番号・出現回数（uint32 配列）と、
+    2 文字の n-gram なら出現位置を持つ。同じ段のセグメントが MERGE_FACTOR 個溜まったら
+    1 つにまとめ、そのとき削除済みの文書を取り除く
+
+    検索語の 2-gram を全て含む文書を候補とし、各 2-gram の位置が 1 文字ずつずれて
+    並ぶ箇所を一致として数える（str.count と同じ数え方）ので、本文は読まない
+    再取得された動画・キャッシュから消えた動画は文書を削除し、検索結果に含めない
+    """
+
+    def __init__(self, path: Path | str):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        (version,) = self._conn.execute("PRAGMA user_version").fetchone()
+        if version != INDEX_FORMAT:
+            # 古い形式（n-gram ごとに 1 つの文書番号配列を書き直す postings）は作り直す
+            self._conn.executescript(
+                """
+                DROP TABLE IF EXISTS docs;
+                DROP TABLE IF EXISTS segments;
+                DROP TABLE IF EXISTS postings;
+                DROP TABLE IF EXISTS meta;
+                """
+            )
+        self._conn.executescript(
+            f"""
+            CREATE TABLE IF NOT EXISTS docs (
+                doc_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                video_id TEXT NOT NULL UNIQUE,
+                fetched_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS segments (
+                segment INTEGER PRIMARY KEY AUTOINCREMENT,
+                level INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS postings (
+                segment INTEGER NOT NULL,
+                gram TEXT NOT NULL,
+                doc_ids BLOB NOT NULL,
+                counts BLOB NOT NULL,
+                positions BLOB,
+                PRIMARY KEY (segment, gram)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS idx_postings_gram ON postings(gram);
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+            PRAGMA user_version = {INDEX_FORMAT};
+            """
+        )
+        self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+
+    def _meta(self) -> dict[str, str]:
+        return dict(self._conn.execute("SELECT key, value FROM meta").fetchall())
+
+    def _set_meta(self, **values) -> None:
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO meta VALUES (?, ?)",
+            [(k, str(v)) for k, v in values.items()],
+        )
+
+    def _remove(self, video_ids: list[str]) -> None:
+        """文書を削除する（postings からはセグメントをまとめるときに取り除く）"""
+        removed = 0
+        for video_id in video_ids:
+            removed += self._conn.execute(
+                "DELETE FROM docs WHERE video_id = ?", (video_id,)
+            ).rowcount
+        if removed:
+            self._set_meta(dead=int(self._meta().get("dead", 0)) + removed)
+
+    def update(self, cache: TranscriptCache) -> int:
+        """前回の更新以降にキャッシュに保存された字幕を索引に追加し、追加した本数を返す"""
+        with self._lock:
+            # キャッシュから消えた（削除・版違いの）動画を除く
+            cached = cache.video_ids()
+            self._remove(
+                [v for (v,) in self._conn.execute("SELECT video_id FROM docs") if v not in cached]
+            )
+            meta = self._meta()
+            since, last_video_id = float(meta.get("fetched_at", 0.0)), meta.get("video_id", "")
+            pending = []
+            added = 0
+            last = None
+            for video_id, text, fetched_at in cache.iter_texts(since):
+                if fetched_at == since and video_id <= last_video_id:
+                    continue  # 前回の最後と同時刻に保存された分は索引済み
+                self._remove([video_id])  # 再取得された動画は登録し直す
+                doc_id = self._conn.execute(
+                    "INSERT INTO docs (video_id, fetched_at) VALUES (?, ?)",
+                    (video_id, fetched_at),
+                ).lastrowid
+                pending.append((doc_id, *doc_grams(text)))
+                added += 1
+                last = (fetched_at, video_id)
+                if added % FLUSH_DOCS == 0:
+                    self._flush(pending, last)
+                    pending = []
+            if pending:
+                self._flush(pending, last)
+
+            meta = self._meta()
+            dead, live = int(meta.get("dead", 0)), self._conn.execute(
+                "SELECT COUNT(*) FROM docs"
+            ).fetchone()[0]
+            if dead and dead > COMPACT_DEAD_RATIO * live:
+                segments = self._conn.execute(
+                    "SELECT segment, level FROM segments ORDER BY segment"
+                ).fetchall()
+                self._merge(
+                    [s for s, _ in segments], max((lv for _, lv in segments), default=0)
+                )
+                self._set_meta(dead=0)
+            self._conn.commit()
+            return added
+
+    def _flush(self, pending: list[tuple], last: tuple[float, str]) -> None:
+        """
+        溜めた字幕（文書番号と doc_grams() の結果）を新しいセグメントとして追記し、
+        溜まったセグメントをまとめる
+        """
+        segment = self._conn.execute("INSERT INTO segments (level) VALUES (0)").lastrowid
+        doc_ids = [np.full(len(p[1]), p[0], dtype=np.uint32) for p in pending]
+        unigrams = _grouped(
+            np.concatenate([p[1] for p in pending]),
+            np.concatenate(doc_ids),
+            np.concatenate([p[2] for p in pending]),
+            None,
+        )
+        # 2-gram の行ごとの出現位置は、文書ごとの positions をつなげた配列の中の位置
+        doc_ids = [np.full(len(p[3]), p[0], dtype=np.uint32) for p in pending]
+        counts = np.concatenate([p[4] for p in pending])
+        positions = np.concatenate([p[5] for p in pending])
+        bigrams = _grouped(
+            np.concatenate([p[3] for p in pending]),
+            np.concatenate(doc_ids),
+            counts,
+            np.cumsum(counts, dtype=np.int64) - counts,
+        )
+        self._conn.executemany(
+            "INSERT INTO postings VALUES (?, ?, ?, ?, ?)",
+            [
+                (segment, _gram(key, False), ids.tobytes(), n.tobytes(), None)
+                for key, ids, n, _ in unigrams
+            ],
+        )
+        self._conn.executemany(
+            "INSERT INTO postings VALUES (?, ?, ?, ?, ?)",
+            [
+                (segment, _gram(key, True), ids.tobytes(), n.tobytes(), positions[span].tobytes())
+                for key, ids, n, span in bigrams
+            ],
+        )
+        self._set_meta(fetched_at=repr(last[0]), video_id=last[1])
+
+        level = 0
+        while True:
+            segments = [
+                r[0]
+                for r in self._conn.execute(
+                    "SELECT segment FROM segments WHERE level = ? ORDER BY segment", (level,)
+                )
+            ]
+            if len(segments) < MERGE_FACTOR:
+                break
+            level += 1
+            self._merge(segments, level)
+        self._conn.commit()
+
+    def _merge(self, segments: list[int], level: int) -> None:
+        """segments を level の 1 つのセグメントにまとめる（削除済みの文書はここで除く）"""
+        if not segments:
+            return
+        live_ids = np.array(
+            [r[0] for r in self._conn.execute("SELECT doc_id FROM docs")], dtype=np.int64
+        )
+        live = np.zeros(int(live_ids.max(initial=0)) + 1, dtype=bool)
+        live[live_ids] = True
+
+        merged = self._conn.execute(
+            "INSERT INTO segments (level) VALUES (?)", (level,)
+        ).lastrowid
+        placeholders = ",".join("?" * len(segments))
+        # ORDER BY は結果を並べ替えてから返すので、読みながら新しい行を書いてよい
+        rows = self._conn.execute(
+            "SELECT gram, doc_ids, counts, positions FROM postings"
+            f" WHERE segment IN ({placeholders}) ORDER BY gram, segment",
+            segments,
+        )
+        out = []
+        for gram, group in itertools.groupby(rows, key=lambda r: r[0]):
+            group = list(group)
+            doc_ids = np.concatenate([_uint32(r[1]) for r in group])
+            counts = np.concatenate([_uint32(r[2]) for r in group])
+            keep = np.zeros(len(doc_ids), dtype=bool)
+            known = doc_ids < len(live)
+            keep[known] = live[doc_ids[known]]
+            if not keep.any():
+                continue
+            positions = None
+            if group[0][3] is not None:
+                all_positions = np.concatenate([_uint32(r[3]) for r in group])
+                positions = all_positions[np.repeat(keep, counts)].tobytes()
+            out.append(
+                (merged, gram, doc_ids[keep].tobytes(), counts[keep].tobytes(), positions)
+            )
+        self._conn.executemany("INSERT INTO postings VALUES (?, ?, ?, ?, ?)", out)
+        self._conn.execute(f"DELETE FROM postings WHERE segment IN ({placeholders})", segments)
+        self._conn.execute(f"DELETE FROM segments WHERE segment IN ({placeholders})", segments)
+
+    def _postings(self, gram: str) -> tuple[np.ndarray, np.ndarray, np.ndarray] | None:
+        """gram の (文書番号, 出現回数, 出現位置) を全セグメント分つなげて返す"""
+        rows = self._conn.execute(
+            "SELECT doc_ids, counts, positions FROM postings WHERE gram = ?", (gram,)
+        ).fetchall()
+        if not rows:
+            return None
+        return tuple(np.concatenate([_uint32(r[i]) for r in rows]) for i in range(3))
+
+    def _count_phrase(self, term: str) -> dict[int, int]:
+        """2 文字以上の検索語の、文書番号 → 出現回数"""
+        grams = [term[i : i + 2] for i in range(len(term) - 1)]
+
+        # 1. 検索語の 2-gram を全て含む文書を候補にする
+        postings = {}
+        candidates = None
+        for gram in dict.fromkeys(grams):
+            postings[gram] = self._postings(gram)
+            if postings[gram] is None:
+                return {}
+            doc_ids = postings[gram][0]
+            candidates = (
+                doc_ids if candidates is None else np.intersect1d(candidates, doc_ids)
+            )
+            if not len(candidates):
+                return {}
+
+        # 2. 候補ごとの出現位置の範囲（各 2-gram の配列の中での [start, end)）
+        spans = {}
+        for gram, (doc_ids, counts, _) in postings.items():
+            ends = np.cumsum(counts, dtype=np.int64)
+            order = np.argsort(doc_ids, kind="stable")
+            i = order[np.searchsorted(doc_ids, candidates, sorter=order)]
+            spans[gram] = (ends[i] - counts[i], ends[i])
+
+        # 3. i 番目の 2-gram が先頭の 2-gram の i 文字後ろにある位置を一致とする
+        counts = {}
+        for k, doc_id in enumerate(candidates.tolist()):
+            starts = None
+            for i, gram in enumerate(grams):
+                begin, end = spans[gram][0][k], spans[gram][1][k]
+                at = postings[gram][2][begin:end].astype(np.int64) - i
+                starts = at if starts is None else np.intersect1d(starts, at)
+                if not len(starts):
+                    break
+            count = count_non_overlapping(starts, len(term))
+            if count:
+                counts[doc_id] = count
+        return counts
+
+    def query(self, term: str) -> pd.DataFrame:
+        """
+        検索語を含む動画と出現回数を、回数の多い順に返す（字幕本文は読まない）
+
+        Returns:
+            video_id, count を列に持つ DataFrame
+        """
+        if not term:
+            raise ValueError("Search term must not be empty.")
+        with self._lock:
+            if len(term) == 1:
+                postings = self._postings(term)
+                counts = (
+                    {}
+                    if postings is None
+                    else dict(zip(postings[0].tolist(), postings[1].tolist()))
+                )
+            else:
+                counts = self._count_phrase(term)
+
+            # 削除済みの文書は docs に無いので、ここで落ちる
+            rows = []
+            doc_ids = list(counts)
+            for i in range(0, len(doc_ids), 500):
+                chunk = doc_ids[i : i + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows += [
+                    (video_id, counts[doc_id])
+                    for doc_id, video_id in self._conn.execute(
+                        f"SELECT doc_id, video_id FROM docs WHERE doc_id IN ({placeholders})",
+                        chunk,
+                    )
+                ]
+        df = pd.DataFrame(rows, columns=["video_id", "count"])
+        return df.sort_values(
+            ["count", "video_id"], ascending=[False, True], ignore_index=True
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def open_transcript_index() -> TranscriptIndex | None:
+    """設定値（TRANSCRIPT_INDEX）で索引を開く（空欄なら None）"""
+    return TranscriptIndex(TRANSCRIPT_INDEX) if TRANSCRIPT_INDEX else None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Search cached transcripts through a character n-gram index"
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("update", help="add transcripts cached since the last update")
+    query = sub.add_parser("query", help="list videos containing each term")
+    query.add_argument("terms", nargs="+", help="substrings to search for")
+    query.add_argument("--top", type=int, default=20, help="rows shown per term")
+    query.add_argument(
+        "--no-update", action="store_true", help="do not index new transcripts first"
+    )
+    args = parser.parse_args()
+
+    if not TRANSCRIPT_INDEX:
+        parser.error("TRANSCRIPT_INDEX is empty (the index is disabled).")
+    index = TranscriptIndex(TRANSCRIPT_INDEX)
+    cache = open_transcript_cache()
+    try:
+        if args.command == "update" or not args.no_update:
+            added = index.update(cache)
+            print(f"Indexed {added} new transcripts ({len(index)} in total).")
+        if args.command == "query":
+            for term in args.terms:
+                result = index.query(term)
+                print(f"\n[{term}] {len(result)} videos, {result['count'].sum()} hits")
+                if not result.empty:
+                    print(result.head(args.top).to_string(index=False))
+    finally:
+        index.close()
+        cache.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+QUEUE_FILE = "queue.sqlite3"
+RESULTS_DIR = "results"
+
+
+class WorkQueue:
+    """
+    複数のワーカープロセス（別のホストを含む）で分担するための永続的な作業キュー（SQLite）
+
+    タスクは (kind, key) で一意で、同じタスクを何度 put しても 1 つだけになる
+    claim() したタスクには lease_sec 秒のリース（貸し出し期限）が付き、期限までに
+    complete() されなかったタスク（ワーカーが落ちた場合など）は別のワーカーが取り直す
+    取り直しが max_attempts 回に達したタスク・fail() が続いたタスクは failed になる
+    タスクの結果は results/{id}.jsonl に書く（書いてから置き換えるので、途中の結果は読まれない）
+
+    ディレクトリを複数のホストで共有できるよう、WAL（同じホストの共有メモリが必要）は使わない
+    """
+
+    def __init__(self, directory: Path | str, lease_sec: float = 600, max_attempts: int = 3):
+        self.directory = Path(directory)
+        self.path = self.directory / QUEUE_FILE
+        self.results_dir = self.directory / RESULTS_DIR
+        self.results_dir.mkdir(parents=True, exist_ok=True)
+        self.lease_sec = lease_sec
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        # トランザクションは BEGIN IMMEDIATE で明示的に始める（取り合いは書き込みロックで決まる）
+        self._conn = sqlite3.connect(
+            self.path,
+            timeout=60,
+            isolation_level=None,
+            check_same_thread=False,
+        )
+        self._conn.execute("PRAGMA journal_mode=DELETE")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS tasks (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL,
+                key TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                priority INTEGER NOT NULL DEFAULT 0,
+                status TEXT NOT NULL DEFAULT 'pending',
+                worker TEXT,
+                lease_until REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                updated_at REAL NOT NULL,
+                UNIQUE (kind, key)
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_claim ON tasks(status, priority, id)"
+        )
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    @staticmethod
+    def _task(row: tuple) -> dict:
+        task_id, kind, key, payload, worker, attempts = row
+        return {
+            "id": task_id,
+            "kind": kind,
+            "key": key,
+            "payload": json.loads(payload),
+            "worker": worker,
+            "attempts": attempts,
+        }
+
+    # --- タスクの登録・取得 ---
+
+    def put_many(self, kind: str, items: list[tuple[str, dict]], priority: int = 0) -> int:
+        """(key, payload) のタスクを登録する（登録済みの key は無視）。追加した数を返す"""
+        now = time.time()
+        with self._transaction() as conn:
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO tasks (kind, key, payload, priority, updated_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                [
+                    (kind, key, json.dumps(payload, ensure_ascii=False), priority, now)
+                    for key, payload in items
+                ],
+            )
+            return conn.total_changes - before
+
+    def put(self, kind: str, key: str, payload: dict, priority: int = 0) -> bool:
+        return self.put_many(kind, [(key, payload)], priority) == 1
+
+    def claim(self, worker: str) -> dict | None:
+        """
+        次のタスク（priority が小さい順、同じなら登録順）を worker に貸し出す
+        リースの切れたタスクも対象。取れるタスクが無ければ None
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            # 何度もリースが切れた（ワーカーを落とし続ける）タスクは諦める
+            conn.execute(
+                "UPDATE tasks SET status = 'failed', worker = NULL,"
+                " error = COALESCE(error, 'lease expired'), updated_at = ?"
+                " WHERE status = 'leased' AND lease_until < ? AND attempts >= ?",
+                (now, now, self.max_attempts),
+            )
+            row = conn.execute(
+                "SELECT id, kind, key, payload, worker, attempts FROM tasks"
+                " WHERE status = 'pending' OR (status = 'leased' AND lease_until < ?)"
+                " ORDER BY priority, id LIMIT 1",
+                (now,),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE tasks SET status = 'leased', worker = ?, lease_until = ?,"
+                " attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                (worker, now + self.lease_sec, now, row[0]),
+            )
+        task = self._task(row)
+        task["worker"] = worker
+        task["attempts"] += 1
+        return task
+
+    def renew(self, task: dict) -> bool:
+        """リースを延長する。既に別のワーカーに取り直されていれば False"""
+        now = time.time()
+        with self._transaction() as conn:
+            changed = conn.execute(
+                "UPDATE tasks SET lease_until = ?, updated_at = ?"
+                " WHERE id = ? AND worker = ? AND status = 'leased'",
+                (now + self.lease_sec, now, task["id"], task["worker"]),
+            ).rowcount
+        return changed == 1
+
+    @contextmanager
+    def hold(self, task: dict):
+        """with の間、別スレッドでリースを定期的に延長する（長いタスクが取り直されないように）"""
+        stop = threading.Event()
+
+        def keep_alive():
+            while not stop.wait(self.lease_sec / 3):
+                if not self.renew(task):
+                    print(f"  Lost the lease on task {task['id']} ({task['kind']}).")
+                    return
+
+        thread = threading.Thread(target=keep_alive, daemon=True)
+        thread.start()
+        try:
+            yield task
+        finally:
+            stop.set()
+            thread.join()
+
+    # --- 結果 ---
+
+    def complete(self, task: dict) -> bool:
+        """
+        タスクを完了にする。リースが切れて別のワーカーが取り直していたら何もせず False を返す
+        （完了にするのは今リースを持っているワーカー）
+        """
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE tasks SET status = 'done', lease_until = NULL,"
+                " error = NULL, updated_at = ?"
+                " WHERE id = ? AND worker = ? AND status = 'leased'",
+                (time.time(), task["id"], task["worker"]),
+            )
+            return cursor.rowcount == 1
+
+    def release(self, task: dict) -> None:
+        """実行せずに返す（試行回数に数えない。API の割り当て切れなど）"""
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE tasks SET status = 'pending', worker = NULL, lease_until = NULL,"
+                " attempts = MAX(attempts - 1, 0), updated_at = ?"
+                " WHERE id = ? AND worker = ? AND status = 'leased'",
+                (time.time(), task["id"], task["worker"]),
+            )
+
+    def fail(self, task: dict, error: str) -> bool:
+        """失敗を記録して再実行待ちに戻す。試行回数が上限なら failed にして True を返す"""
+        failed = task["attempts"] >= self.max_attempts
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE tasks SET status = ?, worker = NULL, lease_until = NULL,"
+                " error = ?, updated_at = ?"
+                " WHERE id = ? AND worker = ? AND status = 'leased'",
+                (
+                    "failed" if failed else "pending",
+                    error,
+                    time.time(),
+                    task["id"],
+                    task["worker"],
+                ),
+            )
+        return failed
+
+    def write_result(self, task: dict, rows: list[dict]) -> Path:
+        """タスクの結果行を results/{id}.jsonl に書く（同じタスクを再実行したら上書き）"""
+        path = self.results_dir / f"{task['id']}.jsonl"
+        tmp = path.with_name(f"{path.name}.{task['worker']}.tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            for row in rows:
+                f.write(json.dumps(row, ensure_ascii=False, default=str) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+        return path
+
+    def read_result(self, task: dict) -> list[dict]:
+        path = self.results_dir / f"{task['id']}.jsonl"
+        with path.open(encoding="utf-8") as f:
+            return [json.loads(line) for line in f]
+
+    # --- 状態 ---
+
+    def tasks(self, kind: str | None = None, status: str | None = None) -> list[dict]:
+        """タスクの一覧（登録順）"""
+        query = "SELECT id, kind, key, payload, worker, attempts FROM tasks WHERE 1 = 1"
+        params = []
+        if kind is not None:
+            query += " AND kind = ?"
+            params.append(kind)
+        if status is not None:
+            query += " AND status = ?"
+            params.append(status)
+        with self._lock:
+            rows = self._conn.execute(query + " ORDER BY id", params).fetchall()
+        return [self._task(row) for row in rows]
+
+    def errors(self) -> list[tuple[str, str, str]]:
+        """失敗したタスクの (kind, key, error)"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT kind, key, error FROM tasks WHERE status = 'failed' ORDER BY id"
+            ).fetchall()
+
+    def counts(self) -> dict[str, dict[str, int]]:
+        """kind ごとの状態別のタスク数"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT kind, status, COUNT(*) FROM tasks GROUP BY kind, status"
+            ).fetchall()
+        counts = {}
+        for kind, status, n in rows:
+            counts.setdefault(kind, {})[status] = n
+        return counts
+
+    def unfinished(self) -> int:
+        """実行待ち・実行中のタスク数"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM tasks WHERE status IN ('pending', 'leased')"
+            ).fetchone()[0]
+
+    def report(self) -> str:
+        return ", ".join(
+            f"{kind}: " + " / ".join(f"{n} {status}" for status, n in sorted(statuses.items()))
+            for kind, statuses in sorted(self.counts().items())
+        ) or "empty"
+
+    def clear(self) -> None:
+        """全タスクと結果を削除する（新しいクロールを始めるとき）"""
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM tasks")
+        shutil.rmtree(self.results_dir, ignore_errors=True)
+        self.results_dir.mkdir(parents=True, exist_ok=True)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -1,63 +1,428 @@
 import os
+import json
+import time
+import atexit
+import threading
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 from dotenv import load_dotenv
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import pandas as pd
 import isodate
-import time
-import random
+
+import metrics
+from api_cache import ResponseCache
+from crawl_state import CrawlState
+from quota import QuotaBudget, QuotaExceededError
+from throttle import AdaptiveLimiter, CircuitOpenError
 
 VIDEO_IDS = ["SyibOFcjCHk"]
 
 load_dotenv()
-API_KEY = os.environ["YOUTUBE_API_KEY"]
+# checked by require_api_key() when a command needs the API, not on import,
+# so commands that only work on local data run without a key
+API_KEY = os.getenv("YOUTUBE_API_KEY", "").strip()
 SUBTITLE_LANGS = os.getenv("SUBTITLE_LANGS", "ja")  # default to Japanese
 DEBUG = os.getenv("DEBUG", "False") == "True"
+# number of concurrent API requests / 同時に送るAPIリクエスト数
+API_MAX_WORKERS = int(os.getenv("API_MAX_WORKERS", "8"))
+API_TIMEOUT = float(os.getenv("API_TIMEOUT", "10"))  # seconds
+# times a throttled request (429, 403 rateLimitExceeded) is sent again after backing off
+API_RETRIES = int(os.getenv("API_RETRIES", "5"))
+# concurrency is lowered while responses take longer than this (seconds)
+API_TARGET_LATENCY = float(os.getenv("API_TARGET_LATENCY", "3"))
+# API root; point it at a local stand-in for offline runs (see benchmarks/)
+YOUTUBE_API_BASE_URL = os.getenv(
+    "YOUTUBE_API_BASE_URL", "https://www.googleapis.com/youtube/v3"
+).strip().rstrip("/")
+
+# on-disk response cache (empty to disable) and TTL per kind of request, in seconds
+API_CACHE = os.getenv("API_CACHE", "cache/api_responses.sqlite3").strip()
+API_CACHE_TTLS = {
+    # videos?part=statistics changes all the time
+    "statistics": float(os.getenv("API_CACHE_TTL_STATISTICS", "3600")),
+    # playlistItems: new uploads appear on the first page
+    "playlistItems": float(os.getenv("API_CACHE_TTL_PLAYLIST", "3600")),
+    # channel lookups (snippet) and contentDetails rarely change
+    "static": float(os.getenv("API_CACHE_TTL_STATIC", str(30 * 24 * 3600))),
+}
+# size cap of the response cache (least recently used entries go first) and how long
+# an entry may stay unused before it is pruned when the cache is opened
+API_CACHE_MAX_MB = float(os.getenv("API_CACHE_MAX_MB", "256"))
+API_CACHE_MAX_AGE_DAYS = float(os.getenv("API_CACHE_MAX_AGE_DAYS", "60"))
+
+# daily quota of the API project (units) and where today's usage is kept
+YOUTUBE_DAILY_QUOTA = int(os.getenv("YOUTUBE_DAILY_QUOTA", "10000"))
+QUOTA_STATE = os.getenv("QUOTA_STATE", "state/quota.json").strip()
+
+
+def require_api_key() -> str:
+    """Return the API key, or raise ValueError when YOUTUBE_API_KEY is not set"""
+    if not API_KEY:
+        raise ValueError("YOUTUBE_API_KEY is not set. Please check your .env file.")
+    if DEBUG:
+        print(f"API Key loaded: {API_KEY[:10]}...")
+    return API_KEY
+
+
+# columns of the DataFrame returned by get_video_details
+VIDEO_DETAIL_COLUMNS = [
+    "video_id",
+    "title",
+    "date",
+    "views",
+    "duration",
+    "likes",
+    "comments",
+    "URL",
+    "channel_id",
+    "channel_title",
+]
+
+_session: requests.Session | None = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """Shared keep-alive session; the connection pool is sized for API_MAX_WORKERS"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            retry = Retry(
+                total=3,
+                backoff_factor=0.5,
+                status_forcelist=(500, 502, 503, 504),
+                allowed_methods=("GET",),
+            )
+            adapter = HTTPAdapter(
+                pool_connections=4, pool_maxsize=API_MAX_WORKERS, max_retries=retry
+            )
+            session = requests.Session()
+            # Google APIs only compress when both headers ask for gzip
+            session.headers["Accept-Encoding"] = "gzip"
+            session.headers["User-Agent"] = (
+                f"{session.headers['User-Agent']} YTchannel-analyzer (gzip)"
+            )
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+    return _session
+
+
+_response_cache: ResponseCache | None = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache | None:
+    """Shared on-disk response cache (None when API_CACHE is empty)"""
+    global _response_cache
+    with _response_cache_lock:
+        if _response_cache is None and API_CACHE:
+            _response_cache = ResponseCache(
+                API_CACHE,
+                max_bytes=int(API_CACHE_MAX_MB * 1024 * 1024),
+                max_age_sec=API_CACHE_MAX_AGE_DAYS * 24 * 3600,
+            )
+    return _response_cache
+
+
+def close_response_cache() -> None:
+    """Close the shared response cache; the next get_response_cache() reopens it"""
+    global _response_cache
+    with _response_cache_lock:
+        if _response_cache is not None:
+            _response_cache.close()
+            _response_cache = None
+
+
+_quota_budget: QuotaBudget | None = None
+_quota_budget_lock = threading.Lock()
+
+
+def get_quota_budget() -> QuotaBudget:
+    """Shared quota budget; every request that reaches the API is charged to it"""
+    global _quota_budget
+    with _quota_budget_lock:
+        if _quota_budget is None:
+            _quota_budget = QuotaBudget(YOUTUBE_DAILY_QUOTA, QUOTA_STATE or None)
+            # keep today's usage even when the run is interrupted
+            atexit.register(_quota_budget.save)
+    return _quota_budget
+
+
+def use_quota_ledger(path: Path | str) -> QuotaBudget:
+    """Count usage in a SQLite ledger shared by several processes (e.g. queue workers)
+
+    Call it before the first request; usage charged to the previous budget is saved first.
+    """
+    global _quota_budget
+    with _quota_budget_lock:
+        if _quota_budget is None or _quota_budget.ledger != Path(path):
+            if _quota_budget is not None:
+                _quota_budget.save()
+            _quota_budget = QuotaBudget(YOUTUBE_DAILY_QUOTA, QUOTA_STATE or None, ledger=path)
+            atexit.register(_quota_budget.save)
+    return _quota_budget
+
+
+_api_limiter: AdaptiveLimiter | None = None
+_api_limiter_lock = threading.Lock()
+
+
+def get_api_limiter() -> AdaptiveLimiter:
+    """Shared controller of concurrent API requests (up to API_MAX_WORKERS)"""
+    global _api_limiter
+    with _api_limiter_lock:
+        if _api_limiter is None:
+            _api_limiter = AdaptiveLimiter(
+                "api", API_MAX_WORKERS, target_latency=API_TARGET_LATENCY or None
+            )
+    return _api_limiter
+
+
+# 403 reasons that mean "slow down"; quotaExceeded / dailyLimitExceeded are not retried
+THROTTLE_REASONS = {"rateLimitExceeded", "userRateLimitExceeded"}
+
+
+def is_throttled(resp: requests.Response) -> bool:
+    """True for 429 and for 403 responses whose reason is a rate limit"""
+    if resp.status_code == 429:
+        return True
+    if resp.status_code != 403:
+        return False
+    try:
+        errors = resp.json()["error"].get("errors") or []
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return False
+    return any(e.get("reason") in THROTTLE_REASONS for e in errors)
+
+
+def _retry_after(resp: requests.Response) -> float:
+    try:
+        return float(resp.headers.get("Retry-After", 0))
+    except ValueError:  # an HTTP date; the exponential backoff applies instead
+        return 0.0
+
+
+def cache_ttl(base_url: str, params: dict) -> float:
+    """TTL of a cached response: short for statistics and playlist pages, long otherwise"""
+    if base_url.endswith("/playlistItems"):
+        return API_CACHE_TTLS["playlistItems"]
+    if "statistics" in params.get("part", ""):
+        return API_CACHE_TTLS["statistics"]
+    return API_CACHE_TTLS["static"]
+
+
+def _send(base_url: str, params: dict, operation: str, headers=None):
+    """Send one request, charging it to the quota budget (raises QuotaExceededError)
+
+    Requests go through the shared adaptive limiter; a throttled response is sent
+    again after the limiter's backoff, up to API_RETRIES times, and the last
+    response is returned as is. Raises throttle.CircuitOpenError when the API
+    keeps throttling after the limiter's cooldowns.
+    """
+    limiter = get_api_limiter()
+    for attempt in range(API_RETRIES + 1):
+        with limiter.slot() as slot:
+            resp = _send_once(base_url, params, operation, headers)
+            if is_throttled(resp):
+                slot.throttled(_retry_after(resp))
+        if slot.outcome != "throttled" or attempt == API_RETRIES:
+            return resp
+        metrics.inc("api_throttled_retries", operation=operation)
+
+
+def _send_once(base_url: str, params: dict, operation: str, headers=None):
+    """Send one request without retrying on throttling
+
+    Latency, status, bytes received and urllib3 retries are recorded in metrics.
+    """
+    # a 304 still costs the units of the method, so charge before the status check
+    get_quota_budget().reserve(operation)
+    start = time.perf_counter()
+    try:
+        resp = get_session().get(
+            base_url, params=params, headers=headers, timeout=API_TIMEOUT
+        )
+    except requests.exceptions.RequestException:
+        metrics.inc("api_requests", operation=operation, status="error")
+        raise
+    metrics.observe(
+        "api_request_seconds", time.perf_counter() - start, operation=operation
+    )
+    metrics.inc("api_requests", operation=operation, status=resp.status_code)
+    # bytes on the wire (compressed when gzipped); chunked responses fall back to the body
+    received = resp.headers.get("Content-Length")
+    metrics.inc(
+        "api_bytes",
+        int(received) if received else len(resp.content),
+        operation=operation,
+    )
+    retries = getattr(resp.raw, "retries", None)
+    if retries is not None and retries.history:
+        metrics.inc("api_retries", len(retries.history), operation=operation)
+    return resp
+
+
+def _get_json(
+    base_url: str, params: dict, operation: str = "other", revalidate: bool = False
+) -> dict:
+    """GET request through the shared session; raises requests.HTTPError on failure
+
+    Responses are kept in the response cache: within the TTL no request is sent,
+    after it the request carries If-None-Match and a 304 reuses the cached body.
+    With revalidate=True the request is always sent (still with If-None-Match).
+    Requests actually sent are charged to the quota budget under `operation`.
+    """
+    cache = get_response_cache()
+    if cache is None:
+        resp = _send(base_url, params, operation)
+        resp.raise_for_status()
+        return resp.json()
+
+    key = cache.make_key(base_url, params)
+    entry = cache.get(key)
+    if (
+        not revalidate
+        and entry is not None
+        and entry["age"] < cache_ttl(base_url, params)
+    ):
+        cache.record("fresh")
+        metrics.inc("api_cache", result="fresh")
+        return json.loads(entry["body"])
+
+    headers = {}
+    if entry is not None and entry["etag"]:
+        headers["If-None-Match"] = entry["etag"]
+    resp = _send(base_url, params, operation, headers)
+    if resp.status_code == 304 and entry is not None:
+        cache.record("revalidated")
+        metrics.inc("api_cache", result="revalidated")
+        cache.touch(key)
+        return json.loads(entry["body"])
+
+    resp.raise_for_status()
+    cache.record("misses")
+    metrics.inc("api_cache", result="miss")
+    data = resp.json()
+    cache.put(key, resp.headers.get("ETag") or data.get("etag"), resp.text)
+    return data
+
+
+class PartialResultError(RuntimeError):
+    """Some of the concurrent requests failed while the others succeeded
+
+    results keeps the input order with None for each failed item, errors lists
+    (item, exception) for the failures and partial may be set by the caller to
+    the part of its own result built from the successful items.
+    """
+
+    def __init__(self, results: list, errors: list[tuple]):
+        self.results = results
+        self.errors = errors
+        self.partial = None
+        item, error = errors[0]
+        super().__init__(
+            f"{len(errors)} of {len(results)} requests failed "
+            f"(first: {type(error).__name__}: {error})"
+        )
+
+
+def _map_concurrently(func, items: list, max_workers: int | None = None) -> list:
+    """Apply func to items with a bounded thread pool, keeping the input order
+
+    Every item is attempted even if another one fails. Quota and circuit errors
+    are re-raised as is (the caller defers the whole call), a call in which every
+    item failed re-raises the first error, and otherwise PartialResultError
+    carries the results of the items that succeeded.
+    """
+    max_workers = max_workers or API_MAX_WORKERS
+
+    def call(item):
+        try:
+            return func(item), None
+        except Exception as e:
+            return None, e
+
+    if len(items) <= 1 or max_workers <= 1:
+        outcomes = [call(item) for item in items]
+    else:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as executor:
+            outcomes = list(executor.map(call, items))
 
-if not API_KEY:
-    raise ValueError("YOUTUBE_API_KEY is not set. Please check your .env file.")
+    errors = [(item, e) for item, (_, e) in zip(items, outcomes) if e is not None]
+    if not errors:
+        return [result for result, _ in outcomes]
+    for _, e in errors:
+        if isinstance(e, (QuotaExceededError, CircuitOpenError)):
+            raise e
+    if len(errors) == len(items):
+        raise errors[0][1]
+    raise PartialResultError([result for result, _ in outcomes], errors)
 
-if DEBUG:
-    print(f"API Key loaded: {API_KEY[:10]}...")
 
+def _batches(video_ids: list[str], size: int = 50) -> list[list[str]]:
+    """Split IDs into chunks of up to 50 (the API limit for the id parameter)"""
+    return [video_ids[i : i + size] for i in range(0, len(video_ids), size)]
 
-def get_playlist_ids(video_ids: list[str], api_key: str):
+
+# partial-response selectors: only the fields read by the parser below are requested
+# ("etag" is kept for the response cache)
+PLAYLIST_ID_FIELDS = "etag,items(snippet/channelId)"
+
+
+def get_playlist_ids(
+    video_ids: list[str], api_key: str, max_workers: int | None = None
+):
     """Get the channel ID (UC~~)
     →→→ convert it to the automatically generated playlist ID (UU~~) of all videos on the channel
     """
 
-    base_url = "https://www.googleapis.com/youtube/v3/videos"
-    playlist_ids = []
+    base_url = f"{YOUTUBE_API_BASE_URL}/videos"
 
     if DEBUG:
         print(f"Processing started: {len(video_ids)} items")
 
-    for i in range(0, len(video_ids), 50):
-        ids = ",".join(video_ids[i : i + 50])
-        url = f"{base_url}?part=snippet&id={ids}&key={api_key}"
-
-        resp = requests.get(url, timeout=10)
-
+    def fetch_batch(batch: list[str]) -> list[dict]:
+        ids = ",".join(batch)
         try:
-            resp.raise_for_status()
+            data = _get_json(
+                base_url,
+                {
+                    "part": "snippet",
+                    "id": ids,
+                    "fields": PLAYLIST_ID_FIELDS,
+                    "key": api_key,
+                },
+                operation="get_playlist_ids",
+            )
         except requests.exceptions.HTTPError as e:  # HTTPエラー処理
             raise RuntimeError(
                 f"HTTP error. Please check your API key/video IDs. : {e}"
             )
-        data = resp.json()
         items = data.get("items", [])
 
         if not items:  # video IDが無効な場合の処理
             raise ValueError(f"No items found for video IDs: {ids}")
 
-        for item in data["items"]:
+        rows = []
+        for item in items:
             playlist_id = item.get("snippet", {}).get("channelId", "")
             if playlist_id:
                 playlist_id = playlist_id.replace(
                     "C", "U", 1
                 )  # converting "UU~~" to "UC~~" : channel_ID to playlist_ID of all videos in the channel
-            playlist_ids.append({"playlist_id": playlist_id})
+            rows.append({"playlist_id": playlist_id})
+        return rows
 
-        time.sleep(random.uniform(0.1, 0.2))
+    playlist_ids = [
+        row
+        for rows in _map_concurrently(fetch_batch, _batches(video_ids), max_workers)
+        for row in rows
+    ]
 
     df = pd.DataFrame(playlist_ids).drop_duplicates()
 
@@ -67,81 +432,194 @@ def get_playlist_ids(video_ids: list[str], api_key: str):
     return df
 
 
-def get_all_video_ids(
-    playlist_ids: list[str], api_key: str, title_filter: str | None = None
-) -> pd.DataFrame:
-    base_url = "https://www.googleapis.com/youtube/v3/playlistItems"
-    videos = []
-    if DEBUG:
-        print(f"Processing started: {len(playlist_ids)} items")
+PLAYLIST_ITEM_FIELDS = "etag,nextPageToken,items/snippet(title,resourceId/videoId)"
 
-    for playlist_id in playlist_ids:
-        next_page_token = None
-
-        cnt = 0
-        memo = 0
-        while True:
-            url = (
-                f"{base_url}?part=snippet&playlistId={playlist_id}&maxResults=50"
-                f"&pageToken={next_page_token or ''}&key={api_key}"
-            )
 
-            try:
-                resp = requests.get(url, timeout=10)
-                resp.raise_for_status()
-                data = resp.json()
+def iter_playlist_videos(
+    playlist_id: str,
+    api_key: str,
+    title_filter: str | None = None,
+    crawl_state: CrawlState | None = None,
+    full: bool = False,
+    strict: bool = False,
+) -> Iterator[list[dict]]:
+    """Yield the videos of one playlist page by page (after the title filter)
 
-            except requests.exceptions.RequestException as e:
-                print(f"API call error: {e}")
-                print("could not retrieve data for playlist ID:", playlist_id)
-                break
-            except Exception as e:
-                print(f"Unexpected error: {e}")
-                break
+    With crawl_state, paging stops at the first known video (uploads playlists are
+    newest first) and only newer videos are yielded; full=True ignores the known list.
+    The state of the playlist is updated once the generator is exhausted.
+    A failed request ends the playlist with the pages fetched so far; with
+    strict=True it is raised instead, so callers never mistake a partial list
+    for the whole playlist.
+    """
+    base_url = f"{YOUTUBE_API_BASE_URL}/playlistItems"
+
+    # pages of one playlist are chained by nextPageToken, so they stay sequential
+    known_ids = (
+        crawl_state.known_video_ids(playlist_id)
+        if crawl_state is not None and not full
+        else set()
+    )
+    new_videos = []  # every new video, before the title filter
+    next_page_token = None
+    completed = False
+
+    cnt = 0
+    memo = 0
+    while True:
+        params = {
+            "part": "snippet",
+            "playlistId": playlist_id,
+            "maxResults": 50,
+            "pageToken": next_page_token or "",
+            "fields": PLAYLIST_ITEM_FIELDS,
+            "key": api_key,
+        }
 
-            if DEBUG:
-                print(f"API call completed! Playlist ID: {playlist_id}")
-
-            for item in data["items"]:
-                video_id = item["snippet"]["resourceId"]["videoId"]
-                title = item["snippet"]["title"]
-                if (title_filter is not None) and (title_filter not in title):
-                    continue
-                videos.append({"video_id": video_id, "title": title})
-                cnt += 1
-
-                if cnt % 25 == 0 and cnt > 0 and memo != cnt:
-                    print(
-                        f"Retrieved {cnt} videos so far from playlist {playlist_id}..."
-                    )
-                    memo = cnt
-
-            next_page_token = data.get("nextPageToken")
-            if not next_page_token:
+        try:
+            data = _get_json(base_url, params, operation="get_all_video_ids")
+
+        except (QuotaExceededError, CircuitOpenError):
+            # the caller decides what to defer; the playlist stays unrecorded
+            raise
+        except requests.exceptions.RequestException as e:
+            if strict:
+                raise
+            print(f"API call error: {e}")
+            print("could not retrieve data for playlist ID:", playlist_id)
+            break
+        except Exception as e:
+            if strict:
+                raise
+            print(f"Unexpected error: {e}")
+            break
+
+        if DEBUG:
+            print(f"API call completed! Playlist ID: {playlist_id}")
+
+        videos = []
+        reached_known = False
+        for item in data.get("items", []):  # omitted when empty with fields=
+            video_id = item["snippet"]["resourceId"]["videoId"]
+            title = item["snippet"]["title"]
+            if video_id in known_ids:
+                reached_known = True
                 break
+            new_videos.append({"video_id": video_id, "title": title})
+            if (title_filter is not None) and (title_filter not in title):
+                continue
+            videos.append({"video_id": video_id, "title": title})
+            cnt += 1
+
+            if cnt % 25 == 0 and cnt > 0 and memo != cnt:
+                print(f"Retrieved {cnt} videos so far from playlist {playlist_id}...")
+                memo = cnt
+
+        if videos:
+            yield videos
+
+        next_page_token = data.get("nextPageToken")
+        if reached_known or not next_page_token:
+            completed = True
+            break
+
+    # only a crawl that reached the end (or a known video) is recorded
+    if crawl_state is not None and completed:
+        crawl_state.update(playlist_id, new_videos, replace=full)
+
+
+def get_all_video_ids(
+    playlist_ids: list[str],
+    api_key: str,
+    title_filter: str | None = None,
+    max_workers: int | None = None,
+    crawl_state: CrawlState | None = None,
+    full: bool = False,
+    strict: bool = False,
+) -> pd.DataFrame:
+    """Get all videos of each playlist; playlists are paged in parallel
+
+    With crawl_state, only videos newer than the already-known ones are returned
+    (see iter_playlist_videos). full=True crawls everything and replaces the known
+    list, which drops deleted videos. strict=True raises when a page fails
+    instead of returning the videos fetched so far (see iter_playlist_videos).
+    The state is updated in memory only; call crawl_state.save() once results are stored.
+    """
+    if DEBUG:
+        print(f"Processing started: {len(playlist_ids)} items")
 
-            time.sleep(random.uniform(0.3, 0.5))
+    def fetch_playlist(playlist_id: str) -> list[dict]:
+        pages = iter_playlist_videos(
+            playlist_id,
+            api_key,
+            title_filter,
+            crawl_state=crawl_state,
+            full=full,
+            strict=strict,
+        )
+        return [video for page in pages for video in page]
+
+    videos = [
+        video
+        for videos in _map_concurrently(fetch_playlist, playlist_ids, max_workers)
+        for video in videos
+    ]
 
     if DEBUG:
         print(f"Processing finished: {len(videos)} items")
 
-    return pd.DataFrame(videos)
+    return pd.DataFrame(videos, columns=["video_id", "title"])
+
+
+def iter_video_ids(
+    playlist_ids: list[str],
+    api_key: str,
+    title_filter: str | None = None,
+    batch_size: int = 50,
+    crawl_state: CrawlState | None = None,
+    full: bool = False,
+) -> Iterator[list[dict]]:
+    """Yield videos of all playlists in batches of up to batch_size as pages arrive"""
+    batch = []
+    for playlist_id in playlist_ids:
+        for page in iter_playlist_videos(
+            playlist_id, api_key, title_filter, crawl_state=crawl_state, full=full
+        ):
+            batch.extend(page)
+            while len(batch) >= batch_size:
+                yield batch[:batch_size]
+                batch = batch[batch_size:]
+    if batch:
+        yield batch
 
 
-def get_video_details(video_ids: list[str], api_key) -> pd.DataFrame:
-    """Get detailed information from video ID list"""
+VIDEO_DETAIL_FIELDS = (
+    "etag,items(id,snippet(title,publishedAt,channelId,channelTitle),"
+    "contentDetails/duration,statistics(viewCount,likeCount,commentCount))"
+)
 
-    base_url = "https://www.googleapis.com/youtube/v3/videos"
-    all_data = []
 
-    for i in range(0, len(video_ids), 50):
-        ids = ",".join(video_ids[i : i + 50])
-        url = (
-            f"{base_url}?part=snippet,contentDetails,statistics&id={ids}&key={api_key}"
+def get_video_details(
+    video_ids: list[str], api_key, max_workers: int | None = None
+) -> pd.DataFrame:
+    """Get detailed information from video ID list (50-ID batches are sent concurrently)"""
+
+    base_url = f"{YOUTUBE_API_BASE_URL}/videos"
+
+    def fetch_batch(batch: list[str]) -> list[list]:
+        resp = _get_json(
+            base_url,
+            {
+                "part": "snippet,contentDetails,statistics",
+                "id": ",".join(batch),
+                "fields": VIDEO_DETAIL_FIELDS,
+                "key": api_key,
+            },
+            operation="get_video_details",
         )
-        resp = requests.get(url).json()
 
-        for item in resp["items"]:
+        rows = []
+        for item in resp.get("items", []):
             vid = item["id"]
             title = item["snippet"]["title"]
             published_at = item["snippet"]["publishedAt"][:10]
@@ -159,7 +637,7 @@ def get_video_details(video_ids: list[str], api_key) -> pd.DataFrame:
                 isodate.parse_duration(duration).total_seconds()
             )  # convert to seconds
 
-            all_data.append(
+            rows.append(
                 [
                     vid,
                     title,
@@ -173,27 +651,78 @@ def get_video_details(video_ids: list[str], api_key) -> pd.DataFrame:
                     channel_title,
                 ]
             )
+        return rows
+
+    try:
+        batches = _map_concurrently(fetch_batch, _batches(video_ids), max_workers)
+    except PartialResultError as e:
+        # keep the batches that arrived so the caller can save them
+        e.partial = _detail_frame([rows for rows in e.results if rows is not None])
+        raise
+    return _detail_frame(batches)
+
 
+def _detail_frame(batches: list[list[list]]) -> pd.DataFrame:
     # duration is standardized to 'duration' (seconds) for downstream consistency
-    df = pd.DataFrame(
-        all_data,
-        columns=[
-            "video_id",
-            "title",
-            "date",
-            "views",
-            "duration",
-            "likes",
-            "comments",
-            "URL",
-            "channel_id",
-            "channel_title",
-        ],
-    )
-    return df
+    all_data = [row for rows in batches for row in rows]
+    return pd.DataFrame(all_data, columns=VIDEO_DETAIL_COLUMNS)
+
+
+# columns of the DataFrame returned by get_video_statistics
+VIDEO_STATISTICS_COLUMNS = ["video_id", "views", "likes", "comments", "fetched_at"]
+VIDEO_STATISTICS_FIELDS = "etag,items(id,statistics(viewCount,likeCount,commentCount))"
+
+
+def get_video_statistics(
+    video_ids: list[str], api_key, max_workers: int | None = None
+) -> pd.DataFrame:
+    """Get only the statistics of known videos (part=statistics, 50-ID batches)
+
+    Every batch is requested from the API (a cached response is only revalidated,
+    never served as is) and fetched_at is the UTC time its response arrived.
+    Deleted or private videos are missing from the result.
+    """
+
+    base_url = f"{YOUTUBE_API_BASE_URL}/videos"
+
+    def fetch_batch(batch: list[str]) -> list[list]:
+        resp = _get_json(
+            base_url,
+            {
+                "part": "statistics",
+                "id": ",".join(batch),
+                "fields": VIDEO_STATISTICS_FIELDS,
+                "key": api_key,
+            },
+            operation="get_video_statistics",
+            revalidate=True,
+        )
+        fetched_at = pd.Timestamp.now(tz="UTC")
+
+        rows = []
+        for item in resp.get("items", []):
+            stats = item.get("statistics", {})
+            rows.append(
+                [
+                    item["id"],
+                    int(stats.get("viewCount", 0)),
+                    int(stats.get("likeCount", 0)),
+                    int(stats.get("commentCount", 0)),
+                    fetched_at,
+                ]
+            )
+        return rows
+
+    all_data = [
+        row
+        for rows in _map_concurrently(fetch_batch, _batches(video_ids), max_workers)
+        for row in rows
+    ]
+    return pd.DataFrame(all_data, columns=VIDEO_STATISTICS_COLUMNS)
 
 
 if __name__ == "__main__":
+    require_api_key()
     playlist_ids = get_playlist_ids(VIDEO_IDS, API_KEY)
     print(playlist_ids)
     all_videos = get_all_video_ids(playlist_ids["playlist_id"].to_list(), API_KEY)